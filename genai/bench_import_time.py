@@ -0,0 +1,56 @@
+# bench_import_time.py
+"""
+Measures the cold-start import time of the genai modules, each in a fresh interpreter.
+Exits with code 1 if a median exceeds `--max_ms`, so it can be used to catch regressions.
+
+Usage:
+    python bench_import_time.py --repeat 10 --max_ms 150
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import List
+
+_MEASURE = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def measure_import_ms(module: str, repeat: int) -> List[float]:
+    """Imports `module` in `repeat` fresh interpreters and returns the import times in ms."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(repeat):
+        cmd = subprocess.run(
+            [sys.executable, "-c", _MEASURE.format(module=module)],
+            cwd=here,
+            capture_output=True,
+            text=True
+        )
+        if cmd.returncode != 0:
+            raise Exception(f"Error importing `{module}`: {cmd.stderr}")
+        timings.append(float(cmd.stdout.strip()) * 1000)
+    return timings
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the cold-start import time of the genai modules.")
+    ap.add_argument("--modules", nargs="+", default=["llm_classifier", "parallelizer"])
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--max_ms", type=float, default=None)
+    args = ap.parse_args()
+
+    failed = False
+    for module in args.modules:
+        timings = measure_import_ms(module, args.repeat)
+        median = statistics.median(timings)
+        print(f"{module:>16}: median {median:7.1f} ms | min {min(timings):7.1f} ms | max {max(timings):7.1f} ms")
+        if args.max_ms is not None and median > args.max_ms:
+            print(f"{module:>16}: median import time above the {args.max_ms} ms budget")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# bench_jsonl_writer.py
+"""
+Measures the records/sec of the parallelizer resume-cache writer for each durability mode.
+
+Usage:
+    python bench_jsonl_writer.py --records 5000 --writers 100
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from parallelizer import _JsonlAppender
+
+
+async def _bench(durability: str, records: int, writers: int, group_size: int, group_interval_ms: float, folder: str) -> float:
+    with tempfile.TemporaryDirectory(dir=folder) as tmp:
+        path = os.path.join(tmp, "bench.jsonl")
+        app = _JsonlAppender(path, durability=durability, group_size=group_size, group_interval_ms=group_interval_ms)
+        await app.open()
+
+        # `writers` concurrent producers, like run_async_map workers
+        async def producer(worker_id: int):
+            for i in range(worker_id, records, writers):
+                await app.write({"i": i, "result": {"label": "x" * 32}})
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(producer(w) for w in range(writers)))
+        await app.close()
+        elapsed = time.perf_counter() - t0
+
+        with open(path, encoding="utf-8") as f:
+            assert sum(1 for _ in f) == records
+    return records / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the JSONL resume-cache writer durability modes.")
+    ap.add_argument("--records", type=int, default=5000)
+    ap.add_argument("--writers", type=int, default=100)
+    ap.add_argument("--group_size", type=int, default=256)
+    ap.add_argument("--group_interval_ms", type=float, default=20.0)
+    ap.add_argument("--folder", default=None, help="where to write (fsync cost depends on the disk); defaults to the temp dir")
+    args = ap.parse_args()
+
+    for durability in ("record", "group", "os"):
+        rate = asyncio.run(_bench(durability, args.records, args.writers, args.group_size, args.group_interval_ms, args.folder))
+        print(f"{durability:>6}: {rate:10.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench_llm_batch.py
+"""
+Compares per-item vs batched structured-output calls against a local fake model.
+No network and no API key needed; the fake model sleeps proportionally to the prompt size.
+
+Usage:
+    python bench_llm_batch.py --items 200 --system_prompt_chars 8000
+"""
+import re
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, List
+
+from pydantic import create_model
+from langchain_core.messages import AIMessage
+
+import llm_classifier
+
+
+class _FakeStructuredLLM:
+    """Mimics `llm.with_structured_output(schema, include_raw=...)` with simulated latency."""
+    def __init__(self, schema: Any, include_raw: bool, stats: dict, base_latency: float, latency_per_1k_tokens: float, invalid_rate: float):
+        self.schema = schema
+        self.include_raw = include_raw
+        self.stats = stats
+        self.base_latency = base_latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.invalid_rate = invalid_rate
+
+    async def ainvoke(self, messages: List[Any]):
+        prompt_tokens = sum(llm_classifier._estimate_tokens(m.content) for m in messages)
+        self.stats["requests"] += 1
+        self.stats["prompt_tokens"] += prompt_tokens
+        await asyncio.sleep(self.base_latency + self.latency_per_1k_tokens * prompt_tokens / 1000)
+
+        user_text = messages[-1].content
+        if "items" not in self.schema.model_fields:
+            return self.schema(label=user_text[:8])
+
+        # batched: answer every <item>, corrupting a fraction of them
+        items = []
+        for item_id, text in re.findall(r'<item id="(\d+)">\n(.*?)\n</item>', user_text, flags=re.S):
+            output = {"label": text[:8]} if random.random() >= self.invalid_rate else {"wrong_field": 1}
+            items.append({"id": int(item_id), "output": output})
+        raw = AIMessage(content="", tool_calls=[{"name": self.schema.__name__, "args": {"items": items}, "id": "call"}])
+        try:
+            parsed, error = self.schema.model_validate({"items": items}), None
+        except Exception as e:
+            parsed, error = None, e
+        return {"raw": raw, "parsed": parsed, "parsing_error": error}
+
+
+async def _bench(mode: str, args, schema, system_prompt: str, messages: List[str]):
+    stats = {"requests": 0, "prompt_tokens": 0}
+    llm_classifier._build_llm = lambda **kw: _FakeStructuredLLM(
+        kw["pydantic_output_schema"], kw.get("include_raw", False), stats,
+        args.base_latency, args.latency_per_1k_tokens, args.invalid_rate
+    )
+    llm_classifier.clear_llm_pool()
+
+    t0 = time.perf_counter()
+    if mode == "single":
+        sem = asyncio.Semaphore(args.concurrency)
+        async def one(message):
+            async with sem:
+                return await llm_classifier.agenerate_structured_output(
+                    "openai", "fake", system_prompt, message, schema
+                )
+        results = await asyncio.gather(*(one(m) for m in messages))
+    else:
+        results = await llm_classifier.agenerate_structured_output_batch(
+            "openai", "fake", system_prompt, messages, schema,
+            max_items_per_request=args.batch_size, max_concurrent_requests=args.concurrency
+        )
+    elapsed = time.perf_counter() - t0
+
+    failed = sum(r is None for r in results)
+    print(
+        f"{mode:>6}: {len(messages) / elapsed:8.1f} items/s | "
+        f"{stats['requests']:5d} requests | "
+        f"{stats['prompt_tokens'] / len(messages):8.1f} prompt tokens/item | "
+        f"{failed} failed"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark batched vs per-item structured-output calls on a fake model.")
+    ap.add_argument("--items", type=int, default=200)
+    ap.add_argument("--system_prompt_chars", type=int, default=8000)
+    ap.add_argument("--message_chars", type=int, default=400)
+    ap.add_argument("--batch_size", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--base_latency", type=float, default=0.05)
+    ap.add_argument("--latency_per_1k_tokens", type=float, default=0.01)
+    ap.add_argument("--invalid_rate", type=float, default=0.02)
+    args = ap.parse_args()
+
+    schema = create_model("Label", label=(str, ...))
+    system_prompt = "Classify the text. " * (args.system_prompt_chars // 19)
+    messages = [f"message {i} " + "x" * args.message_chars for i in range(args.items)]
+
+    for mode in ("single", "batch"):
+        asyncio.run(_bench(mode, args, schema, system_prompt, messages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# bench_parallelizer.py
+"""
+Benchmark harness for run_async_map: drives it with fake async functions following a
+configurable latency distribution and failure / throttling rates, over a grid of
+concurrency, durability and adaptive-concurrency settings, and prints one row of
+RunMetrics per configuration.
+
+Usage:
+    python bench_parallelizer.py --items 2000 --latency lognormal --latency_median_ms 50 \
+        --concurrency 20 100 --durability record group --failure_rate 0.02
+
+    # tail latency: 2% of the calls take 2s, hedged at the p95 latency
+    python bench_parallelizer.py --straggler_rate 0.02 --straggler_ms 2000 --hedge_quantile 0.95
+
+    # adaptive concurrency: on a healthy service it must match or beat the fixed limit
+    # (the `limit` column grows), behind a server throttling above 30 calls it must back off
+    python bench_parallelizer.py --concurrency 20 --durability group --adaptive 0 1 --failure_rate 0
+    python bench_parallelizer.py --concurrency 100 --durability group --adaptive 0 1 --failure_rate 0 --capacity 30
+"""
+import os
+import math
+import random
+import asyncio
+import argparse
+import tempfile
+import itertools
+from typing import Any, Callable, Dict
+
+from parallelizer import run_async_map
+from run_metrics import RunMetrics
+
+
+class FakeThrottleError(Exception):
+    """Mimics a provider 429, optionally carrying a Retry-After hint."""
+    status_code = 429
+
+    def __init__(self, retry_after: float = None):
+        super().__init__("429 Too Many Requests")
+        self.retry_after = retry_after
+
+
+class FakeServerError(Exception):
+    status_code = 503
+
+
+def make_latency_sampler(kind: str, median: float, spread: float) -> Callable[[], float]:
+    """Returns a sampler of latencies in seconds: constant, uniform, exponential or lognormal."""
+    if kind == "constant":
+        return lambda: median
+    if kind == "uniform":
+        return lambda: random.uniform(median * (1 - spread), median * (1 + spread))
+    if kind == "exponential":
+        return lambda: random.expovariate(math.log(2) / median)
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(median), spread)
+    raise ValueError(f"Latency distribution `{kind}` not supported. Pick one of ['constant', 'uniform', 'exponential', 'lognormal'].")
+
+
+def with_stragglers(sample_latency: Callable[[], float], rate: float, latency: float) -> Callable[[], float]:
+    """Makes a fraction `rate` of the calls take `latency` seconds instead."""
+    if rate <= 0:
+        return sample_latency
+    return lambda: latency if random.random() < rate else sample_latency()
+
+
+def make_fake_fn(sample_latency: Callable[[], float], failure_rate: float, throttle_rate: float,
+                 capacity: int = None, retry_after: float = None):
+    """
+    Fake async `fn(a, b)`. Fails with a 503 with probability `failure_rate`, with a 429 with
+    probability `throttle_rate`, and always with a 429 above `capacity` concurrent calls.
+    """
+    state = {"in_flight": 0}
+
+    async def fn(a: Any, b: Any) -> Dict[str, Any]:
+        state["in_flight"] += 1
+        try:
+            if capacity is not None and state["in_flight"] > capacity:
+                raise FakeThrottleError(retry_after)
+            await asyncio.sleep(sample_latency())
+            r = random.random()
+            if r < throttle_rate:
+                raise FakeThrottleError(retry_after)
+            if r < throttle_rate + failure_rate:
+                raise FakeServerError("503 Service Unavailable")
+            return {"a": a, "b": b}
+        finally:
+            state["in_flight"] -= 1
+
+    return fn
+
+
+async def _bench_one(args, concurrency: int, durability: str, adaptive: bool) -> Dict[str, Any]:
+    fn = make_fake_fn(
+        with_stragglers(
+            make_latency_sampler(args.latency, args.latency_median_ms / 1000, args.latency_spread),
+            args.straggler_rate,
+            args.straggler_ms / 1000,
+        ),
+        failure_rate=args.failure_rate,
+        throttle_rate=args.throttle_rate,
+        capacity=args.capacity,
+        retry_after=args.retry_after,
+    )
+    metrics = RunMetrics()
+    with tempfile.TemporaryDirectory(dir=args.folder) as tmp:
+        await run_async_map(
+            fn,
+            [(i, None) for i in range(args.items)],
+            os.path.join(tmp, "bench.jsonl"),
+            concurrency=concurrency,
+            retries=args.retries,
+            retry_base_delay=args.retry_base_delay,
+            durability=durability,
+            adaptive_concurrency=adaptive,
+            timeout=args.timeout,
+            hedge_quantile=args.hedge_quantile,
+            hedge_max_ratio=args.hedge_max_ratio,
+            progress=False,
+            metrics=metrics,
+        )
+    return metrics.snapshot()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark run_async_map settings against fake async functions.")
+    ap.add_argument("--items", type=int, default=2000)
+    ap.add_argument("--latency", default="lognormal", choices=["constant", "uniform", "exponential", "lognormal"])
+    ap.add_argument("--latency_median_ms", type=float, default=20.0)
+    ap.add_argument("--latency_spread", type=float, default=0.5, help="uniform: +/- fraction; lognormal: sigma")
+    ap.add_argument("--failure_rate", type=float, default=0.01)
+    ap.add_argument("--throttle_rate", type=float, default=0.0)
+    ap.add_argument("--straggler_rate", type=float, default=0.0, help="fraction of calls taking --straggler_ms")
+    ap.add_argument("--straggler_ms", type=float, default=2000.0)
+    ap.add_argument("--capacity", type=int, default=None, help="concurrent calls above which the fake server throttles")
+    ap.add_argument("--retry_after", type=float, default=None)
+    ap.add_argument("--retries", type=int, default=3)
+    ap.add_argument("--retry_base_delay", type=float, default=0.05)
+    ap.add_argument("--timeout", type=float, default=None, help="per-attempt timeout (s)")
+    ap.add_argument("--hedge_quantile", type=float, default=None)
+    ap.add_argument("--hedge_max_ratio", type=float, default=0.05)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    ap.add_argument("--durability", nargs="+", default=["record", "group", "os"], choices=["record", "group", "os"])
+    ap.add_argument("--adaptive", type=int, nargs="+", default=[0], choices=[0, 1])
+    ap.add_argument("--folder", default=None, help="where to write the resume cache; defaults to the temp dir")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    header = f"{'conc':>5} {'durab':>6} {'adapt':>5} | {'items/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'retries':>7} {'failed':>6} {'max infl':>8} {'writer s':>8} {'hedged':>6} {'wins':>5} {'limit':>5} {'total s':>7}"
+    print(header)
+    print("-" * len(header))
+    for concurrency, durability, adaptive in itertools.product(args.concurrency, args.durability, args.adaptive):
+        random.seed(args.seed)
+        snap = asyncio.run(_bench_one(args, concurrency, durability, bool(adaptive)))
+        print(
+            f"{concurrency:>5} {durability:>6} {adaptive:>5} | "
+            f"{snap['items_per_second']:9.1f} "
+            f"{(snap['latency_p50'] or 0) * 1000:8.1f} "
+            f"{(snap['latency_p99'] or 0) * 1000:8.1f} "
+            f"{snap['retries']:7d} "
+            f"{snap['failed']:6d} "
+            f"{snap['max_in_flight']:8d} "
+            f"{snap['writer_seconds']:8.2f} "
+            f"{snap['hedged']:6d} "
+            f"{snap['hedge_wins']:5d} "
+            f"{snap['concurrency_limit']:5d} "
+            f"{snap['elapsed_seconds']:7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# bench_process_map.py
+"""
+Measures the speedup of run_process_map over single-core run_map on a CPU-bound function.
+
+Usage:
+    python bench_process_map.py --items 400 --work 20000
+"""
+import os
+import time
+import hashlib
+import argparse
+import tempfile
+
+from parallelizer import run_map, run_process_map
+
+
+def cpu_bound(seed: int, work: int) -> str:
+    """Iterated sha256: pure CPU, no I/O."""
+    digest = str(seed).encode()
+    for _ in range(work):
+        digest = hashlib.sha256(digest).digest()
+    return digest.hex()[:16]
+
+
+async def cpu_bound_async(seed: int, work: int) -> str:
+    return cpu_bound(seed, work)
+
+
+def _timed(run, *args, **kwargs) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        run(*args, os.path.join(tmp, "bench.jsonl"), progress=False, **kwargs)
+        return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark run_process_map vs run_map on CPU-bound work.")
+    ap.add_argument("--items", type=int, default=400)
+    ap.add_argument("--work", type=int, default=20000, help="sha256 iterations per item")
+    ap.add_argument("--chunk_size", type=int, default=8)
+    ap.add_argument("--workers", type=int, nargs="+", default=None)
+    args = ap.parse_args()
+
+    inputs = [(i, args.work) for i in range(args.items)]
+    baseline = _timed(run_map, cpu_bound_async, inputs)
+    print(f"run_map (1 core)      : {args.items / baseline:8.1f} items/s")
+
+    cpus = os.cpu_count() or 1
+    for workers in args.workers or sorted({1, 2, 4, cpus}):
+        elapsed = _timed(run_process_map, cpu_bound, inputs, workers=workers, chunk_size=args.chunk_size)
+        print(f"run_process_map ({workers:2d} w): {args.items / elapsed:8.1f} items/s | speedup {baseline / elapsed:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
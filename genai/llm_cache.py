@@ -0,0 +1,155 @@
+# llm_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+
+def _message_text(message: Any) -> str:
+    """Returns the text of a str / langchain message, for hashing."""
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+
+
+@lru_cache(maxsize=256)
+def _schema_json(pydantic_output_schema: Any) -> str:
+    """Serialized JSON schema of a pydantic model (memoized: building it is the slowest part of the key)."""
+    return json.dumps(pydantic_output_schema.model_json_schema(), sort_keys=True, ensure_ascii=False)
+
+
+def make_cache_key(
+    model_provider: str,
+    model_name: str,
+    system_prompt: Any,
+    user_message: Any,
+    pydantic_output_schema: Any,
+    model_temperature: float,
+) -> str:
+    """
+    Content-addressed key of a structured LLM call:
+    sha256 over provider, model, system prompt, user message, output JSON schema and temperature.
+    """
+    payload = json.dumps(
+        [
+            model_provider,
+            model_name,
+            _message_text(system_prompt),
+            _message_text(user_message),
+            _schema_json(pydantic_output_schema),
+            float(model_temperature),
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of structured LLM responses.
+    Entries expire after `ttl_seconds` (None = never) and the least recently used
+    entries are evicted once the cache holds more than `max_entries`.
+    Use:
+        cache = ResponseCache("llm_cache.sqlite")
+        generate_structured_output(..., cache=cache)
+    """
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = 100_000):
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in (".sqlite", ".sqlite3", ".db"):
+            raise ValueError(f"Expected a '.sqlite' / '.db' filepath for `path`; received extension '{ext}'")
+
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._writes_since_evict = 0
+
+    def get(self, key: str, pydantic_output_schema: Any) -> Optional[Any]:
+        """Returns the cached response rehydrated into `pydantic_output_schema`, or None on miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        try:
+            return pydantic_output_schema.model_validate_json(value)
+        except Exception:
+            # schema drifted in a way the key did not capture: treat as a miss
+            return None
+
+    def put(self, key: str, response: Any):
+        """Stores a pydantic response under `key`."""
+        value = response.model_dump_json() if hasattr(response, "model_dump_json") else json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # evicting on every write would cost a COUNT(*) per call; do it in batches
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 100:
+                self._evict()
+
+    def _evict(self):
+        self._writes_since_evict = 0
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries is not None:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def evict(self):
+        """Drops expired entries and trims the cache down to `max_entries`."""
+        with self._lock:
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            return {"hits": self.hits, "misses": self.misses, "size": count}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._evict()
+                self._conn.close()
+                self._conn = None
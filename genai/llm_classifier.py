@@ -1,52 +1,64 @@
-# make sure libraries are installed
-try:
-    import langchain
-except Exception:
-    raise ImportError("Missing package. Please launch `pip install langchain`.")
-try:
-    import langchain_core
-except Exception:
-    raise ImportError("Missing package. Please launch `pip install langchain-core`.")
-try:
-    import pydantic
-except Exception:
-    raise ImportError("Missing package. Please launch `pip install pydantic`.")
-
 # imports
+# NOTE: langchain / pydantic / provider packages are imported lazily (and memoized) on first use,
+# so that `import llm_classifier` stays cheap for short-lived workers.
+from __future__ import annotations
+
 import os
-from typing import Literal
-from pydantic import BaseModel
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+import json
+import asyncio
+import importlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Literal, Optional
+from llm_cache import ResponseCache, make_cache_key
+from rate_limiter import RateLimiter, is_rate_limit_error
+from similarity_index import SimilarityIndex
 
-def _init_llm(
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+    from langchain_core.messages import SystemMessage, HumanMessage
+
+@lru_cache(maxsize=None)
+def _lazy_import(module_name: str, pip_name: str):
+    """Imports a module on first use (memoized), with a clear error if the package is missing."""
+    try:
+        return importlib.import_module(module_name)
+    except Exception:
+        raise ImportError(f"Missing package. Please launch `pip install {pip_name}`.")
+
+def _pydantic():
+    return _lazy_import("pydantic", "pydantic")
+
+def _messages():
+    return _lazy_import("langchain_core.messages", "langchain-core")
+
+def _init_chat_model(**kwargs):
+    return _lazy_import("langchain.chat_models", "langchain").init_chat_model(**kwargs)
+
+def _build_llm(
     model_provider: Literal['openai', 'google_genai'], 
     model_name: str, 
     pydantic_output_schema: BaseModel,
     model_temperature: float, 
     timeout_per_attempt: int, 
-    max_retries: int
+    max_retries: int,
+    include_raw: bool = False
 ):
     # make sure LLM library is installed and API key is set
     if model_provider == 'google_genai':
-        try:
-            import langchain_google_genai
-        except Exception:
-            raise ImportError("Missing package. Please launch `pip install langchain-google-genai`.")
+        _lazy_import("langchain_google_genai", "langchain-google-genai")
         if "GOOGLE_API_KEY" not in os.environ:
             raise ValueError("Missing `GOOGLE_API_KEY`. Set os.environ['GOOGLE_API_KEY'] = 'MY_API_KEY'.")
     elif model_provider == 'openai':
-        try:
-            import langchain_openai
-        except Exception:
-            raise ImportError("Missing package. Please launch `pip install langchain-openai`.")
+        _lazy_import("langchain_openai", "langchain-openai")
         if "OPENAI_API_KEY" not in os.environ:
             raise ValueError("Missing `OPENAI_API_KEY`. Set os.environ['OPENAI_API_KEY'] = 'MY_API_KEY'.")
     else:
         raise ValueError(f"Model provider `{model_provider}` not supported. Pick one of ['openai', 'google_genai'].")
     
     # create LLM
-    llm = init_chat_model(
+    llm = _init_chat_model(
         model_provider=model_provider,
         model=model_name,
         temperature=model_temperature,
@@ -54,16 +66,125 @@ def _init_llm(
         timeout=timeout_per_attempt
     )
 
-    # check the output format
-    is_pydantic_basemodel = isinstance(pydantic_output_schema, type) and issubclass(pydantic_output_schema, BaseModel)
-    if not is_pydantic_basemodel:
-        raise ValueError("Invalid value for param `pydantic_output_schema`. Expected type `BaseModel`, received type {type(pydantic_output_schema)}. Use the function `from pydantic import create_model` to create the pydantic_output_schema.")
-    
     # convert to json mode
-    llm_json = llm.with_structured_output(pydantic_output_schema)
+    llm_json = llm.with_structured_output(pydantic_output_schema, include_raw=include_raw)
 
     return llm_json
 
+
+def _check_output_schema(pydantic_output_schema: BaseModel):
+    # check the output format
+    is_pydantic_basemodel = isinstance(pydantic_output_schema, type) and issubclass(pydantic_output_schema, _pydantic().BaseModel)
+    if not is_pydantic_basemodel:
+        raise ValueError(f"Invalid value for param `pydantic_output_schema`. Expected type `BaseModel`, received type {type(pydantic_output_schema)}. Use the function `from pydantic import create_model` to create the pydantic_output_schema.")
+
+
+class _LLMPool:
+    """
+    Bounded LRU pool of structured-output LLM clients.
+    Clients are keyed by (provider, model, schema, temperature, timeout, retries) and
+    reused across calls, so the underlying HTTP connections are reused as well.
+    The lock is never held across an await, so the pool is safe to share between
+    threads and coroutines running on the event loop.
+    """
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._clients: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return client
+            self.misses += 1
+
+        # build outside the lock (slow); if another thread won the race, keep its client
+        client = factory()
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.maxsize:
+                self._clients.popitem(last=False)
+        return client
+
+    def resize(self, maxsize: int):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._clients) > self.maxsize:
+                self._clients.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._clients), "maxsize": self.maxsize}
+
+
+_LLM_POOL = _LLMPool()
+
+def _init_llm(
+    model_provider: Literal['openai', 'google_genai'], 
+    model_name: str, 
+    pydantic_output_schema: BaseModel,
+    model_temperature: float, 
+    timeout_per_attempt: int, 
+    max_retries: int,
+    include_raw: bool = False
+):
+    """Returns a pooled structured-output LLM client, building it on first use."""
+    _check_output_schema(pydantic_output_schema)
+
+    key = (model_provider, model_name, pydantic_output_schema, model_temperature, timeout_per_attempt, max_retries, include_raw)
+    return _LLM_POOL.get(
+        key,
+        lambda: _build_llm(
+            model_provider=model_provider,
+            model_name=model_name,
+            pydantic_output_schema=pydantic_output_schema,
+            model_temperature=model_temperature,
+            timeout_per_attempt=timeout_per_attempt,
+            max_retries=max_retries,
+            include_raw=include_raw
+        )
+    )
+
+def get_llm_pool_stats() -> Dict[str, int]:
+    """Returns the hit/miss counters and current size of the LLM client pool."""
+    return _LLM_POOL.stats()
+
+def set_llm_pool_size(maxsize: int):
+    """Sets the maximum number of LLM clients kept in the pool (least recently used are evicted)."""
+    if maxsize < 1:
+        raise ValueError(f"Invalid value for param `maxsize`. Expected a positive integer, received {maxsize}.")
+    _LLM_POOL.resize(maxsize)
+
+def clear_llm_pool():
+    """Drops all pooled LLM clients and resets the counters."""
+    _LLM_POOL.clear()
+
+async def _ainvoke_rate_limited(llm_json, messages: List[Any], rate_limiter: RateLimiter, model_provider: str, model_name: str) -> Dict[str, Any]:
+    """Invokes an `include_raw=True` LLM client within the rate limiter budget, feeding back usage and 429s."""
+    prompt_tokens = sum(_estimate_tokens(str(message.content)) for message in messages)
+    reservation = await rate_limiter.acquire(model_provider, model_name, prompt_tokens)
+    try:
+        response = await llm_json.ainvoke(messages)
+    except Exception as e:
+        if is_rate_limit_error(e):
+            rate_limiter.record_throttle(reservation)
+        raise
+    usage = getattr(response.get("raw"), "usage_metadata", None) or {}
+    rate_limiter.record_usage(reservation, usage.get("total_tokens"))
+    return response
+
 def generate_structured_output(
         model_provider: Literal['openai', 'google_genai'], 
         model_name: str, 
@@ -72,7 +193,9 @@ def generate_structured_output(
         pydantic_output_schema: BaseModel,
         model_temperature: float = 0.0, 
         timeout_per_attempt: int = 60, 
-        max_retries: int = 1
+        max_retries: int = 1,
+        cache: ResponseCache | None = None,
+        similarity_index: SimilarityIndex | None = None
     ):
         """Generates a JSON output (as defined by pydantic_output_schema) from a LLM model, given a system prompt and a user message.
 
@@ -85,6 +208,8 @@ def generate_structured_output(
             model_temperature (float, optional): The model temperature. Defaults to 0.0.
             timeout_per_attempt (int, optional): The timeout after which an attempt has to fail. Defaults to 60.
             max_retries (int, optional): The maximum number of retries in case of failure. Defaults to 1.
+            cache (ResponseCache | None, optional): On-disk response cache; hits are returned without calling the LLM. Defaults to None.
+            similarity_index (SimilarityIndex | None, optional): Near-duplicate index; inputs similar enough to an already classified one reuse its result. Defaults to None.
 
         Returns:
             BaseModel: The LLM response as a Pydantic object
@@ -92,9 +217,35 @@ def generate_structured_output(
 
         # make sure messages are of correct type
         if isinstance(system_prompt, str):
-            system_prompt = SystemMessage(content=system_prompt)
+            system_prompt = _messages().SystemMessage(content=system_prompt)
         if isinstance(user_message, str):
-            user_message = HumanMessage(content=user_message)
+            user_message = _messages().HumanMessage(content=user_message)
+
+        # serve from cache if possible
+        if cache is not None:
+            _check_output_schema(pydantic_output_schema)
+            cache_key = make_cache_key(
+                model_provider=model_provider,
+                model_name=model_name,
+                system_prompt=system_prompt,
+                user_message=user_message,
+                pydantic_output_schema=pydantic_output_schema,
+                model_temperature=model_temperature
+            )
+            cached = cache.get(cache_key, pydantic_output_schema)
+            if cached is not None:
+                return cached
+
+        # short-circuit near-duplicates of already classified inputs (a sample of hits is still verified)
+        similarity_namespace, similar = None, None
+        if similarity_index is not None and isinstance(user_message.content, str):
+            _check_output_schema(pydantic_output_schema)
+            similarity_namespace = similarity_index.namespace(
+                model_provider, model_name, system_prompt, pydantic_output_schema, model_temperature
+            )
+            similar = similarity_index.lookup(similarity_namespace, user_message.content, pydantic_output_schema)
+            if similar is not None and not similarity_index.should_verify():
+                return similar
 
         # get response
         llm_json = _init_llm(
@@ -106,6 +257,13 @@ def generate_structured_output(
             max_retries=max_retries
         )
         response = llm_json.invoke([system_prompt, user_message])
+        if cache is not None and response is not None:
+            cache.put(cache_key, response)
+        if similarity_namespace is not None and response is not None:
+            if similar is not None:
+                similarity_index.record_verification(similar, response)
+            else:
+                similarity_index.add(similarity_namespace, user_message.content, response)
 
         return response
 
@@ -117,7 +275,10 @@ async def agenerate_structured_output(
         pydantic_output_schema: BaseModel,
         model_temperature: float = 0.0, 
         timeout_per_attempt: int = 60, 
-        max_retries: int = 1
+        max_retries: int = 1,
+        cache: ResponseCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        similarity_index: SimilarityIndex | None = None
     ):
         """Generates a JSON output (as defined by pydantic_output_schema) from a LLM model, given a system prompt and a user message.
 
@@ -130,6 +291,9 @@ async def agenerate_structured_output(
             model_temperature (float, optional): The model temperature. Defaults to 0.0.
             timeout_per_attempt (int, optional): The timeout after which an attempt has to fail. Defaults to 60.
             max_retries (int, optional): The maximum number of retries in case of failure. Defaults to 1.
+            cache (ResponseCache | None, optional): On-disk response cache; hits are returned without calling the LLM. Defaults to None.
+            rate_limiter (RateLimiter | None, optional): Shared rate limiter; the call waits for request/token budget before being sent. Defaults to None.
+            similarity_index (SimilarityIndex | None, optional): Near-duplicate index; inputs similar enough to an already classified one reuse its result. Defaults to None.
 
         Returns:
             BaseModel: The LLM response as a Pydantic object
@@ -137,9 +301,35 @@ async def agenerate_structured_output(
 
         # make sure messages are of correct type
         if isinstance(system_prompt, str):
-            system_prompt = SystemMessage(content=system_prompt)
+            system_prompt = _messages().SystemMessage(content=system_prompt)
         if isinstance(user_message, str):
-            user_message = HumanMessage(content=user_message)
+            user_message = _messages().HumanMessage(content=user_message)
+
+        # serve from cache if possible
+        if cache is not None:
+            _check_output_schema(pydantic_output_schema)
+            cache_key = make_cache_key(
+                model_provider=model_provider,
+                model_name=model_name,
+                system_prompt=system_prompt,
+                user_message=user_message,
+                pydantic_output_schema=pydantic_output_schema,
+                model_temperature=model_temperature
+            )
+            cached = cache.get(cache_key, pydantic_output_schema)
+            if cached is not None:
+                return cached
+
+        # short-circuit near-duplicates of already classified inputs (a sample of hits is still verified)
+        similarity_namespace, similar = None, None
+        if similarity_index is not None and isinstance(user_message.content, str):
+            _check_output_schema(pydantic_output_schema)
+            similarity_namespace = similarity_index.namespace(
+                model_provider, model_name, system_prompt, pydantic_output_schema, model_temperature
+            )
+            similar = similarity_index.lookup(similarity_namespace, user_message.content, pydantic_output_schema)
+            if similar is not None and not similarity_index.should_verify():
+                return similar
 
         # get response
         llm_json = _init_llm(
@@ -148,8 +338,249 @@ async def agenerate_structured_output(
             pydantic_output_schema=pydantic_output_schema,
             model_temperature=model_temperature,
             timeout_per_attempt=timeout_per_attempt,
-            max_retries=max_retries
+            max_retries=max_retries,
+            include_raw=rate_limiter is not None
         )
-        response = await llm_json.ainvoke([system_prompt, user_message])
+        if rate_limiter is None:
+            response = await llm_json.ainvoke([system_prompt, user_message])
+        else:
+            response = await _ainvoke_rate_limited(
+                llm_json, [system_prompt, user_message], rate_limiter, model_provider, model_name
+            )
+            if response.get("parsing_error") is not None:
+                raise response["parsing_error"]
+            response = response["parsed"]
+        if cache is not None and response is not None:
+            cache.put(cache_key, response)
+        if similarity_namespace is not None and response is not None:
+            if similar is not None:
+                similarity_index.record_verification(similar, response)
+            else:
+                similarity_index.add(similarity_namespace, user_message.content, response)
 
         return response
+
+
+_BATCH_INSTRUCTIONS = (
+    "You will receive several items, each wrapped in <item id=\"N\">...</item>. "
+    "Process every item independently, following the instructions above, "
+    "and return exactly one entry in `items` per input item, with the same `id`."
+)
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for packing requests."""
+    return len(text) // 4 + 1
+
+@lru_cache(maxsize=64)
+def _batch_output_schema(pydantic_output_schema: BaseModel) -> BaseModel:
+    """Builds (once per schema) the list-of-schema wrapper used by batched requests."""
+    item_schema = _pydantic().create_model(
+        f"{pydantic_output_schema.__name__}BatchItem",
+        id=(int, ...),
+        output=(pydantic_output_schema, ...)
+    )
+    return _pydantic().create_model(
+        f"{pydantic_output_schema.__name__}Batch",
+        items=(List[item_schema], ...)
+    )
+
+def _pack_batches(texts: List[str], system_tokens: int, max_items_per_request: int, max_tokens_per_request: int) -> List[List[int]]:
+    """Greedily packs item indices into as few requests as the size limits allow."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = system_tokens
+    for i, text in enumerate(texts):
+        item_tokens = _estimate_tokens(text) + 8  # tag overhead
+        if current and (len(current) >= max_items_per_request or current_tokens + item_tokens > max_tokens_per_request):
+            batches.append(current)
+            current = []
+            current_tokens = system_tokens
+        current.append(i)
+        current_tokens += item_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _raw_structured_args(raw: Any) -> Dict[str, Any]:
+    """Extracts the unvalidated structured payload from a raw LLM message."""
+    tool_calls = getattr(raw, "tool_calls", None) or []
+    if tool_calls:
+        return tool_calls[0].get("args", {}) or {}
+    content = getattr(raw, "content", raw)
+    if isinstance(content, str):
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            return {}
+    return content if isinstance(content, dict) else {}
+
+def _validate_batch_items(payload: Any, n_items: int, pydantic_output_schema: BaseModel) -> Dict[int, BaseModel]:
+    """Validates each item of a batched response on its own, so one bad item does not discard the others."""
+    valid: Dict[int, BaseModel] = {}
+    if isinstance(payload, _pydantic().BaseModel):
+        for item in payload.items:
+            if 0 <= item.id < n_items:
+                valid[item.id] = item.output
+        return valid
+    for item in payload.get("items", []) if isinstance(payload, dict) else []:
+        try:
+            item_id = int(item["id"])
+            output = pydantic_output_schema.model_validate(item["output"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= item_id < n_items:
+            valid[item_id] = output
+    return valid
+
+async def agenerate_structured_output_batch(
+        model_provider: Literal['openai', 'google_genai'], 
+        model_name: str, 
+        system_prompt: str | SystemMessage,
+        user_messages: List[str | HumanMessage],
+        pydantic_output_schema: BaseModel,
+        model_temperature: float = 0.0, 
+        timeout_per_attempt: int = 60, 
+        max_retries: int = 1,
+        cache: ResponseCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        max_items_per_request: int = 20,
+        max_tokens_per_request: int = 16_000,
+        max_concurrent_requests: int = 4
+    ) -> List[Optional[BaseModel]]:
+        """Generates one JSON output (as defined by pydantic_output_schema) per user message, packing several messages per LLM request.
+
+        The system prompt is sent once per request, and the messages are wrapped in a list-of-schema output.
+        Items missing from the batched output, or failing validation, are retried individually.
+
+        Args:
+            model_provider (Literal['openai', 'google_genai']): The LLM provider
+            model_name (str): The LLM model name
+            system_prompt (str | SystemMessage): The system prompt, shared by all the messages
+            user_messages (List[str | HumanMessage]): The user messages, one per item
+            pydantic_output_schema (BaseModel): The Pydantic output schema of a single item
+            model_temperature (float, optional): The model temperature. Defaults to 0.0.
+            timeout_per_attempt (int, optional): The timeout after which an attempt has to fail. Defaults to 60.
+            max_retries (int, optional): The maximum number of retries in case of failure. Defaults to 1.
+            cache (ResponseCache | None, optional): On-disk response cache, looked up per item. Defaults to None.
+            rate_limiter (RateLimiter | None, optional): Shared rate limiter, applied to every request. Defaults to None.
+            max_items_per_request (int, optional): The maximum number of messages packed in one request. Defaults to 20.
+            max_tokens_per_request (int, optional): The (estimated) prompt token budget of one request. Defaults to 16_000.
+            max_concurrent_requests (int, optional): The maximum number of batched requests in flight. Defaults to 4.
+
+        Returns:
+            List[BaseModel | None]: The LLM responses as Pydantic objects, in the same order as `user_messages`.
+                                    None for items that failed even when retried individually.
+        """
+
+        # make sure messages are of correct type
+        if isinstance(system_prompt, str):
+            system_prompt = _messages().SystemMessage(content=system_prompt)
+        texts = []
+        for user_message in user_messages:
+            text = user_message.content if isinstance(user_message, _messages().HumanMessage) else user_message
+            if not isinstance(text, str):
+                raise ValueError(f"Invalid value in param `user_messages`. Expected text content, received type {type(text)}.")
+            texts.append(text)
+        _check_output_schema(pydantic_output_schema)
+
+        results: List[Optional[BaseModel]] = [None] * len(texts)
+
+        # serve from cache if possible
+        pending = list(range(len(texts)))
+        if cache is not None:
+            cache_keys = [
+                make_cache_key(
+                    model_provider=model_provider,
+                    model_name=model_name,
+                    system_prompt=system_prompt,
+                    user_message=text,
+                    pydantic_output_schema=pydantic_output_schema,
+                    model_temperature=model_temperature
+                )
+                for text in texts
+            ]
+            pending = []
+            for i, key in enumerate(cache_keys):
+                results[i] = cache.get(key, pydantic_output_schema)
+                if results[i] is None:
+                    pending.append(i)
+
+        # one system prompt per request, with the batch instructions appended
+        batch_system_prompt = _messages().SystemMessage(content=f"{system_prompt.content}\n\n{_BATCH_INSTRUCTIONS}")
+        llm_batch = _init_llm(
+            model_provider=model_provider,
+            model_name=model_name,
+            pydantic_output_schema=_batch_output_schema(pydantic_output_schema),
+            model_temperature=model_temperature,
+            timeout_per_attempt=timeout_per_attempt,
+            max_retries=max_retries,
+            include_raw=True
+        )
+        batches = _pack_batches(
+            texts=[texts[i] for i in pending],
+            system_tokens=_estimate_tokens(batch_system_prompt.content),
+            max_items_per_request=max_items_per_request,
+            max_tokens_per_request=max_tokens_per_request
+        )
+        sem = asyncio.Semaphore(max_concurrent_requests)
+
+        async def run_one(i: int):
+            try:
+                async with sem:
+                    results[i] = await agenerate_structured_output(
+                        model_provider=model_provider,
+                        model_name=model_name,
+                        system_prompt=system_prompt,
+                        user_message=texts[i],
+                        pydantic_output_schema=pydantic_output_schema,
+                        model_temperature=model_temperature,
+                        timeout_per_attempt=timeout_per_attempt,
+                        max_retries=max_retries,
+                        cache=cache,
+                        rate_limiter=rate_limiter
+                    )
+            except Exception:
+                results[i] = None
+
+        async def run_batch(batch: List[int]):
+            item_ids = [pending[j] for j in batch]
+            if len(item_ids) == 1:
+                await run_one(item_ids[0])
+                return
+
+            user_message = _messages().HumanMessage(content="\n".join(
+                f'<item id="{local_id}">\n{texts[i]}\n</item>' for local_id, i in enumerate(item_ids)
+            ))
+            try:
+                async with sem:
+                    if rate_limiter is None:
+                        response = await llm_batch.ainvoke([batch_system_prompt, user_message])
+                    else:
+                        response = await _ainvoke_rate_limited(
+                            llm_batch, [batch_system_prompt, user_message], rate_limiter, model_provider, model_name
+                        )
+                payload = response["parsed"] if response.get("parsed") is not None else _raw_structured_args(response.get("raw"))
+                valid = _validate_batch_items(payload, len(item_ids), pydantic_output_schema)
+            except Exception:
+                valid = {}
+
+            # store valid items; split out the rest and retry them one by one
+            retry = []
+            for local_id, i in enumerate(item_ids):
+                if local_id in valid:
+                    results[i] = valid[local_id]
+                    if cache is not None:
+                        cache.put(cache_keys[i], results[i])
+                else:
+                    retry.append(i)
+            await asyncio.gather(*(run_one(i) for i in retry))
+
+        await asyncio.gather(*(run_batch(batch) for batch in batches))
+
+        return results
+
+def generate_structured_output_batch(*args, **kwargs) -> List[Optional[BaseModel]]:
+    """
+    Synchronous wrapper around agenerate_structured_output_batch (uses asyncio.run).
+    """
+    return asyncio.run(agenerate_structured_output_batch(*args, **kwargs))
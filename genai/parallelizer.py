@@ -1,69 +1,822 @@
 # parallelizer.py
 import os
 import json
+import time
+import uuid
+import random
+import socket
 import asyncio
-from typing import Awaitable, Callable, Iterable, Tuple, Any, List, Dict
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Optional, Sequence, Tuple, Any, List, Dict, Union
 
-from tqdm.asyncio import tqdm  # modern tqdm with asyncio helpers
+from resume_store import KeyFn, ResumeStore, input_key, legacy_key
+from rate_limiter import is_rate_limit_error
+from run_metrics import RunMetrics
 
 JsonDict = Dict[str, Any]
+Inputs = Union[Iterable[Tuple[Any, Any]], AsyncIterable[Tuple[Any, Any]]]
 
 
-def _load_jsonl(path: str) -> Dict[int, Any]:
-    """
-    Load a JSONL resume file mapping index -> result.
-    Lines with JSON errors are skipped (handles partial writes).
-    """
-    ext = os.path.splitext(path)[1].lower()
-    if not ext == ".jsonl":
-        raise ValueError(f"Expected a '.jsonl' filepath for `cache_jsonl_path`; received extension '{ext}'")
+class _Line:
+    """One encoded JSONL record, with the resume key and error flag it carries."""
+    __slots__ = ("data", "key", "error")
 
-    done: Dict[int, Any] = {}
-    if not os.path.exists(path):
-        return done
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                if "i" in obj:
-                    done[int(obj["i"])] = obj.get("result")
-            except json.JSONDecodeError:
-                # Skip corrupted/partial lines
-                continue
-    return done
+    def __init__(self, obj: JsonDict):
+        self.data = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        self.key = obj.get("k")
+        result = obj.get("result")
+        self.error = isinstance(result, dict) and result.get("error") is True
 
 
 class _JsonlAppender:
     """
-    Async-friendly appender for a JSONL file (with an internal asyncio.Lock).
+    Async-friendly appender for a JSONL file, with three durability modes:
+        - "record": write + flush + fsync per record, under an asyncio.Lock
+                    (`write` returns once the record is on disk).
+        - "group":  records are queued and a background task commits them together,
+                    every `group_size` records or `group_interval_ms`, with one fsync per group
+                    (`write` still returns once the record is on disk).
+        - "os":     like "group", but flushed to the OS without fsync and `write` does not wait
+                    (fastest; the last records may be lost on power failure, not on process crash
+                    once flushed).
     Use:
-        app = _JsonlAppender(path)
+        app = _JsonlAppender(path, durability="group")
         await app.open()
         await app.write({"i": 1, "result": ...})
-        await app.close()
+        await app.close()  # flushes everything still queued
+
+    `on_commit`, if given, is called after each commit with the (key, offset, length, error)
+    of the committed lines, e.g. to index them while the run is still going.
     """
-    def __init__(self, path: str):
+    def __init__(self, path: str, durability: str = "group", group_size: int = 256, group_interval_ms: float = 20.0,
+                 metrics: Optional[RunMetrics] = None,
+                 on_commit: Optional[Callable[[List[Tuple[str, int, int, int]]], None]] = None):
+        if durability not in ("record", "group", "os"):
+            raise ValueError(f"Invalid value for param `durability`. Pick one of ['record', 'group', 'os'], received '{durability}'.")
         self.path = path
+        self.durability = durability
+        self.group_size = group_size
+        self.group_interval = group_interval_ms / 1000.0
+        self.metrics = metrics or RunMetrics()
+        self.on_commit = on_commit
         self._f = None
         self._lock = asyncio.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
 
     async def open(self):
-        self._f = open(self.path, "a", encoding="utf-8")
+        self._f = open(self.path, "ab")
+        if self.durability != "record":
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._run_writer())
 
     async def write(self, obj: JsonDict):
-        line = json.dumps(obj, ensure_ascii=False)
-        async with self._lock:
-            self._f.write(line + "\n")
-            self._f.flush()
+        t0 = time.perf_counter()
+        try:
+            await self._write(_Line(obj))
+        finally:
+            self.metrics.writer_waited(time.perf_counter() - t0)
+
+    async def _write(self, line: _Line):
+        if self.durability == "record":
+            async with self._lock:
+                self._commit([line])
+            return
+
+        if self._writer.done():
+            # surface the writer failure (e.g. disk full) to the caller
+            self._writer.result()
+        if self.durability == "os":
+            self._queue.put_nowait((line, None))
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((line, fut))
+        await fut
+
+    def _commit(self, lines: List[_Line]):
+        t0 = time.perf_counter()
+        offset = self._f.tell()
+        self._f.write(b"".join(line.data for line in lines))
+        self._f.flush()
+        if self.durability != "os":
             os.fsync(self._f.fileno())
+        self.metrics.committed(time.perf_counter() - t0)
+        if self.on_commit is not None:
+            entries = []
+            for line in lines:
+                if line.key is not None:
+                    entries.append((line.key, offset, len(line.data), int(line.error)))
+                offset += len(line.data)
+            self.on_commit(entries)
+
+    async def _run_writer(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is None:
+                break
+            # gather the group: everything queued, plus what producers that are ready right now
+            # add within one loop iteration; commit at `group_size` records or after `group_interval`
+            batch = [item]
+            deadline = loop.time() + self.group_interval
+            while len(batch) < self.group_size and loop.time() < deadline:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0)
+                    if self._queue.empty():
+                        break
+                    continue
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+
+            # write + fsync off the event loop, so workers keep running meanwhile
+            try:
+                await asyncio.to_thread(self._commit, [line for line, _ in batch])
+            except BaseException as e:
+                for _, fut in batch:
+                    if fut is not None and not fut.done():
+                        fut.set_exception(e if isinstance(e, Exception) else RuntimeError("JSONL writer stopped"))
+                raise
+            for _, fut in batch:
+                if fut is not None and not fut.done():
+                    fut.set_result(None)
 
     async def close(self):
-        if self._f:
-            self._f.close()
-            self._f = None
+        try:
+            if self._writer is not None:
+                writer, self._writer = self._writer, None
+                if not writer.done():
+                    self._queue.put_nowait(None)
+                try:
+                    await asyncio.shield(writer)
+                except asyncio.CancelledError:
+                    # flush what is already queued anyway, then propagate the cancellation
+                    await writer
+                    raise
+        finally:
+            if self._f:
+                self._f.close()
+                self._f = None
+
+
+async def _aiter_inputs(inputs: Inputs) -> AsyncIterator[Tuple[Any, Any]]:
+    """Iterates sync or async iterables alike, without materializing them."""
+    if hasattr(inputs, "__aiter__"):
+        async for item in inputs:
+            yield item
+    else:
+        for item in inputs:
+            yield item
+
+
+async def _aenumerate(inputs: Inputs, start: int = 0) -> AsyncIterator[Tuple[int, Tuple[Any, Any]]]:
+    i = start
+    async for item in _aiter_inputs(inputs):
+        yield i, item
+        i += 1
+
+
+def classify_error(exc: BaseException) -> str:
+    """
+    Classifies a failure of `fn`:
+        - "throttle":  the provider asked us to slow down (HTTP 429 / quota exhausted)
+        - "timeout":   the call timed out
+        - "fatal":     retrying cannot help (programming errors, HTTP 4xx other than 408/409/429)
+        - "retryable": anything else (connection errors, HTTP 5xx, invalid LLM output, ...)
+    """
+    if is_rate_limit_error(exc):
+        return "throttle"
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(exc).__name__:
+        return "timeout"
+    if isinstance(exc, (TypeError, AttributeError, NameError, NotImplementedError)):
+        return "fatal"
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 409):
+        return "fatal"
+    return "retryable"
+
+
+def _retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Reads a Retry-After hint carried by the exception (attribute or HTTP response header)."""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        if headers is not None:
+            value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class _RetryPolicy:
+    retries: int
+    base_delay: float
+    max_delay: float
+
+    def delay(self, exc: BaseException, attempt: int) -> float:
+        """Retry-After hint if any, else exponential backoff with jitter (0.5x-1x)."""
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return backoff * random.uniform(0.5, 1.0)
+
+
+class _ConcurrencyLimiter:
+    """
+    Semaphore whose limit can change at runtime.
+    With `adaptive=True` the limit follows AIMD: +1 per `limit` healthy calls,
+    halved on throttling / timeouts (at most once per cooldown), and cut by 10%
+    when the recent latencies drift above `latency_tolerance` x the baseline latency.
+
+    Latencies are compared at a low percentile (p10) over windows of `latency_window`
+    successful calls: the recent window against the lowest of the last `baseline_windows`
+    ones. Both sides are the same statistic of the same distribution, so the spread of a
+    healthy service (lognormal tails) does not read as overload, and the baseline forgets
+    old minima once they leave the last windows, like the periodic reset of Vegas limiters.
+    """
+    def __init__(self, concurrency: int, adaptive: bool = False, min_concurrency: int = 1,
+                 max_concurrency: Optional[int] = None, latency_tolerance: float = 2.0,
+                 latency_window: int = 50, baseline_windows: int = 10):
+        self.limit = float(concurrency)
+        self.adaptive = adaptive
+        self.min_limit = min_concurrency
+        self.max_limit = max_concurrency or concurrency
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._latency_ewma: Optional[float] = None
+        self.latency_window = latency_window
+        self._window: List[float] = []
+        # p10 of the last completed windows; the baseline is their minimum
+        self._window_lows: deque = deque(maxlen=baseline_windows)
+        self._last_decrease = 0.0
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+                else:
+                    self._wake()  # we were woken up: pass the slot on
+                raise
+        self.in_flight += 1
+
+    def acquire_extra(self):
+        """Takes a slot without waiting, even above the limit (speculative calls, capped by their caller)."""
+        self.in_flight += 1
+
+    def release(self, outcome: str, latency: float):
+        self.in_flight -= 1
+        if self.adaptive:
+            self._adapt(outcome, latency)
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                free -= 1
+
+    def _decrease(self, factor: float, cooldown: float):
+        now = time.monotonic()
+        if now - self._last_decrease >= cooldown:
+            self.limit = max(self.min_limit, self.limit * factor)
+            self._last_decrease = now
+
+    def _adapt(self, outcome: str, latency: float):
+        # one decrease per "round trip", so a burst of failures from the same window counts once
+        cooldown = self._latency_ewma or 1.0
+        if outcome in ("throttle", "timeout"):
+            self._decrease(0.5, cooldown)
+            return
+        if outcome != "ok":
+            return
+        self._latency_ewma = latency if self._latency_ewma is None else 0.9 * self._latency_ewma + 0.1 * latency
+        self._window.append(latency)
+        if len(self._window) >= self.latency_window:
+            self._window.sort()
+            recent_low = self._window[len(self._window) // 10]
+            self._window = []
+            baseline = min(self._window_lows) if self._window_lows else None
+            self._window_lows.append(recent_low)
+            if baseline is not None and recent_low > self.latency_tolerance * baseline:
+                self._decrease(0.9, cooldown)
+                return
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+
+class _Hedger:
+    """
+    Decides when to send a speculative second call for a slow item: once it runs past the
+    `quantile` latency of the recent successful calls, as long as hedges stay under
+    `max_ratio` of the calls (the cap on extra load), plus an initial allowance of `burst`
+    hedges so that the first calls of a run are covered too.
+    """
+    def __init__(self, quantile: float, max_ratio: float, window: int = 1000, burst: int = 10):
+        if not 0 < quantile < 1:
+            raise ValueError(f"Invalid value for param `hedge_quantile`. Expected a value in (0, 1), received {quantile}.")
+        self.quantile = quantile
+        self.max_ratio = max_ratio
+        # enough history for a couple of calls to lie past the quantile (40 for p95, 200 for p99)
+        self.min_samples = max(20, int(round(2 / (1 - quantile))))
+        self.burst = burst
+        self.calls = 0
+        self.hedges = 0
+        self.delay: Optional[float] = None
+        self.ready = asyncio.Event()  # set once there is enough history to compute `delay`
+        self._latencies: deque = deque(maxlen=window)
+        self._stale = 0
+
+    def record(self, latency: float):
+        self._latencies.append(latency)
+        # re-sorting the window on every call is wasteful: refresh the percentile every few calls
+        self._stale += 1
+        if len(self._latencies) >= self.min_samples and (self.delay is None or self._stale >= 16):
+            ranked = sorted(self._latencies)
+            self.delay = ranked[min(len(ranked) - 1, int(self.quantile * len(ranked)))]
+            self._stale = 0
+            self.ready.set()
+
+    def allow(self) -> bool:
+        return self.hedges < self.burst + self.max_ratio * self.calls
+
+
+def _remaining(deadline: Optional[float], loop: asyncio.AbstractEventLoop) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - loop.time())
+
+
+async def _wait_hedge_point(primary: asyncio.Future, hedger: _Hedger, deadline: Optional[float]) -> bool:
+    """Waits until `primary` has run for the hedging delay; False if it finished (or timed out) first."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    if not hedger.ready.is_set():
+        # first calls of the run: no latency history yet, wait for it
+        ready = asyncio.ensure_future(hedger.ready.wait())
+        try:
+            await asyncio.wait({primary, ready}, timeout=_remaining(deadline, loop), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            ready.cancel()
+        if not hedger.ready.is_set():
+            return False
+    wait = hedger.delay - (loop.time() - started)
+    if deadline is not None:
+        wait = min(wait, deadline - loop.time())
+    if wait > 0:
+        await asyncio.wait({primary}, timeout=wait)
+    return not primary.done() and (deadline is None or loop.time() < deadline)
+
+
+async def _call(
+    fn: Callable[..., Awaitable[Any]],
+    a: Any,
+    b: Any,
+    timeout: Optional[float],
+    hedger: Optional[_Hedger],
+    limiter: _ConcurrencyLimiter,
+    metrics: RunMetrics,
+) -> Any:
+    """One attempt of `fn(a, b)`, bounded by `timeout`, hedged with a second call if it is slow."""
+    if hedger is None:
+        return await asyncio.wait_for(fn(a, b), timeout)
+
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    hedger.calls += 1
+    primary = asyncio.ensure_future(fn(a, b))
+    hedge = None
+    try:
+        if await _wait_hedge_point(primary, hedger, deadline) and hedger.allow():
+            limiter.acquire_extra()
+            hedger.hedges += 1
+            metrics.incr("hedged")
+            hedge = asyncio.ensure_future(fn(a, b))
+
+        # first success wins; a failure only counts once both calls failed
+        pending = {primary} if hedge is None else {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=_remaining(deadline, loop), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        metrics.incr("hedge_wins")
+                    return task.result()
+        raise primary.exception()
+    finally:
+        for task in (primary, hedge):
+            if task is None:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # retrieved: no "exception never retrieved" warning for the loser
+        if hedge is not None:
+            limiter.release("hedge", 0.0)
+
+
+async def _process_item(
+    fn: Callable[..., Awaitable[Any]],
+    i: int,
+    key: str,
+    a: Any,
+    b: Any,
+    app: _JsonlAppender,
+    limiter: _ConcurrencyLimiter,
+    policy: _RetryPolicy,
+    metrics: RunMetrics,
+    timeout: Optional[float] = None,
+    hedger: Optional[_Hedger] = None,
+) -> Tuple[int, Any]:
+    """Calls `fn(a, b)` with retries, persisting the result (or {"error": True})."""
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        attempt += 1
+        kind = None
+        try:
+            await limiter.acquire()
+            metrics.call_started()
+            t0 = loop.time()
+            try:
+                res = await _call(fn, a, b, timeout, hedger, limiter, metrics)
+            except Exception as e:
+                kind = classify_error(e)
+                raise
+            finally:
+                latency = loop.time() - t0
+                limiter.release(kind or "ok", latency)
+                metrics.call_finished(latency, kind)
+            if hedger is not None:
+                hedger.record(latency)
+        except Exception as e:
+            if kind == "fatal" or attempt > policy.retries:
+                res = {"error": True}
+                await app.write({"i": i, "k": key, "result": res})
+                metrics.incr("failed")
+                return (i, res)
+            metrics.incr("retries")
+            await asyncio.sleep(policy.delay(e, attempt))
+            continue
+        # Persist success, outside the retried block: a writer failure is not a failure of `fn`
+        await app.write({"i": i, "k": key, "result": res})
+        metrics.incr("succeeded")
+        return (i, res)
+
+
+async def _map_stream(
+    fn: Callable[..., Awaitable[Any]],
+    inputs: Inputs,
+    store: ResumeStore,
+    key_fn: KeyFn,
+    app: _JsonlAppender,
+    concurrency: int,
+    retries: int,
+    retry_base_delay: float,
+    retry_max_delay: float,
+    adaptive_concurrency: bool,
+    min_concurrency: int,
+    max_concurrency: Optional[int],
+    return_only_missing: bool,
+    ordered: bool,
+    max_in_flight: Optional[int],
+    reorder_buffer_size: Optional[int],
+    progress: bool,
+    start_index: int,
+    metrics: RunMetrics,
+    record_cached: bool = False,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+    hedge_quantile: Optional[float] = None,
+    hedge_max_ratio: float = 0.05,
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Core engine: pulls inputs lazily and keeps at most `max_in_flight` tasks alive.
+    Yields (index, result) in completion order, or in index order through a reorder
+    buffer of at most `reorder_buffer_size` results (input pulling pauses while it is full).
+
+    Inputs sharing a key are coalesced: `fn` runs once per distinct key, duplicates arriving
+    while it is in flight wait for its result, later ones are served from the store, and each
+    duplicate index still gets its own record in the log.
+
+    Past the `deadline`, input pulling stops and the items still in flight are cancelled
+    and yielded as {"error": True, "deadline_exceeded": True}, without being persisted.
+    """
+    from tqdm.asyncio import tqdm
+
+    loop = asyncio.get_running_loop()
+    deadline_at = None if deadline is None else loop.time() + deadline
+    hedger = None if hedge_quantile is None else _Hedger(hedge_quantile, hedge_max_ratio)
+
+    limiter = _ConcurrencyLimiter(
+        concurrency,
+        adaptive=adaptive_concurrency,
+        min_concurrency=min_concurrency,
+        max_concurrency=max_concurrency if adaptive_concurrency else concurrency,
+    )
+    policy = _RetryPolicy(retries=retries, base_delay=retry_base_delay, max_delay=retry_max_delay)
+    max_in_flight = max_in_flight or 2 * limiter.max_limit
+    reorder_buffer_size = reorder_buffer_size or 4 * max_in_flight
+    metrics.set_gauge("concurrency_limit", lambda: int(limiter.limit))
+    metrics.set_gauge("tasks_in_window", lambda: len(in_flight))
+    metrics.set_gauge("reorder_buffer", lambda: len(buffer))
+    # task -> (index, key of the call it leads, None for duplicate records)
+    in_flight: Dict[asyncio.Task, Tuple[int, Optional[str]]] = {}
+
+    # dedup: key -> indices waiting on the in-flight call of that key, and the latest results
+    # (bridging the moment between a call returning and its record being indexed)
+    followers: Dict[str, List[int]] = {}
+    recent: OrderedDict = OrderedDict()
+
+    # ordered mode: results waiting for all the lower indices (None = nothing to emit)
+    _SKIP = object()
+    buffer: Dict[int, Any] = {}
+    next_index = start_index
+
+    total = len(inputs) if hasattr(inputs, "__len__") else None
+    bar = tqdm(total=total, desc="Processing", disable=not progress)
+
+    def emit(i: int, res: Any) -> List[Tuple[int, Any]]:
+        nonlocal next_index
+        bar.update(1)
+        metrics.incr("items")
+        if not ordered:
+            return [] if res is _SKIP else [(i, res)]
+        buffer[i] = res
+        ready = []
+        while next_index in buffer:
+            res = buffer.pop(next_index)
+            if res is not _SKIP:
+                ready.append((next_index, res))
+            next_index += 1
+        return ready
+
+    async def lead(i: int, key: str, a: Any, b: Any) -> List[Tuple[int, Any]]:
+        i, res = await _process_item(fn, i, key, a, b, app, limiter, policy, metrics, timeout, hedger)
+        recent[key] = res
+        if len(recent) > max_in_flight:
+            recent.popitem(last=False)
+        dups = followers.pop(key)
+        if dups:
+            await asyncio.gather(*(app.write({"i": j, "k": key, "result": res}) for j in dups))
+        return [(i, res)] + [(j, res) for j in dups]
+
+    async def record_duplicate(i: int, key: str, res: Any, skip: bool) -> List[Tuple[int, Any]]:
+        await app.write({"i": i, "k": key, "result": res})
+        return [(i, _SKIP if skip else res)]
+
+    def past_deadline() -> bool:
+        return deadline_at is not None and loop.time() >= deadline_at
+
+    def give_up(i: int) -> List[Tuple[int, Any]]:
+        metrics.incr("deadline_exceeded")
+        return emit(i, {"error": True, "deadline_exceeded": True})
+
+    async def expire() -> List[Tuple[int, Any]]:
+        # deadline reached: cancel what is in flight (it is not persisted, the next run retries it)
+        tasks = list(in_flight.items())
+        in_flight.clear()
+        for task, _ in tasks:
+            task.cancel()
+        await asyncio.gather(*(task for task, _ in tasks), return_exceptions=True)
+        ready = []
+        for task, (i, key) in tasks:
+            if not task.cancelled() and task.exception() is None:
+                # finished in the meantime
+                for j, res in task.result():
+                    ready.extend(emit(j, res))
+                continue
+            for j in [i] + (followers.pop(key, []) if key is not None else []):
+                ready.extend(give_up(j))
+        return ready
+
+    async def wait_some() -> List[Tuple[int, Any]]:
+        done, _ = await asyncio.wait(
+            in_flight, timeout=_remaining(deadline_at, loop), return_when=asyncio.FIRST_COMPLETED
+        )
+        if not done:
+            return await expire()
+        ready = []
+        for task in done:
+            del in_flight[task]
+            for i, res in task.result():
+                ready.extend(emit(i, res))
+        return ready
+
+    try:
+        async for i, (a, b) in _aenumerate(inputs, start_index):
+            if past_deadline():
+                for pair in give_up(i):
+                    yield pair
+                break
+            key = key_fn(a, b)
+            # Duplicate of a call in flight: wait for its result
+            if key in followers:
+                followers[key].append(i)
+                metrics.incr("deduplicated")
+                continue
+
+            # Already cached? Emit immediately (no write), unless computed earlier in this run
+            if key in recent:
+                found, cached, offset = True, recent[key], store.opened_bytes
+            else:
+                found, cached, offset = store.get_with_offset(key)
+            if not found and store.has_legacy:
+                found, cached = store.get(legacy_key(i))
+                offset = -1
+            if found and offset < store.opened_bytes and not record_cached:
+                metrics.incr("cached")
+                for pair in emit(i, _SKIP if return_only_missing else cached):
+                    yield pair
+                continue
+
+            # Keep the window bounded: in-flight tasks + buffered (unordered) results
+            while len(in_flight) >= max_in_flight or (ordered and len(buffer) >= reorder_buffer_size):
+                for pair in await wait_some():
+                    yield pair
+            if past_deadline():
+                for pair in give_up(i):
+                    yield pair
+                break
+
+            if found:
+                # Duplicate of an input completed earlier: only record its index
+                from_cache = offset < store.opened_bytes
+                metrics.incr("cached" if from_cache else "deduplicated")
+                task = asyncio.create_task(record_duplicate(i, key, cached, skip=from_cache and return_only_missing))
+                in_flight[task] = (i, None)
+            else:
+                followers[key] = []
+                in_flight[asyncio.create_task(lead(i, key, a, b))] = (i, key)
+
+        # Drain
+        while in_flight:
+            for pair in await wait_some():
+                yield pair
+    finally:
+        # Consumer stopped early or got cancelled: do not leave orphan tasks behind
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        bar.close()
+
+
+async def run_async_map_stream(
+    fn: Callable[..., Awaitable[Any]],
+    inputs: Inputs,
+    cache_jsonl_path: str,
+    concurrency: int = 100,
+    retries: int = 3,
+    retry_base_delay: float = 0.5,
+    return_only_missing: bool = False,
+    ordered: bool = False,
+    retry_max_delay: float = 60.0,
+    adaptive_concurrency: bool = False,
+    min_concurrency: int = 1,
+    max_concurrency: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    reorder_buffer_size: Optional[int] = None,
+    progress: bool = True,
+    start_index: int = 0,
+    metrics: Optional[RunMetrics] = None,
+    durability: str = "group",
+    group_commit_size: int = 256,
+    group_commit_interval_ms: float = 20.0,
+    key_fn: Optional[KeyFn] = None,
+    record_cached: bool = False,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+    hedge_quantile: Optional[float] = None,
+    hedge_max_ratio: float = 0.05,
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Streaming, bounded-memory variant of run_async_map (async generator).
+
+    Inputs are pulled lazily and only a bounded window of tasks is alive at any time,
+    so memory stays roughly constant regardless of the input size.
+    To stop early, wrap it in `contextlib.aclosing(...)` so in-flight tasks are cancelled promptly.
+
+    Args:
+        fn: async function called as `await fn(a, b)` for each (a, b) input.
+        inputs: sync or async iterable of 2-tuples. We enumerate() to get the index 'i'.
+        cache_jsonl_path: JSONL file where we append {"i": idx, "k": key, "result": ...} per completion.
+                   Results are resumed by content key (see resume_store.py), so inputs may be reordered.
+        concurrency: max concurrent `fn` calls (the starting point if `adaptive_concurrency`).
+        retries: transient retries per item before writing {"error": True}.
+                 Fatal errors (see classify_error) are not retried.
+        retry_base_delay: exponential backoff base (0.5, 1.0, 2.0, ... with jitter).
+                          Retry-After hints carried by the exception take precedence.
+        return_only_missing: if True, skip (do not yield) results already in the cache.
+        ordered: if True, yield in index order through a bounded reorder buffer;
+                 else yield in completion order.
+        retry_max_delay: cap of a single backoff / Retry-After wait.
+        adaptive_concurrency: if True, adjust the concurrency with AIMD: grow while latency
+                              stays healthy, cut back on throttling and timeouts.
+        min_concurrency: lower bound of the adaptive concurrency.
+        max_concurrency: upper bound of the adaptive concurrency. Defaults to 4 * concurrency.
+        max_in_flight: max tasks alive at once (running or backing off). Defaults to 2 * the (max) concurrency.
+        reorder_buffer_size: max completed results held back in ordered mode. Defaults to 4 * max_in_flight.
+        progress: show a tqdm progress bar.
+        start_index: index of the first input (used when `inputs` is a slice of a larger input set).
+        metrics: RunMetrics collecting throughput, latency percentiles, retries, in-flight depth
+                 and writer time; it also emits its periodic snapshots during the run.
+        durability: how results are persisted to `cache_jsonl_path`:
+                    "record" (fsync per record), "group" (one fsync per group commit)
+                    or "os" (OS-buffered, no fsync).
+        group_commit_size: max records per group commit.
+        group_commit_interval_ms: max time a record waits for its group commit.
+        key_fn: `key_fn(a, b) -> str` resume key of an input. Defaults to a hash of (a, b).
+                Inputs with the same key are deduplicated: `fn` runs once per distinct key
+                and the result is recorded and yielded for every index holding that key.
+        record_cached: if True, also record the index of inputs served from results of
+                       previous runs (one record per index, as needed by merge_shards).
+        timeout: max seconds per `fn` attempt; a timed out attempt is retried like a transient error.
+        deadline: max seconds for the whole run. Past it, no new input is pulled and the items
+                  still in flight are cancelled and yielded as {"error": True, "deadline_exceeded": True}
+                  (not persisted, so the next run computes them).
+        hedge_quantile: if set (e.g. 0.95), an attempt still running after that quantile of the recent
+                        successful latencies gets a second, speculative call; the first success wins
+                        and the other call is cancelled. Counted in the `hedged` / `hedge_wins` metrics.
+        hedge_max_ratio: cap on the extra load of hedging, as a fraction of the calls.
+
+    Yields:
+        (index, result) pairs.
+    """
+    metrics = metrics or RunMetrics()
+
+    # Indexed view over prior results (loaded lazily)
+    store = ResumeStore(cache_jsonl_path)
+    store.open()
+
+    # Writer
+    app = _JsonlAppender(
+        cache_jsonl_path,
+        durability=durability,
+        group_size=group_commit_size,
+        group_interval_ms=group_commit_interval_ms,
+        metrics=metrics,
+        on_commit=store.add_entries,
+    )
+    reporter = None
+    if metrics.snapshot_path is not None or metrics.on_snapshot is not None:
+        reporter = asyncio.create_task(metrics.run_periodic())
+    try:
+        await app.open()
+        async for pair in _map_stream(
+            fn, inputs, store, key_fn or input_key, app,
+            concurrency=concurrency,
+            retries=retries,
+            retry_base_delay=retry_base_delay,
+            retry_max_delay=retry_max_delay,
+            adaptive_concurrency=adaptive_concurrency,
+            min_concurrency=min_concurrency,
+            max_concurrency=max_concurrency or 4 * concurrency,
+            return_only_missing=return_only_missing,
+            ordered=ordered,
+            max_in_flight=max_in_flight,
+            reorder_buffer_size=reorder_buffer_size,
+            progress=progress,
+            start_index=start_index,
+            metrics=metrics,
+            record_cached=record_cached,
+            timeout=timeout,
+            deadline=deadline,
+            hedge_quantile=hedge_quantile,
+            hedge_max_ratio=hedge_max_ratio,
+        ):
+            yield pair
+    finally:
+        # Close writer, then index what it wrote
+        await app.close()
+        store.close()
+        if reporter is not None:
+            reporter.cancel()
+            await asyncio.gather(reporter, return_exceptions=True)
 
 
 async def run_async_map(
@@ -74,6 +827,7 @@ async def run_async_map(
     retries: int = 3,
     retry_base_delay: float = 0.5,
     return_only_missing: bool = False,
+    **kwargs,
 ) -> List[Tuple[int, Any]]:
     """
     Minimal concurrent map with progress + JSONL resume.
@@ -81,94 +835,390 @@ async def run_async_map(
     Args:
         fn: async function called as `await fn(a, b)` for each (a, b) input.
         inputs: iterable of 2-tuples. We enumerate() to get the index 'i'.
-        cache_jsonl_path: JSONL file where we append {"i": idx, "result": ...} per completion.
+        cache_jsonl_path: JSONL file where we append {"i": idx, "k": key, "result": ...} per completion.
                    This enables stop/restart without redoing finished items.
         concurrency: max in-flight tasks.
         retries: transient retries per item before writing {"error": True}.
         retry_base_delay: exponential backoff base (0.5, 1.0, 2.0, ...).
         return_only_missing: if True, return only results computed in this run;
                              else return merged (cache + new), sorted by index.
+        **kwargs: further options of run_async_map_stream (durability, key_fn, ...).
 
     Returns:
         List[(index, result)] sorted by index.
     """
-    # Load prior results
-    done_cache = _load_jsonl(cache_jsonl_path)
-
-    # Materialize inputs so we can enumerate and compute total
-    items = list(enumerate(inputs))  # [(i, (a, b)), ...]
-    total = len(items)
+    results = [
+        pair
+        async for pair in run_async_map_stream(
+            fn, inputs, cache_jsonl_path,
+            concurrency=concurrency,
+            retries=retries,
+            retry_base_delay=retry_base_delay,
+            return_only_missing=return_only_missing,
+            **kwargs,
+        )
+    ]
+    return sorted(results, key=lambda kv: kv[0])
 
-    # Output accumulator for *this* run
-    new_results: Dict[int, Any] = {}
 
-    # Writer
-    app = _JsonlAppender(cache_jsonl_path)
-    await app.open()
-
-    sem = asyncio.Semaphore(concurrency)
+def run_map(
+    fn: Callable[..., Awaitable[Any]],
+    inputs: Iterable[Tuple[Any, Any]],
+    cache_jsonl_path: str,
+    **kwargs,
+) -> List[Tuple[int, Any]]:
+    """
+    Synchronous wrapper around run_async_map (uses asyncio.run).
+    """
+    return asyncio.run(run_async_map(fn, inputs, cache_jsonl_path, **kwargs))
 
-    async def worker(i: int, a: Any, b: Any) -> Tuple[int, Any]:
-        # Already cached? Return immediately (no write)
-        if i in done_cache:
-            return (i, done_cache[i])
 
-        attempt = 0
-        while True:
-            attempt += 1
+def _run_chunk(fn: Callable[[Any, Any], Any], pairs: List[Tuple[Any, Any]]) -> List[Tuple[bool, Any]]:
+    """Runs in a worker process: applies `fn` to a chunk, capturing per-item failures."""
+    out = []
+    for a, b in pairs:
+        try:
+            out.append((True, fn(a, b)))
+        except Exception as e:
+            # make sure the exception survives the trip back to the parent
             try:
-                async with sem:
-                    res = await fn(a, b)
-                # Persist success
-                await app.write({"i": i, "result": res})
-                return (i, res)
+                import pickle
+                pickle.dumps(e)
             except Exception:
-                if attempt > retries:
-                    res = {"error": True}
-                    await app.write({"i": i, "result": res})
-                    return (i, res)
-                # basic exponential backoff
-                await asyncio.sleep(retry_base_delay * (2 ** (attempt - 1)))
-
-    # Build coroutines: skip cached if the caller wants only missing
-    coros = []
-    for i, (a, b) in items:
-        if return_only_missing and i in done_cache:
-            continue
-        coros.append(worker(i, a, b))
+                e = RuntimeError(f"{type(e).__name__}: {e}")
+            out.append((False, e))
+    return out
 
-    # Turn into tasks
-    tasks = [asyncio.create_task(c) for c in coros]
 
-    # Progress loop (tqdm.asyncio)
-    results: List[Tuple[int, Any]] = []
-    for fut in tqdm.as_completed(tasks, total=len(tasks), desc="Processing"):
-        results.append(await fut)
+class _ProcessPoolCaller:
+    """
+    Async `await caller(a, b)` facade over a process pool.
+    Calls made within the same event-loop iteration are grouped into chunks of up to
+    `chunk_size` items and sent to a worker in one round trip, to amortize IPC overhead.
+    """
+    def __init__(self, fn: Callable[[Any, Any], Any], executor: ProcessPoolExecutor, chunk_size: int):
+        self.fn = fn
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self._pending: List[Tuple[Any, Any, asyncio.Future]] = []
+        self._flush_scheduled = False
 
-    # Close writer
-    await app.close()
+    async def __call__(self, a: Any, b: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((a, b, fut))
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+        return await fut
 
-    # Store results from this run
-    for i, res in results:
-        new_results[i] = res
+    def _flush(self):
+        self._flush_scheduled = False
+        while self._pending:
+            chunk, self._pending = self._pending[:self.chunk_size], self._pending[self.chunk_size:]
+            futs = [fut for _, _, fut in chunk]
+            done = asyncio.get_running_loop().run_in_executor(
+                self.executor, _run_chunk, self.fn, [(a, b) for a, b, _ in chunk]
+            )
+            done.add_done_callback(lambda d, futs=futs: self._distribute(d, futs))
 
-    # Prepare return
-    if return_only_missing:
-        merged_pairs = sorted(new_results.items(), key=lambda kv: kv[0])
-    else:
-        merged = {**done_cache, **new_results}
-        merged_pairs = sorted(merged.items(), key=lambda kv: kv[0])
+    @staticmethod
+    def _distribute(done: asyncio.Future, futs: List[asyncio.Future]):
+        if done.cancelled() or done.exception() is not None:
+            exc = done.exception() if not done.cancelled() else asyncio.CancelledError()
+            for fut in futs:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for fut, (ok, value) in zip(futs, done.result()):
+            if fut.done():
+                continue
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
 
-    return merged_pairs
 
+async def run_async_process_map(
+    fn: Callable[[Any, Any], Any],
+    inputs: Iterable[Tuple[Any, Any]],
+    cache_jsonl_path: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 32,
+    retries: int = 3,
+    retry_base_delay: float = 0.5,
+    return_only_missing: bool = False,
+    **kwargs,
+) -> List[Tuple[int, Any]]:
+    """
+    Like run_async_map, but for plain sync, CPU-bound functions: `fn(a, b)` runs in a process pool.
+    Resume cache, retries and progress behave as in run_async_map; results are written by the parent.
 
-def run_map(
-    fn: Callable[..., Awaitable[Any]],
+    `fn`, inputs and results must be picklable (define `fn` at module level), and on Windows / macOS
+    the calling script needs the usual `if __name__ == "__main__":` guard.
+
+    Args:
+        fn: sync function called as `fn(a, b)` in a worker process.
+        inputs: iterable of 2-tuples. We enumerate() to get the index 'i'.
+        cache_jsonl_path: JSONL file where we append {"i": idx, "k": key, "result": ...} per completion.
+        workers: number of worker processes. Defaults to os.cpu_count().
+        chunk_size: items sent to a worker per round trip.
+        retries: transient retries per item before writing {"error": True}.
+        retry_base_delay: exponential backoff base (0.5, 1.0, 2.0, ... with jitter).
+        return_only_missing: if True, return only results computed in this run;
+                             else return merged (cache + new), sorted by index.
+        **kwargs: further options of run_async_map_stream (durability, key_fn, ...).
+
+    Returns:
+        List[(index, result)] sorted by index.
+    """
+    workers = workers or os.cpu_count() or 1
+    # enough items in flight to keep every worker busy with a queued chunk
+    kwargs.setdefault("concurrency", 2 * workers * chunk_size)
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        return await run_async_map(
+            _ProcessPoolCaller(fn, executor, chunk_size),
+            inputs,
+            cache_jsonl_path,
+            retries=retries,
+            retry_base_delay=retry_base_delay,
+            return_only_missing=return_only_missing,
+            **kwargs,
+        )
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def run_process_map(
+    fn: Callable[[Any, Any], Any],
     inputs: Iterable[Tuple[Any, Any]],
     cache_jsonl_path: str,
     **kwargs,
 ) -> List[Tuple[int, Any]]:
     """
-    Synchronous wrapper around run_async_map (uses asyncio.run).
+    Synchronous wrapper around run_async_process_map (uses asyncio.run).
     """
-    return asyncio.run(run_async_map(fn, inputs, cache_jsonl_path, **kwargs))
+    return asyncio.run(run_async_process_map(fn, inputs, cache_jsonl_path, **kwargs))
+
+
+class _RangeLease:
+    """
+    Lease on one index range, as a file in a shared directory.
+        - claim:   atomic create (O_EXCL); an expired lease is first renamed away,
+                   so only one of several competing workers can take it over.
+        - renew:   the owner rewrites the expiry (write + os.replace) while it works.
+        - release: the owner removes the file.
+    Expiry uses wall-clock time, so workers sharing a filesystem need roughly synced clocks.
+    """
+    def __init__(self, lease_dir: str, range_id: int, worker_id: str, lease_seconds: float):
+        self.path = os.path.join(lease_dir, f"range_{range_id:06d}.lease")
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+
+    def _read(self) -> Optional[JsonDict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, OSError):
+            # being written right now: treat as held
+            return {"worker": None, "expires": time.time() + self.lease_seconds}
+
+    def _content(self) -> str:
+        return json.dumps({"worker": self.worker_id, "expires": time.time() + self.lease_seconds})
+
+    def try_claim(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            lease = self._read()
+            if lease is not None and lease["expires"] > time.time():
+                return False
+            # expired (crashed worker): take it over, one winner only
+            stale = f"{self.path}.stale.{uuid.uuid4().hex}"
+            try:
+                os.rename(self.path, stale)
+            except FileNotFoundError:
+                return False
+            os.remove(stale)
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self._content())
+        return True
+
+    def renew(self) -> bool:
+        lease = self._read()
+        if lease is None or lease["worker"] != self.worker_id:
+            return False
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self._content())
+        os.replace(tmp, self.path)
+        return True
+
+    def release(self):
+        lease = self._read()
+        if lease is not None and lease["worker"] == self.worker_id:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+async def run_async_sharded_map(
+    fn: Callable[..., Awaitable[Any]],
+    inputs: Sequence[Tuple[Any, Any]],
+    work_dir: str,
+    worker_id: Optional[str] = None,
+    range_size: int = 1000,
+    lease_seconds: float = 300.0,
+    **kwargs,
+) -> int:
+    """
+    Cooperative sharded run: several processes (on one machine or on a shared filesystem)
+    call this with the same `inputs` and `work_dir`, and split the work between them.
+
+    Workers claim index ranges of `range_size` items through lease files in `work_dir/leases`,
+    renewed while they work; the range of a crashed worker is reclaimed once its lease expires.
+    Each worker writes its own shard `work_dir/shards/<worker_id>.jsonl` (its resume cache),
+    and a range is marked in `work_dir/done` only once every index in it has a result.
+    Call merge_shards() to get the results.
+
+    Args:
+        fn: async function called as `await fn(a, b)` for each (a, b) input.
+        inputs: sequence of 2-tuples, identical in every worker.
+        work_dir: shared directory for leases, done markers and shards.
+        worker_id: unique worker name. Defaults to "<hostname>-<pid>".
+        range_size: items per claimable range.
+        lease_seconds: lease duration; a lease not renewed for that long is reclaimed.
+        **kwargs: further options of run_async_map_stream (concurrency, retries, ...).
+                  `deadline` bounds the whole sharded run: past it no range is claimed, and the
+                  range cut short is left unmarked (and its lease released) for the next run.
+
+    Returns:
+        Number of ranges processed by this worker.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    lease_dir = os.path.join(work_dir, "leases")
+    done_dir = os.path.join(work_dir, "done")
+    shard_dir = os.path.join(work_dir, "shards")
+    for d in (lease_dir, done_dir, shard_dir):
+        os.makedirs(d, exist_ok=True)
+    shard_path = os.path.join(shard_dir, f"{worker_id}.jsonl")
+    kwargs.setdefault("progress", False)
+    # every index is yielded (cached ones too), to tell a complete range from one cut short
+    kwargs["return_only_missing"] = False
+    # inputs of a range may duplicate inputs of ranges done earlier in this shard
+    kwargs["record_cached"] = True
+    deadline = kwargs.pop("deadline", None)
+    deadline_at = None if deadline is None else time.monotonic() + deadline
+
+    n_ranges = (len(inputs) + range_size - 1) // range_size
+    done_marker = lambda r: os.path.join(done_dir, f"range_{r:06d}.done")
+
+    async def keep_renewed(lease: _RangeLease):
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            if not lease.renew():
+                return
+
+    processed = 0
+    while True:
+        pending = [r for r in range(n_ranges) if not os.path.exists(done_marker(r))]
+        if not pending:
+            return processed
+
+        claimed_any = False
+        for r in pending:
+            if deadline_at is not None and time.monotonic() >= deadline_at:
+                return processed
+            lease = _RangeLease(lease_dir, r, worker_id, lease_seconds)
+            if os.path.exists(done_marker(r)) or not lease.try_claim():
+                continue
+            # another worker may have finished the range (and released it) since the check above
+            if os.path.exists(done_marker(r)):
+                lease.release()
+                continue
+            claimed_any = True
+            renewer = asyncio.create_task(keep_renewed(lease))
+            try:
+                start = r * range_size
+                expected = len(inputs[start:start + range_size])
+                remaining = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+                completed = set()
+                async for i, res in run_async_map_stream(
+                    fn, inputs[start:start + range_size], shard_path, start_index=start, deadline=remaining, **kwargs
+                ):
+                    if not (isinstance(res, dict) and res.get("deadline_exceeded") is True):
+                        completed.add(i)
+                # mark done while still holding the lease, and only if nothing was cut short
+                if len(completed) < expected:
+                    return processed
+                open(done_marker(r), "w").close()
+                processed += 1
+            finally:
+                renewer.cancel()
+                lease.release()
+
+        # everything left is leased by other workers: wait, then reclaim what expired
+        if not claimed_any:
+            await asyncio.sleep(min(5.0, lease_seconds / 4))
+
+
+def run_sharded_map(
+    fn: Callable[..., Awaitable[Any]],
+    inputs: Sequence[Tuple[Any, Any]],
+    work_dir: str,
+    **kwargs,
+) -> int:
+    """
+    Synchronous wrapper around run_async_sharded_map (uses asyncio.run).
+    """
+    return asyncio.run(run_async_sharded_map(fn, inputs, work_dir, **kwargs))
+
+
+def merge_shards(work_dir: str, output_jsonl_path: Optional[str] = None) -> List[Tuple[int, Any]]:
+    """
+    Merges the shards of a sharded run into results sorted by index.
+    If an index appears in several shards (reclaimed range), a successful result wins over an error.
+
+    Args:
+        work_dir: the `work_dir` of run_sharded_map.
+        output_jsonl_path: if given, also write the merged {"i": idx, "result": ...} lines there.
+
+    Returns:
+        List[(index, result)] sorted by index.
+    """
+    merged: Dict[int, Any] = {}
+    shard_dir = os.path.join(work_dir, "shards")
+    for name in sorted(os.listdir(shard_dir)):
+        if not name.endswith(".jsonl"):
+            continue
+        with open(os.path.join(shard_dir, name), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                    i = int(obj["i"])
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    # Skip corrupted/partial lines
+                    continue
+                res = obj.get("result")
+                is_error = isinstance(res, dict) and res.get("error") is True
+                if i not in merged or not is_error:
+                    merged[i] = res
+
+    merged_pairs = sorted(merged.items(), key=lambda kv: kv[0])
+    if output_jsonl_path is not None:
+        with open(output_jsonl_path, "w", encoding="utf-8") as f:
+            for i, res in merged_pairs:
+                f.write(json.dumps({"i": i, "result": res}, ensure_ascii=False) + "\n")
+    return merged_pairs
+
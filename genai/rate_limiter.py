@@ -0,0 +1,169 @@
+# rate_limiter.py
+import time
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+LimiterKey = Tuple[str, str]
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True if the exception looks like a provider throttling error (HTTP 429 / quota exhausted)."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    response = getattr(exc, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status == 429:
+        return True
+    name = type(exc).__name__
+    return "RateLimit" in name or "ResourceExhausted" in name or "TooManyRequests" in name
+
+
+@dataclass
+class Reservation:
+    """Capacity reserved by `RateLimiter.acquire`, to be corrected with the real usage."""
+    key: LimiterKey
+    estimated_tokens: int
+    # tokens actually taken from the bucket (the estimate, capped at the bucket capacity)
+    reserved_tokens: Optional[float] = None
+
+
+class _TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute / 60` units per second.
+    The level may go negative: callers reserve capacity up front and sleep until
+    their share has been refilled, which keeps callers in FIFO order without a lock
+    held across awaits.
+    """
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = per_minute
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float, factor: float):
+        capacity = self.per_minute * factor
+        self.level = min(capacity, self.level + (now - self.updated_at) * capacity / 60.0)
+        self.updated_at = now
+
+    def reserve(self, amount: float, now: float, factor: float) -> float:
+        """Takes `amount` units and returns how many seconds to wait before using them."""
+        self._refill(now, factor)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level / (self.per_minute * factor / 60.0)
+
+    def give_back(self, amount: float, now: float, factor: float):
+        """Returns `amount` units (takes them if negative), never above the current (scaled) capacity."""
+        self._refill(now, factor)
+        self.level = min(self.per_minute * factor, self.level + amount)
+
+
+class _Budget:
+    """Request + token buckets of one (provider, model), with an adaptive budget factor."""
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, factor: float):
+        self.requests = _TokenBucket(requests_per_minute)
+        self.tokens = _TokenBucket(tokens_per_minute)
+        self.factor = factor
+        self.throttled = 0
+
+
+class RateLimiter:
+    """
+    Process-wide async rate limiter for LLM calls, with one requests-per-minute and one
+    tokens-per-minute bucket per (provider, model).
+
+    - `acquire` reserves one request plus the estimated tokens, sleeping if the budget is spent.
+    - `record_usage` corrects the token bucket with the usage reported by the response.
+    - `record_throttle` shrinks the budget multiplicatively after a 429; successful calls
+      grow it back additively, so the limiter settles just under the quota instead of oscillating.
+
+    The state is guarded by a threading.Lock that is never held across an await,
+    so one instance can be shared by all the coroutines (and event loops) of the process.
+    Use:
+        limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=200_000)
+        limiter.set_limits("openai", "gpt-4o-mini", requests_per_minute=5000, tokens_per_minute=2_000_000)
+        await agenerate_structured_output(..., rate_limiter=limiter)
+    """
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200_000,
+        safety_margin: float = 0.95,
+        expected_output_tokens: int = 256,
+        decrease_factor: float = 0.7,
+        increase_step: float = 0.01,
+        min_factor: float = 0.1,
+    ):
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("Invalid limits. Expected positive `requests_per_minute` and `tokens_per_minute`.")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.safety_margin = safety_margin
+        self.expected_output_tokens = expected_output_tokens
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_factor = min_factor
+        self._limits: Dict[LimiterKey, Tuple[float, float]] = {}
+        self._budgets: Dict[LimiterKey, _Budget] = {}
+        self._lock = threading.Lock()
+
+    def set_limits(self, model_provider: str, model_name: str, requests_per_minute: float, tokens_per_minute: float):
+        """Sets the quota of one (provider, model); others use the limits given to the constructor."""
+        with self._lock:
+            self._limits[(model_provider, model_name)] = (requests_per_minute, tokens_per_minute)
+            self._budgets.pop((model_provider, model_name), None)
+
+    def _budget(self, key: LimiterKey) -> _Budget:
+        budget = self._budgets.get(key)
+        if budget is None:
+            rpm, tpm = self._limits.get(key, (self.requests_per_minute, self.tokens_per_minute))
+            budget = self._budgets[key] = _Budget(rpm, tpm, self.safety_margin)
+        return budget
+
+    async def acquire(self, model_provider: str, model_name: str, prompt_tokens: int) -> Reservation:
+        """Waits until one request and `prompt_tokens` (+ expected output) fit in the budget."""
+        key = (model_provider, model_name)
+        estimated_tokens = prompt_tokens + self.expected_output_tokens
+        with self._lock:
+            budget = self._budget(key)
+            # a single request bigger than the whole bucket can only wait for a full bucket
+            tokens = min(estimated_tokens, budget.tokens.per_minute * budget.factor)
+            now = time.monotonic()
+            wait = max(
+                budget.requests.reserve(1, now, budget.factor),
+                budget.tokens.reserve(tokens, now, budget.factor),
+            )
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return Reservation(key=key, estimated_tokens=estimated_tokens, reserved_tokens=tokens)
+
+    def record_usage(self, reservation: Reservation, total_tokens: Optional[int]):
+        """Corrects the reserved estimate with the real usage, and grows the budget back after a success."""
+        with self._lock:
+            budget = self._budget(reservation.key)
+            if total_tokens is not None:
+                # credit back only what was debited: an estimate above the bucket cap took the cap
+                reserved = reservation.estimated_tokens if reservation.reserved_tokens is None else reservation.reserved_tokens
+                budget.tokens.give_back(reserved - total_tokens, time.monotonic(), budget.factor)
+            budget.factor = min(self.safety_margin, budget.factor + self.increase_step)
+
+    def record_throttle(self, reservation: Reservation):
+        """Shrinks the budget after the provider answered with a 429."""
+        with self._lock:
+            budget = self._budget(reservation.key)
+            budget.factor = max(self.min_factor, budget.factor * self.decrease_factor)
+            budget.throttled += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                f"{provider}/{model}": {
+                    "factor": budget.factor,
+                    "throttled": budget.throttled,
+                    "requests_available": budget.requests.level,
+                    "tokens_available": budget.tokens.level,
+                }
+                for (provider, model), budget in self._budgets.items()
+            }
@@ -0,0 +1,254 @@
+# resume_store.py
+"""
+Content-keyed resume store for the parallelizer.
+
+Results are still appended to a JSONL log, one {"i": idx, "k": key, "result": ...} per line,
+where `k` is a stable hash of the input, so reordering or inserting inputs does not break resume.
+A SQLite sidecar index (`<cache>.jsonl.idx`) maps each key to the byte range of its latest line:
+lookups are O(1) and results are read lazily from the log, instead of parsing the whole file
+and holding every past result in memory.
+
+Lines written before content keys existed ({"i": idx, "result": ...}) are still importable:
+they are indexed under their position, and `compact` can rewrite them with content keys.
+
+Compact a store (drops superseded and error entries):
+    python resume_store.py compact results.jsonl
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import argparse
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+KeyFn = Callable[[Any, Any], str]
+
+
+def input_key(a: Any, b: Any) -> str:
+    """Stable content hash of an (a, b) input."""
+    try:
+        payload = json.dumps([a, b], sort_keys=True, ensure_ascii=False, default=str)
+    except TypeError:
+        payload = repr((a, b))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def legacy_key(i: int) -> str:
+    """Key of a line written without content key (positional)."""
+    return f"#{i}"
+
+
+def _check_path(path: str):
+    ext = os.path.splitext(path)[1].lower()
+    if not ext == ".jsonl":
+        raise ValueError(f"Expected a '.jsonl' filepath for `cache_jsonl_path`; received extension '{ext}'")
+
+
+class ResumeStore:
+    """
+    Lazily-loaded, indexed view over a JSONL resume log.
+    Use:
+        store = ResumeStore(path)
+        store.open()          # catches the index up with lines appended since the last run
+        found, result = store.get(input_key(a, b))
+        store.close()
+    """
+    def __init__(self, path: str):
+        _check_path(path)
+        self.path = path
+        self.index_path = path + ".idx"
+        self.has_legacy = False
+        self.opened_bytes = 0  # log size when opened: lines at or after it were appended by this run
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        # make sure a partial last line (crash mid-write) does not merge with the next record
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        else:
+            open(self.path, "ab").close()
+
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " error INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._data = open(self.path, "rb")
+        self.refresh()
+        self.opened_bytes = self._meta("indexed_bytes")
+
+    def _meta(self, name: str, default: int = 0) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def refresh(self):
+        """Indexes the lines appended since the last refresh (rebuilds if the log was replaced or truncated)."""
+        with self._lock:
+            st = os.stat(self.path)
+            indexed_bytes = self._meta("indexed_bytes")
+            if self._meta("inode", st.st_ino) != st.st_ino or st.st_size < indexed_bytes:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("DELETE FROM meta")
+                indexed_bytes = 0
+
+            rows = []
+            offset = indexed_bytes
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partial line being written: index it next time
+                    length = len(line)
+                    try:
+                        obj = json.loads(line)
+                        if "i" in obj or "k" in obj:
+                            key = obj["k"] if "k" in obj else legacy_key(int(obj["i"]))
+                            result = obj.get("result")
+                            is_error = isinstance(result, dict) and result.get("error") is True
+                            rows.append((key, offset, length, int(is_error)))
+                    except (json.JSONDecodeError, ValueError, TypeError):
+                        # Skip corrupted/partial lines
+                        pass
+                    offset += length
+
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, offset, length, error) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('indexed_bytes', ?)", (offset,))
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('inode', ?)", (st.st_ino,))
+            self._conn.execute("COMMIT")
+            self.has_legacy = self._conn.execute("SELECT 1 FROM entries WHERE key LIKE '#%' LIMIT 1").fetchone() is not None
+
+    def add_entries(self, entries: List[Tuple[str, int, int, int]]):
+        """
+        Indexes lines just appended by the current writer, as (key, offset, length, error),
+        so they can be looked up before the next `refresh` (which re-indexes them harmlessly).
+        """
+        if not entries:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, offset, length, error) VALUES (?, ?, ?, ?)", entries
+            )
+            self._conn.execute("COMMIT")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (found, result) for a key, reading the result from the log on demand."""
+        found, result, _ = self.get_with_offset(key)
+        return (found, result)
+
+    def get_with_offset(self, key: str) -> Tuple[bool, Any, int]:
+        """Like `get`, plus the offset of the line in the log (-1 if not found)."""
+        with self._lock:
+            row = self._conn.execute("SELECT offset, length FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return (False, None, -1)
+            self._data.seek(row[0])
+            line = self._data.read(row[1])
+        return (True, json.loads(line).get("result"), row[0])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (entries, errors) = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(error), 0) FROM entries").fetchone()
+        return {"entries": entries, "errors": errors, "log_bytes": os.path.getsize(self.path)}
+
+    def close(self):
+        if self._conn is not None:
+            self.refresh()
+            self._conn.close()
+            self._conn = None
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+
+def compact(
+    cache_jsonl_path: str,
+    drop_errors: bool = True,
+    inputs: Optional[Iterable[Tuple[Any, Any]]] = None,
+    key_fn: Optional[KeyFn] = None,
+) -> Dict[str, int]:
+    """
+    Rewrites the JSONL log keeping only the latest line per key (atomically, via os.replace).
+
+    Args:
+        cache_jsonl_path: the JSONL resume log.
+        drop_errors: also drop {"error": True} results, so they are recomputed on the next run.
+        inputs: if given, positional (legacy) lines are rewritten with the content key of inputs[i].
+        key_fn: custom key function, as passed to run_async_map.
+
+    Returns:
+        Dict with the number of lines before / after.
+    """
+    store = ResumeStore(cache_jsonl_path)
+    store.open()
+    try:
+        rows = store._conn.execute("SELECT key, offset, length, error FROM entries ORDER BY offset").fetchall()
+        with open(cache_jsonl_path, "rb") as f:
+            lines_before = sum(1 for _ in f)
+    finally:
+        store.close()
+
+    legacy_keys = {}
+    if inputs is not None:
+        key_fn = key_fn or input_key
+        legacy_keys = {legacy_key(i): key_fn(a, b) for i, (a, b) in enumerate(inputs)}
+
+    tmp_path = cache_jsonl_path + ".compact.tmp"
+    kept = 0
+    with open(cache_jsonl_path, "rb") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+        for key, offset, length, error in rows:
+            if drop_errors and error:
+                continue
+            src.seek(offset)
+            obj = json.loads(src.read(length))
+            if key in legacy_keys:
+                obj["k"] = legacy_keys[key]
+            dst.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            kept += 1
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, cache_jsonl_path)
+
+    # rebuild the index for the new log
+    store = ResumeStore(cache_jsonl_path)
+    store.open()
+    store.close()
+    return {"lines_before": lines_before, "lines_after": kept}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Maintenance of parallelizer JSONL resume stores.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    ap_compact = sub.add_parser("compact", help="drop superseded (and error) entries")
+    ap_compact.add_argument("cache_jsonl_path")
+    ap_compact.add_argument("--keep_errors", action="store_true")
+    ap_stats = sub.add_parser("stats", help="print entries / errors / log size")
+    ap_stats.add_argument("cache_jsonl_path")
+    args = ap.parse_args()
+
+    if args.command == "compact":
+        print(compact(args.cache_jsonl_path, drop_errors=not args.keep_errors))
+    elif args.command == "stats":
+        store = ResumeStore(args.cache_jsonl_path)
+        store.open()
+        print(store.stats())
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
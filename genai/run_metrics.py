@@ -0,0 +1,155 @@
+# run_metrics.py
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class RunMetrics:
+    """
+    Hot-path metrics of a parallelizer run: counters, `fn` latency percentiles
+    (over the last `latency_window` calls), in-flight depth, concurrency limit and
+    time spent persisting results.
+
+    Read it live with `snapshot()` (dict) or `to_prometheus()` (text exposition format),
+    or let the run emit periodic snapshots: `on_snapshot` callback and/or a JSON file
+    rewritten atomically every `interval` seconds.
+    Use:
+        metrics = RunMetrics(snapshot_path="run_metrics.json", interval=10)
+        run_map(fn, inputs, "results.jsonl", metrics=metrics)
+        print(metrics.snapshot())
+    """
+    def __init__(
+        self,
+        latency_window: int = 10_000,
+        snapshot_path: Optional[str] = None,
+        interval: float = 10.0,
+        on_snapshot: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.on_snapshot = on_snapshot
+        self.counters: Dict[str, int] = {
+            "items": 0,        # items completed (computed or cached)
+            "cached": 0,       # items served from the resume cache
+            "succeeded": 0,
+            "failed": 0,       # items given up on ({"error": True})
+            "calls": 0,        # fn calls, retries included
+            "retries": 0,
+            "deduplicated": 0,  # items served by the call of an identical input
+            "hedged": 0,       # speculative second calls sent for slow items
+            "hedge_wins": 0,   # ... that returned before the original call
+            "deadline_exceeded": 0,  # items cut by the run deadline
+        }
+        self.errors_by_kind: Dict[str, int] = {}
+        self.writer_seconds = 0.0      # time callers waited on the writer (lock + commit)
+        self.commit_seconds = 0.0      # time spent writing + fsyncing
+        self.commits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._started_at = time.monotonic()
+
+    # ---- recording (called by the parallelizer) ----
+
+    def incr(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def call_started(self):
+        self.counters["calls"] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def call_finished(self, latency: float, error_kind: Optional[str]):
+        self.in_flight -= 1
+        self._latencies.append(latency)
+        if error_kind is not None:
+            self.errors_by_kind[error_kind] = self.errors_by_kind.get(error_kind, 0) + 1
+
+    def writer_waited(self, seconds: float):
+        self.writer_seconds += seconds
+
+    def committed(self, seconds: float):
+        self.commits += 1
+        self.commit_seconds += seconds
+
+    def set_gauge(self, name: str, read: Callable[[], float]):
+        """Registers a value read at snapshot time (e.g. the current concurrency limit)."""
+        self._gauges[name] = read
+
+    # ---- reading ----
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._started_at
+        latencies = sorted(self._latencies)
+        snap: Dict[str, Any] = dict(self.counters)
+        snap.update({
+            "elapsed_seconds": elapsed,
+            "items_per_second": self.counters["items"] / elapsed if elapsed > 0 else 0.0,
+            "latency_p50": _percentile(latencies, 0.50),
+            "latency_p90": _percentile(latencies, 0.90),
+            "latency_p99": _percentile(latencies, 0.99),
+            "latency_max": latencies[-1] if latencies else None,
+            "errors_by_kind": dict(self.errors_by_kind),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "writer_seconds": self.writer_seconds,
+            "commit_seconds": self.commit_seconds,
+            "commits": self.commits,
+        })
+        for name, read in self._gauges.items():
+            snap[name] = read()
+        return snap
+
+    def to_prometheus(self, prefix: str = "parallelizer") -> str:
+        """Snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+        for name in self.counters:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {snap[name]}")
+        if snap["errors_by_kind"]:
+            lines.append(f"# TYPE {prefix}_errors_total counter")
+        for kind, count in snap["errors_by_kind"].items():
+            lines.append(f'{prefix}_errors_total{{kind="{kind}"}} {count}')
+        lines.append(f"# TYPE {prefix}_latency_seconds summary")
+        for q, name in (("0.5", "latency_p50"), ("0.9", "latency_p90"), ("0.99", "latency_p99")):
+            value = snap[name]
+            if value is not None:
+                lines.append(f'{prefix}_latency_seconds{{quantile="{q}"}} {value}')
+        gauges = ["items_per_second", "in_flight", "max_in_flight", "writer_seconds", "commit_seconds"]
+        for name in gauges + list(self._gauges):
+            if snap[name] is not None:
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {snap[name]}")
+        return "\n".join(lines) + "\n"
+
+    def emit(self):
+        """Sends a snapshot to `on_snapshot` and/or writes it to `snapshot_path`."""
+        snap = self.snapshot()
+        if self.on_snapshot is not None:
+            self.on_snapshot(snap)
+        if self.snapshot_path is not None:
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snap, f, indent=2)
+            os.replace(tmp, self.snapshot_path)
+
+    async def run_periodic(self):
+        """Emits a snapshot every `interval` seconds until cancelled (then emits a final one)."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self.emit()
+        finally:
+            self.emit()
@@ -0,0 +1,211 @@
+# similarity_index.py
+import os
+import re
+import random
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from typing import Any, Dict, List, Optional
+
+from llm_cache import make_cache_key
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text: str, strip_digits: bool = False) -> str:
+    """Lowercases, strips accents / punctuation (and digits, if `strip_digits`) and collapses whitespace."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[\d\W_]+" if strip_digits else r"[\W_]+", " ", text)
+    return " ".join(text.split())
+
+
+def _shingles(normalized: str, k: int) -> List[str]:
+    words = normalized.split()
+    if len(words) <= k:
+        return [normalized]
+    return [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+
+
+class SimilarityIndex:
+    """
+    Persistent MinHash/LSH index of already classified inputs.
+    A new input whose estimated Jaccard similarity (over word shingles of the normalized text)
+    with a stored one reaches `threshold` reuses the stored structured result.
+    Entries are namespaced by provider, model, system prompt, schema and temperature,
+    so results are never shared across different classification tasks.
+    Digits are kept by default ("1 star" and "5 star" are different inputs); `strip_digits=True`
+    ignores them, for tasks where numbers (ids, dates, counters) do not change the label.
+
+    A fraction `verify_rate` of the hits is still sent to the model, and the fresh result
+    is compared with the stored one, to measure how often short-circuiting is wrong.
+    Use:
+        index = SimilarityIndex("similarity.sqlite", threshold=0.9)
+        generate_structured_output(..., similarity_index=index)
+        print(index.stats())
+    """
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        verify_rate: float = 0.0,
+        seed: int = 1,
+        strip_digits: bool = False,
+    ):
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in (".sqlite", ".sqlite3", ".db"):
+            raise ValueError(f"Expected a '.sqlite' / '.db' filepath for `path`; received extension '{ext}'")
+        if num_perm % bands != 0:
+            raise ValueError(f"Invalid value for param `bands`. Expected a divisor of `num_perm` ({num_perm}), received {bands}.")
+
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.verify_rate = verify_rate
+        self.strip_digits = strip_digits
+        self._rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._counters = {"lookups": 0, "hits": 0, "exact_hits": 0, "verified": 0, "verify_mismatches": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY,"
+            " namespace TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " value TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS entries_text ON entries (namespace, text_hash)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " namespace TEXT NOT NULL,"
+            " band INTEGER NOT NULL,"
+            " bucket TEXT NOT NULL,"
+            " entry_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (namespace, band, bucket)")
+
+    @staticmethod
+    def namespace(model_provider: str, model_name: str, system_prompt: Any, pydantic_output_schema: Any, model_temperature: float) -> str:
+        """Key of a classification task: everything in the cache key except the user message."""
+        return make_cache_key(
+            model_provider=model_provider,
+            model_name=model_name,
+            system_prompt=system_prompt,
+            user_message="",
+            pydantic_output_schema=pydantic_output_schema,
+            model_temperature=model_temperature,
+        )
+
+    def _signature(self, normalized: str) -> array:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+            for s in set(_shingles(normalized, self.shingle_size))
+        ]
+        return array("Q", (
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        ))
+
+    def _band_buckets(self, signature: array) -> List[str]:
+        return [
+            hashlib.blake2b(signature[band * self._rows:(band + 1) * self._rows].tobytes(), digest_size=8).hexdigest()
+            for band in range(self.bands)
+        ]
+
+    def _similarity(self, signature: array, blob: bytes) -> float:
+        """Estimated Jaccard similarity between a signature and a stored one."""
+        other = array("Q")
+        other.frombytes(blob)
+        return sum(x == y for x, y in zip(signature, other)) / self.num_perm
+
+    def lookup(self, namespace: str, text: str, pydantic_output_schema: Any) -> Optional[Any]:
+        """Returns the stored result of the most similar input above `threshold`, or None."""
+        normalized = normalize_text(text, strip_digits=self.strip_digits)
+        text_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        signature = self._signature(normalized)
+        with self._lock:
+            self._counters["lookups"] += 1
+            row = self._conn.execute(
+                "SELECT signature, value FROM entries WHERE namespace = ? AND text_hash = ?", (namespace, text_hash)
+            ).fetchone()
+            # same normalized text: still held to `threshold`, like the approximate hits
+            if row is not None and self._similarity(signature, row[0]) >= self.threshold:
+                self._counters["hits"] += 1
+                self._counters["exact_hits"] += 1
+                return pydantic_output_schema.model_validate_json(row[1])
+
+        buckets = self._band_buckets(signature)
+        band_filter = " OR ".join(["(b.band = ? AND b.bucket = ?)"] * self.bands)
+        with self._lock:
+            candidates = self._conn.execute(
+                "SELECT DISTINCT e.signature, e.value FROM buckets b JOIN entries e ON e.id = b.entry_id"
+                f" WHERE b.namespace = ? AND ({band_filter})",
+                [namespace] + [v for band, bucket in enumerate(buckets) for v in (band, bucket)],
+            ).fetchall()
+
+        best_value, best_similarity = None, 0.0
+        for blob, value in candidates:
+            similarity = self._similarity(signature, blob)
+            if similarity > best_similarity:
+                best_value, best_similarity = value, similarity
+        if best_value is None or best_similarity < self.threshold:
+            return None
+        with self._lock:
+            self._counters["hits"] += 1
+        return pydantic_output_schema.model_validate_json(best_value)
+
+    def add(self, namespace: str, text: str, response: Any):
+        """Stores the structured result of a classified input."""
+        normalized = normalize_text(text, strip_digits=self.strip_digits)
+        text_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        signature = self._signature(normalized)
+        buckets = self._band_buckets(signature)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO entries (namespace, text_hash, signature, value) VALUES (?, ?, ?, ?)",
+                (namespace, text_hash, signature.tobytes(), response.model_dump_json()),
+            )
+            if cur.rowcount == 0:
+                return
+            self._conn.executemany(
+                "INSERT INTO buckets (namespace, band, bucket, entry_id) VALUES (?, ?, ?, ?)",
+                [(namespace, band, bucket, cur.lastrowid) for band, bucket in enumerate(buckets)],
+            )
+
+    def should_verify(self) -> bool:
+        """True if a hit should still be sent to the model, to sample-verify the index."""
+        return self.verify_rate > 0 and random.random() < self.verify_rate
+
+    def record_verification(self, stored: Any, fresh: Any):
+        """Compares a short-circuited result with the one the model actually returned."""
+        with self._lock:
+            self._counters["verified"] += 1
+            if stored.model_dump() != fresh.model_dump():
+                self._counters["verify_mismatches"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._counters)
+            (stats["size"],) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["verify_mismatch_rate"] = stats["verify_mismatches"] / stats["verified"] if stats["verified"] else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
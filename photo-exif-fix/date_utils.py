@@ -1,6 +1,8 @@
 import os
+import time
 import datetime
-import glob
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
 # !pip install pymediainfo
 # !pip install pymediainfo
@@ -11,7 +13,14 @@ import pywintypes
 import win32file
 import win32con
 
-def _read_file_dates(filepath):
+import exif_dates
+import mp4_dates
+
+def _read_file_dates(filepath, stat=None, media=True):
+    """
+    File system dates of a file and, if `media`, the dates recorded by MediaInfo.
+    `stat` is the os.stat_result of the file when the caller already has it (no further stat call).
+    """
     dates = {
         'creation_time': None,
         'modification_time': None,
@@ -21,14 +30,19 @@ def _read_file_dates(filepath):
         'tagged_date': None
     }
 
-    try:       
-        # File system dates
-        dates['creation_time'] = datetime.datetime.fromtimestamp(os.path.getctime(filepath))
-        dates['modification_time'] = datetime.datetime.fromtimestamp(os.path.getmtime(filepath))
-        dates['access_time'] = datetime.datetime.fromtimestamp(os.path.getatime(filepath))    
+    try:
+        # File system dates, from a single stat
+        if stat is None:
+            stat = os.stat(filepath)
+        dates['creation_time'] = datetime.datetime.fromtimestamp(stat.st_ctime)
+        dates['modification_time'] = datetime.datetime.fromtimestamp(stat.st_mtime)
+        dates['access_time'] = datetime.datetime.fromtimestamp(stat.st_atime)
     except Exception as e:
         print(f"Broken filepath {filepath} on reading file dates: {e}")
 
+    if not media:
+        return dates
+
     try:
         media_info = MediaInfo.parse(filepath)
 
@@ -48,9 +62,9 @@ def _read_file_dates(filepath):
 
     return dates
 
-def _get_correct_dt_to_apply(filepath, filename_dt):
-    # read the dates recorded in filesystem
-    dates = _read_file_dates(filepath)
+def _get_correct_dt_to_apply(filepath, filename_dt, stat=None):
+    # read the dates recorded in filesystem (the media dates are not used to decide)
+    dates = _read_file_dates(filepath, stat=stat, media=False)
     last_modification_dt = dates['modification_time']
     last_acc_dt = dates['access_time']
 
@@ -113,42 +127,155 @@ def _set_date_ffmpeg(filepath, dt):
     except Exception as e:
         print(f"Error {type(e)} with FFMPEG on file {filepath}: {e}")
 
-def _fix_date(filepath):
+def _set_media_date(filepath, dt):
+    """
+    Sets the metadata date of a media file: MP4 / MOV atoms and JPEG / PNG EXIF dates are patched in place,
+    other formats go through ffmpeg.
+    """
+    _, ext = os.path.splitext(filepath)
+    if ext.lower() in mp4_dates.MP4_EXTENSIONS:
+        try:
+            mp4_dates.set_mp4_dates(filepath, dt)
+        except (OSError, ValueError) as e:
+            print(f"Error {type(e)} with MP4 atoms on file {filepath}: {e}")
+    elif ext.lower() in exif_dates.IMAGE_EXTENSIONS:
+        try:
+            if exif_dates.set_image_dates(filepath, dt) == 0:
+                print(f"No EXIF dates in file {filepath}, only the file system dates are set")
+        except (OSError, ValueError) as e:
+            print(f"Error {type(e)} with EXIF on file {filepath}: {e}")
+    else:
+        _set_date_ffmpeg(filepath=filepath, dt=dt)
+
+def _filename_dt(filepath):
+    """Date in the file name (YYYY?MM?DD...)."""
     filename = os.path.basename(filepath)
-    filename_dt = datetime.datetime(year=int(filename[0:4]), month=int(filename[5:7]), day=int(filename[8:10]))
+    return datetime.datetime(year=int(filename[0:4]), month=int(filename[5:7]), day=int(filename[8:10]))
+
+def _apply_date(filepath, dt):
+    _set_media_date(filepath=filepath, dt=dt)
+    _set_date_pywin(filepath=filepath, target_date=dt)
 
-    dt_to_apply = _get_correct_dt_to_apply(filepath, filename_dt)
+def _fix_date(filepath, stat=None):
+    dt_to_apply = _get_correct_dt_to_apply(filepath, _filename_dt(filepath), stat=stat)
     if dt_to_apply is not None:
-        _set_date_ffmpeg(filepath=filepath, dt=dt_to_apply)
-        _set_date_pywin(filepath=filepath, target_date=dt_to_apply)
+        _apply_date(filepath, dt_to_apply)
+
+def _iter_files(folder_path):
+    """Yields the os.DirEntry of the files under a folder; on Linux the walk itself needs no stat of the files."""
+    folders = [folder_path]
+    while folders:
+        folder = folders.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            folders.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+                    except OSError as e:
+                        print(f"Broken filepath {entry.path} on scanning: {e}")
+        except OSError as e:
+            print(f"Broken folder {folder} on scanning: {e}")
+
+def _plan_date(entry):
+    """Date to apply to a file (None if it is fine already); runs in the read pool, with the single stat of the file."""
+    try:
+        return _get_correct_dt_to_apply(entry.path, _filename_dt(entry.path), stat=entry.stat())
+    except OSError as e:
+        print(f"Broken filepath {entry.path} on reading file dates: {e}")
+    except ValueError as e:
+        print(f"No date in the file name of {entry.path}: {e}")
+    return None
 
-def process_files(folder_path, extensions_to_process = ['.jpg', '.png', '.mp4']):
+def process_files(
+    folder_path,
+    extensions_to_process = ['.jpg', '.png', '.mp4'],
+    dry_run = False,
+    read_workers = 8,
+    write_workers = 2,
+    progress_seconds = 5.0,
+):
+    """
+    Fixes the dates of the media files under a folder, streaming: the folder is walked with os.scandir
+    while a pool of threads stats each file once and decides its date (no MediaInfo), and a smaller, bounded
+    pool writes the new dates, so scanning a slow (network) drive overlaps with the fixes.
+
+    Args:
+        folder_path: root folder, walked recursively.
+        extensions_to_process: extensions of the files to fix; the other files are listed and skipped.
+        dry_run: only plan: print and return the changes, without writing anything.
+        read_workers: threads reading the file dates (mostly waiting on I/O).
+        write_workers: threads writing the dates (keep it low on spinning disks / NAS).
+        progress_seconds: interval between progress lines.
+
+    Returns:
+        The list of changes, as (filepath, date applied) tuples, in walk order.
+    """
     if not os.path.isdir(folder_path):
         raise Exception(f"Folder {folder_path} not found")
-    
-    filepaths = [
-        filepath 
-        for filepath in glob.glob(os.path.join(folder_path, '**'), recursive=True) 
-        if os.path.isfile(filepath)
-    ]
-
-    good_filepaths = []
-    bad_filepaths = []
-    for filepath in filepaths:
-        _, ext = os.path.splitext(filepath)
-        if ext.lower() in extensions_to_process:
-            good_filepaths.append(filepath)
-        else:
-            bad_filepaths.append(filepath)
-    
-    if len(bad_filepaths) > 0:
-        print("Found files with invalid filepaths")
-        for filepath in bad_filepaths:
-            print(filepath)
-        stop = input("Vuoi continuare? S/N").upper() == 'S'
-    else:
-        stop = False
 
-    if not stop:
-        for filepath in good_filepaths:
-            _fix_date(filepath)
\ No newline at end of file
+    changes = []
+    skipped = []
+    counts = collections.Counter()
+    start = last_progress = time.perf_counter()
+
+    def progress(final=False):
+        nonlocal last_progress
+        now = time.perf_counter()
+        if not final and now - last_progress < progress_seconds:
+            return
+        last_progress = now
+        elapsed = now - start
+        print(
+            f"{'Done' if final else 'Progress'}: {counts['scanned']} scanned, {counts['checked']} checked, "
+            f"{len(changes)} {'to fix' if dry_run else 'fixed'}, {counts['written']} written "
+            f"in {elapsed:.1f}s ({counts['scanned'] / max(elapsed, 1e-9):.0f} files/s)"
+        )
+
+    def wait_write():
+        writes.popleft().result()
+        counts['written'] += 1
+
+    def wait_read():
+        filepath, future = reads.popleft()
+        dt = future.result()
+        counts['checked'] += 1
+        if dt is None:
+            return
+        changes.append((filepath, dt))
+        if dry_run:
+            print(f"{filepath}: {dt}")
+            return
+        if len(writes) >= 2 * write_workers:
+            wait_write()
+        writes.append(write_pool.submit(_apply_date, filepath, dt))
+
+    # bounded queues of futures, so the walk does not run ahead of the pools on huge trees
+    reads = collections.deque()
+    writes = collections.deque()
+    with ThreadPoolExecutor(max_workers=read_workers) as read_pool, ThreadPoolExecutor(max_workers=write_workers) as write_pool:
+        for entry in _iter_files(folder_path):
+            counts['scanned'] += 1
+            _, ext = os.path.splitext(entry.name)
+            if ext.lower() not in extensions_to_process:
+                skipped.append(entry.path)
+                continue
+            if len(reads) >= 4 * read_workers:
+                wait_read()
+            reads.append((entry.path, read_pool.submit(_plan_date, entry)))
+            progress()
+        while reads:
+            wait_read()
+            progress()
+        while writes:
+            wait_write()
+            progress()
+
+    if len(skipped) > 0:
+        print("Skipped files with extensions not to process")
+        for filepath in skipped:
+            print(filepath)
+    progress(final=True)
+    return changes
@@ -0,0 +1,217 @@
+"""
+In-place read / write of the dates stored in JPEG and PNG photos.
+
+- JPEG: DateTime (IFD0), DateTimeOriginal and DateTimeDigitized (Exif IFD) of the APP1 Exif segment;
+- PNG: the same tags in the `eXIf` chunk (its CRC is recomputed), and the `tIME` chunk.
+
+EXIF dates are fixed-length ASCII ("YYYY:MM:DD HH:MM:SS\\0", 20 bytes), so they are overwritten
+where they are: only the headers up to the Exif segment / the chunk headers are read, and only
+the date bytes (and PNG CRCs) are written. Tags or chunks missing from the file are not added,
+that would mean rewriting the whole file.
+
+Print the dates of a photo, or set them:
+    python exif_dates.py photo.jpg
+    python exif_dates.py photo.jpg --set 2021-07-14T10:30:00
+"""
+import os
+import zlib
+import struct
+import argparse
+import datetime
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_EXIF_HEADER = b'Exif\x00\x00'
+_EXIF_IFD_POINTER = 0x8769
+_ASCII = 2
+# tag -> name, for the IFD0 and the Exif IFD
+_IFD0_DATES = {0x0132: 'DateTime'}
+_EXIF_IFD_DATES = {0x9003: 'DateTimeOriginal', 0x9004: 'DateTimeDigitized'}
+_EXIF_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+
+def _iter_ifd(tiff: bytes, endian: str, ifd_offset: int):
+    """Yields (tag, type, count, value field offset) of the entries of an IFD."""
+    if ifd_offset + 2 > len(tiff):
+        return
+    entries = struct.unpack_from(endian + 'H', tiff, ifd_offset)[0]
+    for i in range(entries):
+        entry = ifd_offset + 2 + 12 * i
+        if entry + 12 > len(tiff):
+            return
+        tag, field_type, count = struct.unpack_from(endian + 'HHI', tiff, entry)
+        yield tag, field_type, count, entry + 8
+
+
+def _date_fields(tiff: bytes) -> list[tuple[str, int, int]]:
+    """(tag name, offset in the TIFF data, length) of the ASCII date values of a TIFF (Exif) block."""
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        raise ValueError("Invalid TIFF byte order in the Exif data")
+
+    fields = []
+    try:
+        ifds = [(struct.unpack_from(endian + 'I', tiff, 4)[0], _IFD0_DATES)]
+        while ifds:
+            ifd_offset, dates = ifds.pop()
+            for tag, field_type, count, value_offset in _iter_ifd(tiff, endian, ifd_offset):
+                if tag == _EXIF_IFD_POINTER and dates is _IFD0_DATES:
+                    ifds.append((struct.unpack_from(endian + 'I', tiff, value_offset)[0], _EXIF_IFD_DATES))
+                elif tag in dates and field_type == _ASCII and count >= 19:
+                    # values longer than 4 bytes are stored at an offset
+                    offset = struct.unpack_from(endian + 'I', tiff, value_offset)[0]
+                    if offset + count <= len(tiff):
+                        fields.append((dates[tag], offset, count))
+    except struct.error as e:
+        raise ValueError(f"Truncated Exif data: {e}")
+    return fields
+
+
+def _exif_value(dt: datetime.datetime, length: int) -> bytes:
+    return (dt.strftime(_EXIF_FORMAT).encode('ascii') + b'\x00' * length)[:length]
+
+
+def _parse_exif_value(value: bytes) -> datetime.datetime | None:
+    try:
+        return datetime.datetime.strptime(value[:19].decode('ascii'), _EXIF_FORMAT)
+    except (UnicodeDecodeError, ValueError):
+        return None  # blank ("    :  :  ") or broken dates
+
+
+def _find_jpeg_exif(f) -> tuple[int, int] | None:
+    """(file offset, length) of the TIFF data of the APP1 Exif segment, or None."""
+    f.seek(0)
+    if f.read(2) != b'\xff\xd8':
+        raise ValueError("Not a JPEG file")
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF:  # fill bytes
+            marker = marker[1:] + f.read(1)
+        if marker[1] == 0xDA or marker[1] == 0xD9:  # start of scan / end of image: no more metadata
+            return None
+        length = struct.unpack('>H', f.read(2))[0]
+        segment_start = f.tell()
+        if marker[1] == 0xE1 and f.read(6) == _EXIF_HEADER:
+            return segment_start + 6, length - 2 - 6
+        f.seek(segment_start + length - 2)
+
+
+def _iter_png_chunks(f):
+    """Yields (type, file offset of the data, length) of the chunks of a PNG, seeking over their data."""
+    f.seek(0)
+    if f.read(8) != _PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, chunk_type = struct.unpack('>I4s', header)
+        data_offset = f.tell()
+        yield chunk_type, data_offset, length
+        if chunk_type == b'IEND':
+            return
+        f.seek(data_offset + length + 4)  # data + CRC
+
+
+def _write_png_crc(f, chunk_type: bytes, data_offset: int, data: bytes):
+    """Writes the CRC of a chunk, after its (patched) data."""
+    f.seek(data_offset + len(data))
+    f.write(struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+
+def read_image_dates(filepath) -> dict[str, datetime.datetime | None]:
+    """Dates found in a JPEG / PNG, by tag name (`tIME` for the PNG chunk, in UTC)."""
+    dates = {}
+    _, ext = os.path.splitext(filepath)
+    with open(filepath, 'rb') as f:
+        if ext.lower() == '.png':
+            for chunk_type, data_offset, length in _iter_png_chunks(f):
+                if chunk_type in (b'eXIf', b'tIME'):
+                    f.seek(data_offset)
+                    data = f.read(length)
+                    if chunk_type == b'tIME' and length == 7:
+                        dates['tIME'] = datetime.datetime(*struct.unpack('>HBBBBB', data))
+                    elif chunk_type == b'eXIf':
+                        for name, offset, count in _date_fields(data):
+                            dates[name] = _parse_exif_value(data[offset:offset + count])
+        else:
+            exif = _find_jpeg_exif(f)
+            if exif is not None:
+                tiff_offset, tiff_length = exif
+                f.seek(tiff_offset)
+                tiff = f.read(tiff_length)
+                for name, offset, count in _date_fields(tiff):
+                    dates[name] = _parse_exif_value(tiff[offset:offset + count])
+    return dates
+
+
+def set_image_dates(filepath, dt: datetime.datetime) -> int:
+    """
+    Overwrites in place the dates of a JPEG / PNG photo.
+
+    Args:
+        filepath: JPEG or PNG file.
+        dt: date to write, local time as EXIF expects it (converted to UTC for the PNG `tIME` chunk).
+
+    Returns:
+        Number of dates patched (0 if the photo has none: they are not added).
+    """
+    _, ext = os.path.splitext(filepath)
+    patched = 0
+    with open(filepath, 'r+b') as f:
+        if ext.lower() == '.png':
+            # collect first, then write: the walk only reads
+            chunks = [chunk for chunk in _iter_png_chunks(f) if chunk[0] in (b'eXIf', b'tIME')]
+            for chunk_type, data_offset, length in chunks:
+                f.seek(data_offset)
+                data = bytearray(f.read(length))
+                if chunk_type == b'tIME':
+                    if length != 7:
+                        continue
+                    utc = dt.astimezone(datetime.timezone.utc)
+                    fields = [(0, struct.pack('>HBBBBB', utc.year, utc.month, utc.day, utc.hour, utc.minute, utc.second))]
+                else:
+                    fields = [(offset, _exif_value(dt, count)) for _, offset, count in _date_fields(bytes(data))]
+                    if not fields:
+                        continue
+                # only the dates and the CRC are written, the CRC is computed on the patched copy
+                for offset, value in fields:
+                    data[offset:offset + len(value)] = value
+                    f.seek(data_offset + offset)
+                    f.write(value)
+                _write_png_crc(f, chunk_type, data_offset, bytes(data))
+                patched += len(fields)
+        else:
+            exif = _find_jpeg_exif(f)
+            if exif is None:
+                return 0
+            tiff_offset, tiff_length = exif
+            f.seek(tiff_offset)
+            for _, offset, count in _date_fields(f.read(tiff_length)):
+                f.seek(tiff_offset + offset)
+                f.write(_exif_value(dt, count))
+                patched += 1
+    return patched
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Print or set the EXIF / tIME dates of a JPEG or PNG photo.")
+    ap.add_argument("filepath")
+    ap.add_argument("--set", default=None, help="ISO date to write, e.g. 2021-07-14T10:30:00 (local time)")
+    args = ap.parse_args()
+
+    if args.set is not None:
+        patched = set_image_dates(args.filepath, datetime.datetime.fromisoformat(args.set))
+        print(f"Patched {patched} date(s)")
+    for name, dt in read_image_dates(args.filepath).items():
+        print(f"{name}: {dt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+In-place read / write of the creation and modification times of MP4 / MOV files.
+
+The times live in the `mvhd` (movie), `tkhd` (track) and `mdhd` (media) atoms of `moov`, as
+seconds since 1904-01-01 UTC, in 32 bits (atom version 0) or 64 bits (version 1). They are
+overwritten in place: only the atom headers are read (skipping `mdat` with a seek), and 8 or
+16 bytes are written per atom, whatever the size of the video.
+
+Print the dates of a video, or set them:
+    python mp4_dates.py video.mp4
+    python mp4_dates.py video.mp4 --set 2021-07-14T10:30:00
+"""
+import os
+import struct
+import argparse
+import datetime
+
+MP4_EXTENSIONS = ['.mp4', '.mov', '.m4v', '.3gp']
+
+_EPOCH_1904 = datetime.datetime(1904, 1, 1)
+# atoms holding other atoms, on the way to the ones with times
+_CONTAINERS = {b'moov', b'trak', b'mdia'}
+_TIMED = {b'mvhd', b'tkhd', b'mdhd'}
+
+
+def _to_mp4_time(dt: datetime.datetime) -> int:
+    """Seconds since 1904-01-01 UTC; naive datetimes are local time, as everywhere in date_utils."""
+    utc = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return int((utc - _EPOCH_1904).total_seconds())
+
+
+def _from_mp4_time(seconds: int) -> datetime.datetime:
+    """Naive local time of MP4 seconds, the inverse of _to_mp4_time."""
+    utc = _EPOCH_1904 + datetime.timedelta(seconds=seconds)
+    try:
+        return utc.replace(tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+    except (OSError, OverflowError):
+        return utc  # unset (0) times: Windows cannot localize dates before 1970
+
+
+def _iter_atoms(f, start: int, end: int):
+    """Yields (type, offset of the payload, end offset) of the atoms between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack('>I4s', header)
+        payload = offset + 8
+        if size == 1:  # 64-bit size after the type
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack('>Q', large)[0]
+            payload += 8
+        elif size == 0:  # extends to the end of the file (or of the parent)
+            size = end - offset
+        if size < payload - offset:
+            raise ValueError(f"Corrupted atom `{atom_type!r}` at offset {offset}")
+        yield atom_type, payload, min(offset + size, end)
+        offset += size
+
+
+def _iter_timed_atoms(f, file_size: int):
+    """Yields (type, offset of the payload) of every mvhd / tkhd / mdhd atom."""
+    stack = [(0, file_size)]
+    while stack:
+        start, end = stack.pop()
+        for atom_type, payload, atom_end in _iter_atoms(f, start, end):
+            if atom_type in _CONTAINERS:
+                stack.append((payload, atom_end))
+            elif atom_type in _TIMED:
+                yield atom_type, payload
+
+
+def _read_times(f, payload: int) -> tuple[int, int, int]:
+    """(version, creation, modification) of a timed atom."""
+    f.seek(payload)
+    version = f.read(1)[0]
+    f.seek(payload + 4)  # after version + flags
+    if version == 1:
+        creation, modification = struct.unpack('>QQ', f.read(16))
+    else:
+        creation, modification = struct.unpack('>II', f.read(8))
+    return version, creation, modification
+
+
+def read_mp4_dates(filepath) -> list[tuple[str, datetime.datetime, datetime.datetime]]:
+    """(atom type, creation, modification) of every mvhd / tkhd / mdhd atom of the file, in naive local time."""
+    dates = []
+    with open(filepath, 'rb') as f:
+        for atom_type, payload in _iter_timed_atoms(f, os.fstat(f.fileno()).st_size):
+            _, creation, modification = _read_times(f, payload)
+            dates.append((atom_type.decode('ascii'), _from_mp4_time(creation), _from_mp4_time(modification)))
+    return dates
+
+
+def set_mp4_dates(filepath, dt: datetime.datetime, modification_dt: datetime.datetime = None) -> int:
+    """
+    Overwrites in place the creation and modification times of the movie, of its tracks and of their media.
+
+    Args:
+        filepath: MP4 / MOV file.
+        dt: creation time (naive datetimes are local time, stored converted to UTC).
+        modification_dt: modification time; defaults to `dt`.
+
+    Returns:
+        Number of atoms patched.
+    """
+    creation = _to_mp4_time(dt)
+    modification = _to_mp4_time(modification_dt or dt)
+    if creation < 0 or modification < 0:
+        raise ValueError(f"Date {dt} is before 1904, not representable in MP4")
+
+    patched = 0
+    with open(filepath, 'r+b') as f:
+        # collect first, then write: the walk only reads
+        atoms = list(_iter_timed_atoms(f, os.fstat(f.fileno()).st_size))
+        if not any(atom_type == b'mvhd' for atom_type, _ in atoms):
+            raise ValueError(f"No movie header (moov/mvhd) found in {filepath}")
+        for _, payload in atoms:
+            version, _, _ = _read_times(f, payload)
+            f.seek(payload + 4)
+            if version == 1:
+                f.write(struct.pack('>QQ', creation, modification))
+            else:
+                if creation > 0xFFFFFFFF or modification > 0xFFFFFFFF:
+                    raise ValueError(f"Date {dt} does not fit a version 0 atom")
+                f.write(struct.pack('>II', creation, modification))
+            patched += 1
+    return patched
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Print or set the creation / modification times of an MP4 / MOV file.")
+    ap.add_argument("filepath")
+    ap.add_argument("--set", default=None, help="ISO date to write, e.g. 2021-07-14T10:30:00 (local time)")
+    args = ap.parse_args()
+
+    if args.set is not None:
+        patched = set_mp4_dates(args.filepath, datetime.datetime.fromisoformat(args.set))
+        print(f"Patched {patched} atom(s)")
+    for atom_type, creation, modification in read_mp4_dates(args.filepath):
+        print(f"{atom_type}: created {creation}, modified {modification}")
+
+
+if __name__ == "__main__":
+    main()
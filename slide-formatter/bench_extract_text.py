@@ -0,0 +1,68 @@
+# bench_extract_text.py
+"""
+Throughput (pages/s) of text_extraction.iter_pdf_text on synthetic decks: the old sequential
+loop of read_pdf_text (one pypdf pass, no cache) against the process pool, with a cold and a
+warm page-text cache.
+
+Usage:
+    python bench_extract_text.py --pages 100 1000 --workers 1 2 4 --folder /tmp
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import pypdf
+
+import synthetic_decks
+import text_extraction
+
+
+def _sequential_pypdf(path: Path) -> int:
+    """What read_pdf_text used to do, minus the printing."""
+    return sum(1 for page in pypdf.PdfReader(path).pages if page.extract_text() is not None)
+
+
+def _timed(fn) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    n = fn()
+    return time.perf_counter() - t0, n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark parallel, cached PDF text extraction.")
+    ap.add_argument("--pages", type=int, nargs="+", default=[100, 1000])
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--chunk_size", type=int, default=8)
+    ap.add_argument("--lines", type=int, default=30, help="text lines per page")
+    ap.add_argument("--folder", default=None, help="where to write the decks and caches; defaults to the temp dir")
+    args = ap.parse_args()
+
+    print(f"{'pages':>6} {'engine':>16} | {'seconds':>8} {'pages/s':>9}")
+    with tempfile.TemporaryDirectory(dir=args.folder) as tmp:
+        for pages in args.pages:
+            src = Path(tmp) / f"deck_{pages}.pdf"
+            synthetic_decks.make_deck(src, pages=pages, image_kb=0, lines=args.lines, watermark="none", encrypted=False)
+
+            def report(name: str, seconds: float, n: int):
+                print(f"{pages:>6} {name:>16} | {seconds:8.3f} {n / seconds:9.1f}")
+
+            report("pypdf loop", *_timed(lambda: _sequential_pypdf(src)))
+            for workers in args.workers:
+                report(f"workers={workers}", *_timed(lambda: sum(
+                    1 for _ in text_extraction.iter_pdf_text(src, workers=workers, chunk_size=args.chunk_size)
+                )))
+
+            cache = text_extraction.PageTextCache(Path(tmp) / f"cache_{pages}.sqlite")
+            try:
+                workers = max(args.workers)
+                for name in ("cache cold", "cache warm"):
+                    report(name, *_timed(lambda: sum(
+                        1 for _ in text_extraction.iter_pdf_text(src, workers=workers, cache=cache, chunk_size=args.chunk_size)
+                    )))
+            finally:
+                cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# bench_remove_text.py
+"""
+Benchmark of pdf_utils.remove_text (in-process content-stream editing) against the legacy
+qpdf round trip (_remove_text_with_qpdf), on synthetic decks with a text watermark (see synthetic_decks.py):
+one Tj per word (`text`) or a single TJ array with fractional kerning (`kerned`).
+The qpdf variant runs only if the `qpdf` executable is on the PATH.
+
+Usage:
+    python bench_remove_text.py --pages 20 200 --folder /tmp
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import pikepdf
+
+import pdf_utils
+import synthetic_decks
+from synthetic_decks import WATERMARK_TEXT as WATERMARK
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark in-process text removal against the qpdf round trip.")
+    ap.add_argument("--pages", type=int, nargs="+", default=[20, 200])
+    ap.add_argument("--watermarks", nargs="+", default=["text", "kerned"], choices=["text", "kerned"])
+    ap.add_argument("--folder", default=None, help="where to write the synthetic decks; defaults to the temp dir")
+    args = ap.parse_args()
+
+    has_qpdf = shutil.which("qpdf") is not None
+    if not has_qpdf:
+        print("qpdf not found on PATH: only the in-process engine is measured")
+
+    print(f"{'pages':>6} {'watermark':>9} {'engine':>10} | {'seconds':>8} {'out KB':>8} {'left':>5}")
+    with tempfile.TemporaryDirectory(dir=args.folder) as tmp:
+        for pages in args.pages:
+            for watermark in args.watermarks:
+                src = Path(tmp) / f"deck_{watermark}_{pages}.pdf"
+                synthetic_decks.make_deck(src, pages=pages, image_kb=0, watermark=watermark, encrypted=False)
+                engines = [("in-process", lambda p: pdf_utils.remove_text(p, WATERMARK))]
+                if has_qpdf:
+                    engines.append(("qpdf", lambda p: pdf_utils._remove_text_with_qpdf(p, WATERMARK)))
+                for name, engine in engines:
+                    work = Path(tmp) / f"work_{name}_{watermark}_{pages}.pdf"
+                    shutil.copy(src, work)
+                    t0 = time.perf_counter()
+                    out_path = engine(work)
+                    seconds = time.perf_counter() - t0
+                    # occurrences of the watermark still extractable from the output
+                    with pikepdf.open(out_path) as pdf:
+                        left = sum(WATERMARK.split()[0].encode("cp1252") in page.obj.Contents.read_bytes() for page in pdf.pages)
+                    print(f"{pages:>6} {watermark:>9} {name:>10} | {seconds:8.3f} {os.path.getsize(out_path) / 1024:8.0f} {left:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# bench_slides.py
+"""
+Benchmark runner of the slide-formatter stages on synthetic decks (see synthetic_decks.py).
+
+Each measurement runs in a fresh process, so its peak memory (max RSS, pikepdf / qpdf
+allocations included) is not polluted by the previous ones. For each deck size it reports,
+per stage, the wall time, the peak RSS, how much the stage raised it above the process baseline
+(interpreter + imports) and the output size. Stages:
+- write, watermark, split, split_clip, remove_text: the single-stage functions of pdf_utils;
+- process_pdf: the fused pipeline on one deck;
+- process_slides: the whole CLI on a folder of `--decks` decks (peak RSS of the largest process).
+
+Usage:
+    python bench_slides.py --pages 20 200 --image_kb 100 --watermark xobject --json bench.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from pathlib import Path
+
+import synthetic_decks
+
+STAGES = ["write", "watermark", "split", "split_clip", "remove_text", "process_pdf", "process_slides"]
+
+
+def _peak_rss_mb(children: bool = False) -> float | None:
+    """Max RSS of this process (or of its largest child process), in MB; None if not measurable here."""
+    try:
+        import resource
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+    except ImportError:
+        pass
+    if children:
+        return None
+    try:
+        import psutil  # Windows: peak working set
+        return psutil.Process().memory_info().peak_wset / 2**20
+    except (ImportError, AttributeError):
+        return None
+
+
+def _run_stage(stage: str, path: Path, workers: int) -> Path:
+    import pdf_utils
+
+    if stage == "write":
+        pdf_utils.add_write_permissions(path)
+        return path
+    if stage == "watermark":
+        return pdf_utils.remove_watermarks_with_pikepdf(path, inplace=False)
+    if stage == "split":
+        return pdf_utils.split_pages_horizontally(path, inplace=False)
+    if stage == "split_clip":
+        return pdf_utils.split_pages_horizontally(path, inplace=False, clip_content=True)
+    if stage == "remove_text":
+        return pdf_utils.remove_text(path, synthetic_decks.WATERMARK_TEXT)
+    if stage == "process_pdf":
+        return pdf_utils.process_pdf(path, path.with_name(path.stem + "_processed.pdf"), verbose=False)
+    if stage == "process_slides":
+        import process_slides
+        # `path` is the folder of decks: run the CLI on it, writing to <folder>/cleaned
+        argv = sys.argv
+        sys.argv = ["process_slides.py", "--folder", str(path), "--force", "1", "--workers", str(workers)]
+        try:
+            process_slides.main()
+        finally:
+            sys.argv = argv
+        return path / "cleaned"
+    raise ValueError(f"Stage `{stage}` not supported. Pick one of {STAGES}.")
+
+
+def _measure(stage: str, path: Path, workers: int, results):
+    """Child process: runs one stage and sends back its measurements."""
+    import pdf_utils  # noqa: F401  (imported before the baseline, as in the real runs)
+    import process_slides  # noqa: F401
+
+    baseline = _peak_rss_mb()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out_path = _run_stage(stage, path, workers)
+    seconds = time.perf_counter() - t0
+    peak = _peak_rss_mb()
+    children_peak = _peak_rss_mb(children=True)
+    if peak is not None and children_peak is not None:
+        peak = max(peak, children_peak)
+    if out_path.is_dir():
+        out_bytes = sum(f.stat().st_size for f in out_path.glob("*.pdf"))
+    else:
+        out_bytes = out_path.stat().st_size
+    results.put({"seconds": seconds, "peak_mb": peak, "baseline_mb": baseline, "out_kb": out_bytes / 1024})
+
+
+def _context():
+    # Linux keeps the max RSS across exec: fork the measured processes from a small forkserver,
+    # not from this process (which grows while building the decks)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def measure(stage: str, path: Path, workers: int = 0) -> dict:
+    """Runs one stage on a deck (or folder of decks, for process_slides) in a fresh process."""
+    ctx = _context()
+    results = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(stage, path, workers, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the slide-formatter stages on synthetic decks.")
+    ap.add_argument("--pages", type=int, nargs="+", default=[20, 200])
+    ap.add_argument("--image_kb", type=int, default=100)
+    ap.add_argument("--lines", type=int, default=20)
+    ap.add_argument("--watermark", default="xobject", choices=synthetic_decks.WATERMARK_KINDS)
+    ap.add_argument("--encrypted", type=int, default=1)
+    ap.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    ap.add_argument("--decks", type=int, default=8, help="decks in the folder given to process_slides")
+    ap.add_argument("--workers", type=int, default=0, help="process_slides --workers")
+    ap.add_argument("--json", default=None, help="also write the rows to this JSON file, to compare runs")
+    ap.add_argument("--folder", default=None, help="where to write the decks; defaults to the temp dir")
+    args = ap.parse_args()
+
+    if _context().get_start_method() == "forkserver":
+        from multiprocessing import forkserver
+        forkserver.ensure_running()
+
+    deck_options = dict(image_kb=args.image_kb, lines=args.lines, watermark=args.watermark, encrypted=bool(args.encrypted))
+    rows = []
+    header = f"{'pages':>6} {'stage':>14} | {'seconds':>8} {'peak MB':>8} {'+MB':>6} {'in KB':>8} {'out KB':>8}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory(dir=args.folder) as tmp:
+        for pages in args.pages:
+            src = synthetic_decks.make_deck(Path(tmp) / f"deck_{pages}.pdf", pages=pages, **deck_options)
+            in_kb = src.stat().st_size / 1024
+            for stage in args.stages:
+                work_dir = Path(tmp) / f"{stage}_{pages}"
+                os.makedirs(work_dir)
+                if stage == "process_slides":
+                    synthetic_decks.make_corpus(work_dir, args.decks, pages=pages, **deck_options)
+                    target = work_dir
+                    stage_in_kb = sum(f.stat().st_size for f in work_dir.glob("*.pdf")) / 1024
+                else:
+                    target = Path(shutil.copy(src, work_dir / src.name))
+                    stage_in_kb = in_kb
+                result = measure(stage, target, args.workers)
+                row = {"pages": pages, "stage": stage, "in_kb": stage_in_kb, **result}
+                rows.append(row)
+                peak = f"{row['peak_mb']:8.1f}" if row["peak_mb"] is not None else f"{'n/a':>8}"
+                delta = f"{row['peak_mb'] - row['baseline_mb']:6.1f}" if row["peak_mb"] is not None else f"{'n/a':>6}"
+                print(f"{pages:>6} {stage:>14} | {row['seconds']:8.3f} {peak} {delta} {stage_in_kb:8.0f} {row['out_kb']:8.0f}")
+                shutil.rmtree(work_dir)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"options": {**deck_options, "decks": args.decks, "workers": args.workers}, "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
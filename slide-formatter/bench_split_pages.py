@@ -0,0 +1,59 @@
+# bench_split_pages.py
+"""
+Benchmark of the two page splitting modes of split_pages_horizontally, on synthetic decks
+(see synthetic_decks.py):
+- crop: both halves share the whole content stream, only the CropBox differs;
+- clip: each half keeps only the operators drawing inside it (see page_split).
+Reports the split time, the output size, and the time / characters of a full text extraction
+of the output (pypdf, as read_pdf_text does).
+
+Usage:
+    python bench_split_pages.py --pages 20 200 --folder /tmp
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import pypdf
+
+import pdf_utils
+import synthetic_decks
+
+
+def _extract(path: Path) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    chars = sum(len(page.extract_text()) for page in pypdf.PdfReader(path).pages)
+    return time.perf_counter() - t0, chars
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark CropBox-only against content-clipping page splitting.")
+    ap.add_argument("--pages", type=int, nargs="+", default=[20, 200])
+    ap.add_argument("--lines", type=int, default=30, help="text lines per page")
+    ap.add_argument("--image_kb", type=int, default=12, help="weight of the image of each page")
+    ap.add_argument("--folder", default=None, help="where to write the synthetic decks; defaults to the temp dir")
+    args = ap.parse_args()
+
+    print(f"{'pages':>6} {'mode':>5} | {'split s':>8} {'out KB':>8} {'extract s':>9} {'chars':>9}")
+    with tempfile.TemporaryDirectory(dir=args.folder) as tmp:
+        for pages in args.pages:
+            src = Path(tmp) / f"deck_{pages}.pdf"
+            synthetic_decks.make_deck(src, pages=pages, image_kb=args.image_kb, lines=args.lines, watermark="none", encrypted=False)
+            for mode in ("crop", "clip"):
+                work = Path(tmp) / f"work_{mode}_{pages}.pdf"
+                shutil.copy(src, work)
+                t0 = time.perf_counter()
+                out_path = pdf_utils.split_pages_horizontally(work, inplace=False, clip_content=mode == "clip")
+                split_seconds = time.perf_counter() - t0
+                extract_seconds, chars = _extract(out_path)
+                print(
+                    f"{pages:>6} {mode:>5} | {split_seconds:8.3f} {os.path.getsize(out_path) / 1024:8.0f} "
+                    f"{extract_seconds:9.3f} {chars:9d}"
+                )
+
+
+if __name__ == "__main__":
+    main()
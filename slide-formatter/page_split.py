@@ -0,0 +1,438 @@
+"""
+Content-aware page splitting: clips a content stream to the operators that can paint inside a box.
+
+The content stream is interpreted once (graphics state, text state and font widths) to get the
+bounding box, in default user space, of every painting operator: text shows, paths, XObjects and
+inline images. Each half then keeps the operators intersecting its box, plus all the state
+operators. The output is visually the same under the half's CropBox, but text extractors no
+longer see the text of the other half.
+
+Dropped text shows are replaced by a TJ spacing of the same advance when later text on the
+same line is kept, so it stays in place. Operators whose extent or effect cannot be bounded
+(Type3 or vertical fonts, text following a show of unknown widths on the same line, clipping
+paths and text, shadings) are kept in every half, as are the marked-content operators.
+"""
+import math
+from typing import Iterable
+
+import pikepdf
+from pikepdf import Array, Dictionary, Name, Stream, String
+
+import text_removal
+
+Matrix = tuple[float, float, float, float, float, float]
+Box = tuple[float, float, float, float]
+
+_IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+# upper bound of a glyph width (glyph space) when the font does not declare its widths
+_MAX_GLYPH_WIDTH = 1100.0
+
+# operators that only change the graphics / text state
+_STATE_OPERATORS = {
+    "w", "J", "j", "M", "d", "ri", "i", "gs", "cm", "CS", "cs", "SC", "SCN", "sc", "scn",
+    "G", "g", "RG", "rg", "K", "k", "Tc", "Tw", "Tz", "TL", "Tf", "Tr", "Ts",
+}
+_TEXT_POSITIONING = {"Td", "TD", "Tm", "T*"}
+_TEXT_SHOWING = {"Tj", "TJ", "'", '"'}
+_PATH_CONSTRUCTION = {"m", "l", "c", "v", "y", "h", "re"}
+_PATH_PAINTING = {"S", "s", "f", "F", "f*", "B", "B*", "b", "b*", "n"}
+_PATH_STROKING = {"S", "s", "B", "B*", "b", "b*"}
+_CLIPPING = {"W", "W*"}
+_MARKED_CONTENT = {"BMC", "BDC", "EMC", "MP", "DP"}
+# state operators setting their parameters regardless of the previous values
+_OVERRIDING_OPERATORS = {
+    "w", "J", "j", "M", "d", "ri", "i", "G", "g", "RG", "rg", "K", "k",
+    "Tc", "Tw", "Tz", "TL", "Tf", "Tr", "Ts",
+}
+
+# categories of the analysed instructions
+_ALWAYS, _STATE, _MARKED, _POSITION, _BEGIN_TEXT, _END_TEXT, _SAVE, _RESTORE, _SHOW, _PAINT = range(10)
+
+
+def _multiply(m1: Matrix, m2: Matrix) -> Matrix:
+    """m1 x m2, with the PDF row-vector convention (m1 is applied first)."""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def _apply(m: Matrix, x: float, y: float) -> tuple[float, float]:
+    a, b, c, d, e, f = m
+    return (a * x + c * y + e, b * x + d * y + f)
+
+
+def _box_of(m: Matrix, x0: float, y0: float, x1: float, y1: float) -> Box:
+    """Bounding box of the rectangle (x0, y0, x1, y1) transformed by m."""
+    xs, ys = zip(*(_apply(m, x, y) for x, y in ((x0, y0), (x0, y1), (x1, y0), (x1, y1))))
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _intersects(a: Box, b: Box) -> bool:
+    # touching counts: an item lying on the split line is kept in both halves
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class _FontMetrics:
+    """Widths (through text_removal.FontDecoder) and vertical extent of a font, in glyph space / 1000."""
+    def __init__(self, font: Dictionary | None):
+        self.decoder = text_removal.FontDecoder(font)
+        self.ascent, self.descent = 1.0, -0.3
+        self.known = isinstance(font, Dictionary)
+        if not self.known:
+            return
+        subtype = font.get("/Subtype", None)
+        encoding = font.get("/Encoding", None)
+        if subtype == Name.Type3 or (isinstance(encoding, Name) and str(encoding).endswith("-V")):
+            # Type3 glyph space has its own FontMatrix; vertical fonts advance downwards
+            self.known = False
+            return
+        descriptor = font.get("/FontDescriptor", None)
+        descendants = font.get("/DescendantFonts", None)
+        if descriptor is None and isinstance(descendants, Array) and len(descendants) > 0:
+            descriptor = descendants[0].get("/FontDescriptor", None)
+        if isinstance(descriptor, Dictionary):
+            # the declared values are sometimes too tight: never go below the defaults
+            self.ascent = max(self.ascent, float(descriptor.get("/Ascent", 0)) / 1000)
+            self.descent = min(self.descent, float(descriptor.get("/Descent", 0)) / 1000)
+
+
+class _State:
+    __slots__ = ("ctm", "line_width", "miter_limit", "font", "font_size",
+                 "char_spacing", "word_spacing", "h_scale", "leading", "render_mode", "rise")
+
+    def __init__(self):
+        self.ctm = _IDENTITY
+        self.line_width = 1.0
+        self.miter_limit = 10.0
+        self.font: _FontMetrics | None = None
+        self.font_size = 0.0
+        self.char_spacing = 0.0
+        self.word_spacing = 0.0
+        self.h_scale = 1.0
+        self.leading = 0.0
+        self.render_mode = 0
+        self.rise = 0.0
+
+    def copy(self) -> "_State":
+        other = _State.__new__(_State)
+        for name in _State.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+
+class _Analysis:
+    """Per instruction: its category, its bounding box (painting operators) and, for text shows, its advance as a TJ number."""
+    def __init__(self, n: int):
+        self.categories = [_ALWAYS] * n
+        self.boxes: list[Box | None] = [None] * n
+        self.advances: list[float | None] = [None] * n
+
+
+def _analyse(instructions: list, resources: Dictionary | None, fonts_cache: dict) -> _Analysis:
+    analysis = _Analysis(len(instructions))
+    fonts = resources.get("/Font", None) if isinstance(resources, Dictionary) else None
+    xobjects = resources.get("/XObject", None) if isinstance(resources, Dictionary) else None
+
+    def metrics_for(font_name) -> _FontMetrics:
+        font = fonts.get(font_name, None) if isinstance(fonts, Dictionary) else None
+        key = font.objgen if isinstance(font, Dictionary) and font.is_indirect else id(font)
+        if key not in fonts_cache:
+            fonts_cache[key] = _FontMetrics(font)
+        return fonts_cache[key]
+
+    state = _State()
+    stack: list[_State] = []
+    text_matrix = line_matrix = _IDENTITY
+    text_matrix_known = True
+    path_points: list[tuple[float, float]] = []
+    path_indices: list[int] = []
+    clipping = False
+    unknown_advances: list[int] = []
+
+    def next_line(tx: float, ty: float):
+        nonlocal text_matrix, line_matrix, text_matrix_known
+        line_matrix = _multiply((1.0, 0.0, 0.0, 1.0, tx, ty), line_matrix)
+        text_matrix = line_matrix
+        text_matrix_known = True
+
+    def show(idx: int, elements: list):
+        """Box and advance of a text show; moves the text matrix past it."""
+        nonlocal text_matrix, text_matrix_known
+        font = state.font
+        if font is None or not font.known or not text_matrix_known or state.render_mode >= 4:
+            # clipping text modes change what is painted afterwards: always kept
+            text_matrix_known = False
+            return
+        h_scale = state.h_scale
+        cursor = low = high = 0.0
+        exact = True
+        for element in elements:
+            if isinstance(element, String):
+                data = bytes(element)
+                for _, start, end, width in font.decoder.glyphs(data):
+                    if width is None:
+                        # e.g. a standard 14 font without /Widths: over-estimate the box
+                        width, exact = _MAX_GLYPH_WIDTH, False
+                    spacing = state.char_spacing
+                    if end - start == 1 and data[start] == 32:
+                        spacing += state.word_spacing
+                    glyph_start = cursor
+                    cursor += (width / 1000 * state.font_size + spacing) * h_scale
+                    low, high = min(low, glyph_start, cursor), max(high, glyph_start, cursor)
+            else:
+                cursor -= float(element) / 1000 * state.font_size * h_scale
+        if state.font_size * h_scale != 0:
+            # without a font size the advance cannot be written as a TJ number: always kept
+            y0 = state.rise + font.descent * state.font_size
+            y1 = state.rise + font.ascent * state.font_size
+            analysis.boxes[idx] = _box_of(_multiply(text_matrix, state.ctm), low, min(y0, y1), high, max(y0, y1))
+            analysis.categories[idx] = _SHOW
+            if exact:
+                analysis.advances[idx] = -cursor / (state.font_size * h_scale) * 1000
+            else:
+                unknown_advances.append(idx)
+        if exact:
+            text_matrix = _multiply((1.0, 0.0, 0.0, 1.0, cursor, 0.0), text_matrix)
+        else:
+            text_matrix_known = False
+
+    for idx, instruction in enumerate(instructions):
+        if isinstance(instruction, pikepdf.ContentStreamInlineImage):
+            analysis.boxes[idx] = _box_of(state.ctm, 0, 0, 1, 1)
+            analysis.categories[idx] = _PAINT
+            continue
+        op = str(instruction.operator)
+        operands = instruction.operands
+
+        if op in _STATE_OPERATORS:
+            analysis.categories[idx] = _STATE
+            if op == "cm":
+                state.ctm = _multiply(tuple(map(float, operands)), state.ctm)
+            elif op == "w":
+                state.line_width = float(operands[0])
+            elif op == "M":
+                state.miter_limit = float(operands[0])
+            elif op == "Tf":
+                state.font = metrics_for(operands[0])
+                state.font_size = float(operands[1])
+            elif op == "Tc":
+                state.char_spacing = float(operands[0])
+            elif op == "Tw":
+                state.word_spacing = float(operands[0])
+            elif op == "Tz":
+                state.h_scale = float(operands[0]) / 100
+            elif op == "TL":
+                state.leading = float(operands[0])
+            elif op == "Tr":
+                state.render_mode = int(operands[0])
+            elif op == "Ts":
+                state.rise = float(operands[0])
+        elif op == "q":
+            analysis.categories[idx] = _SAVE
+            stack.append(state.copy())
+        elif op == "Q":
+            analysis.categories[idx] = _RESTORE
+            if stack:
+                state = stack.pop()
+        elif op in _MARKED_CONTENT:
+            analysis.categories[idx] = _MARKED
+        elif op == "BT":
+            analysis.categories[idx] = _BEGIN_TEXT
+            text_matrix = line_matrix = _IDENTITY
+            text_matrix_known = True
+        elif op == "ET":
+            analysis.categories[idx] = _END_TEXT
+        elif op in _TEXT_POSITIONING:
+            analysis.categories[idx] = _POSITION
+            if op == "Td":
+                next_line(float(operands[0]), float(operands[1]))
+            elif op == "TD":
+                state.leading = -float(operands[1])
+                next_line(float(operands[0]), float(operands[1]))
+            elif op == "Tm":
+                text_matrix = line_matrix = tuple(map(float, operands))
+                text_matrix_known = True
+            else:
+                next_line(0.0, -state.leading)
+        elif op in _TEXT_SHOWING:
+            if op == '"':
+                state.word_spacing = float(operands[0])
+                state.char_spacing = float(operands[1])
+            if op in ("'", '"'):
+                next_line(0.0, -state.leading)
+            shown = operands[-1]
+            show(idx, list(shown) if op == "TJ" else [shown])
+        elif op in _PATH_CONSTRUCTION:
+            path_indices.append(idx)
+            values = [float(v) for v in operands]
+            if op == "re":
+                x, y, w, h = values
+                path_points.extend(_apply(state.ctm, px, py) for px, py in ((x, y), (x + w, y), (x, y + h), (x + w, y + h)))
+            else:
+                path_points.extend(_apply(state.ctm, values[i], values[i + 1]) for i in range(0, len(values) - 1, 2))
+        elif op in _CLIPPING:
+            path_indices.append(idx)
+            clipping = True
+        elif op in _PATH_PAINTING:
+            path_indices.append(idx)
+            if not clipping and path_points:
+                xs, ys = zip(*path_points)
+                margin = 0.0
+                if op in _PATH_STROKING:
+                    a, b, c, d, _, _ = state.ctm
+                    scale = max(math.hypot(a, b), math.hypot(c, d))
+                    # miter joins can reach miter_limit * half the line width
+                    margin = max(state.line_width, 1.0) * scale * max(state.miter_limit, 1.0) / 2
+                box = (min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin)
+                for path_idx in path_indices:
+                    analysis.boxes[path_idx] = box
+                    analysis.categories[path_idx] = _PAINT
+            path_points, path_indices, clipping = [], [], False
+        elif op == "Do":
+            xobj = xobjects.get(operands[0], None) if isinstance(xobjects, Dictionary) else None
+            if isinstance(xobj, Stream) and xobj.get("/Subtype", None) == Name.Image:
+                analysis.boxes[idx] = _box_of(state.ctm, 0, 0, 1, 1)
+                analysis.categories[idx] = _PAINT
+            elif isinstance(xobj, Stream) and xobj.get("/Subtype", None) == Name.Form and "/BBox" in xobj:
+                matrix = tuple(map(float, xobj.get("/Matrix", Array(_IDENTITY))))
+                analysis.boxes[idx] = _box_of(_multiply(matrix, state.ctm), *map(float, xobj.BBox))
+                analysis.categories[idx] = _PAINT
+        # anything else (sh, marked content, compatibility sections, unknown operators) is always kept
+
+    # a show of unknown advance can only be dropped if no text is shown after it on the same line
+    for idx in unknown_advances:
+        for instruction in instructions[idx + 1:]:
+            op = "" if isinstance(instruction, pikepdf.ContentStreamInlineImage) else str(instruction.operator)
+            if op in _TEXT_POSITIONING or op in ("ET", "'", '"'):
+                break
+            if op in ("Tj", "TJ"):
+                analysis.categories[idx] = _ALWAYS
+                break
+    return analysis
+
+
+def _without_positioning(items: list) -> list:
+    """Items of a text object without BT / ET, text moves and advances; TD still sets the leading."""
+    out = []
+    for category, instruction in items:
+        if category == _POSITION and str(instruction.operator) == "TD":
+            out.append((_STATE, pikepdf.ContentStreamInstruction([-instruction.operands[1]], pikepdf.Operator("TL"))))
+        elif category not in (_BEGIN_TEXT, _END_TEXT, _POSITION, None):
+            out.append((category, instruction))
+    return out
+
+
+def _clip(instructions: list, analysis: _Analysis, box: Box) -> tuple[list, bool]:
+    """Instructions to keep for `box`, and whether anything was dropped."""
+    # 1) drop the painting operators outside the box (text shows leave their line moves and advance)
+    items: list[tuple[int, object]] = []
+    dropped = False
+    for idx, instruction in enumerate(instructions):
+        category = analysis.categories[idx]
+        if category not in (_SHOW, _PAINT) or _intersects(analysis.boxes[idx], box):
+            items.append((category, instruction))
+            continue
+        dropped = True
+        if category == _SHOW:
+            op = str(instruction.operator)
+            if op == '"':
+                items.append((_STATE, pikepdf.ContentStreamInstruction([instruction.operands[0]], pikepdf.Operator("Tw"))))
+                items.append((_STATE, pikepdf.ContentStreamInstruction([instruction.operands[1]], pikepdf.Operator("Tc"))))
+            if op in ("'", '"'):
+                items.append((_POSITION, pikepdf.ContentStreamInstruction([], pikepdf.Operator("T*"))))
+            if analysis.advances[idx] is not None:
+                items.append((None, analysis.advances[idx]))  # advance of the dropped text, see step 2
+    if not dropped:
+        return instructions, False
+
+    # 2) text objects: keep an advance only if text is shown after it on the same line;
+    #    a text object showing nothing keeps just its state operators, outside BT ... ET
+    out: list[tuple[int, object]] = []
+    i = 0
+    while i < len(items):
+        category, instruction = items[i]
+        if category != _BEGIN_TEXT:
+            out.append(items[i])
+            i += 1
+            continue
+        end = i + 1
+        while end < len(items) and items[end][0] != _END_TEXT:
+            end += 1
+        block = items[i:end + 1]
+        i = end + 1
+        visible = [k for k, (c, _) in enumerate(block) if c in (_SHOW, _ALWAYS)]
+        if not visible:
+            out.extend(_without_positioning(block))
+            continue
+        # moves after the last text shown are useless, as are advances not followed by text
+        out.extend(block[:1])
+        tail = _without_positioning(block[visible[-1] + 1:-1])
+        pending = 0.0
+        held: list[tuple[int, object]] = []
+        for c, value in block[1:visible[-1] + 1]:
+            if c is None:
+                pending += value
+            elif pending and c in (_STATE, _MARKED):
+                # the advance is in units of the current font size: emit it before Tf & co.
+                held.append((c, value))
+            else:
+                if c == _POSITION:
+                    pending = 0.0
+                if pending:
+                    out.append((_SHOW, pikepdf.ContentStreamInstruction([Array([pending])], pikepdf.Operator("TJ"))))
+                    pending = 0.0
+                out.extend(held)
+                held = []
+                out.append((c, value))
+        out.extend(held)
+        out.extend(tail)
+        out.extend(block[-1:])
+
+    # 3) drop the q ... Q groups left with state operators only, and the state operators
+    #    overridden by the same operator before anything is drawn (e.g. the Tf of dropped text)
+    result: list[tuple[int, object] | None] = []
+    saves: list[int] = []
+    last_set: dict[str, int] = {}
+    for category, instruction in out:
+        if category == _SAVE:
+            saves.append(len(result))
+        elif category == _RESTORE and saves:
+            start = saves.pop()
+            if all(item is None or item[0] in (_STATE, _SAVE, _RESTORE) for item in result[start + 1:]):
+                del result[start:]
+                last_set = {}
+                continue
+        if category == _STATE and str(instruction.operator) in _OVERRIDING_OPERATORS:
+            op = str(instruction.operator)
+            if op in last_set:
+                result[last_set[op]] = None
+            last_set[op] = len(result)
+        elif category in (_SHOW, _PAINT, _ALWAYS, _SAVE):
+            last_set = {}
+        result.append((category, instruction))
+    return [item[1] for item in result if item is not None], True
+
+
+def split_content(instructions: list, resources: Dictionary | None, boxes: Iterable[Box], fonts_cache: dict | None = None) -> list[list | None]:
+    """
+    Clips parsed content-stream instructions to each of the given boxes.
+
+    Args:
+        instructions: output of pikepdf.parse_content_stream.
+        resources: the /Resources of the stream (fonts and XObjects are looked up in it).
+        boxes: boxes in default user space, e.g. the CropBox of each half.
+        fonts_cache: cache of font metrics by font object, shared between pages of the same PDF.
+
+    Returns:
+        For each box, the instructions to keep, or None if nothing is dropped (the stream can be reused as is).
+    """
+    analysis = _analyse(instructions, resources, {} if fonts_cache is None else fonts_cache)
+    clipped = []
+    for box in boxes:
+        kept, dropped = _clip(instructions, analysis, box)
+        clipped.append(kept if dropped else None)
+    return clipped
@@ -2,13 +2,20 @@ import os
 from glob import glob
 from pathlib import Path
 import subprocess
+import hashlib
+import sqlite3
 import codecs
 import re
+from typing import Iterator
 
 # pip install pikepdf==9.*
 import pikepdf
 from pikepdf import Name, Stream, Array, String, Dictionary
 
+import page_split
+import text_extraction
+import text_removal
+
 def add_write_permissions(pdf_path):   
     pdf = pikepdf.open(pdf_path, allow_overwriting_input=True)
     pdf.save(pdf_path)
@@ -17,41 +24,191 @@ def _add_suffix(path: Path, suffix: str) -> Path:
     """Adds a suffix before the file extension."""
     return path.with_name(f"{path.stem}{suffix}.pdf")
 
-def remove_watermarks_with_pikepdf(pdf_path: Path, inplace: bool) -> Path:
-    def _is_watermark_present(xobj_dict: Dictionary) -> bool:
-        """Checks if the Form XObject has watermark metadata or characteristics."""
+def _is_watermark_present(xobj_dict: Dictionary) -> bool:
+    """Checks if the Form XObject has watermark metadata or characteristics."""
 
-        # Detect Adobe watermark metadata flag
-        piece = xobj_dict.get("/PieceInfo", None)
-        if isinstance(piece, Dictionary):
-            for _, v in piece.items():
-                if isinstance(v, Dictionary) and v.get("/Private", None) == Name("/Watermark"):
-                    return True
-        return False
+    # Detect Adobe watermark metadata flag
+    piece = xobj_dict.get("/PieceInfo", None)
+    if isinstance(piece, Dictionary):
+        for _, v in piece.items():
+            if isinstance(v, Dictionary) and v.get("/Private", None) == Name("/Watermark"):
+                return True
+    return False
 
-    # counters
-    removed_watermarks = 0
+# entries that point back up the document (page tree, annotation owner): not part of a drawing
+_SKIPPED_KEYS = {"/Parent", "/P", "/Length"}
 
+def _object_digest(obj, memo: dict, visiting: set) -> bytes:
+    """
+    Structural sha256 of a PDF object: dictionary entries, array items and raw stream bytes,
+    following indirect references (each one hashed once per `memo`, cycles cut).
+    """
+    objgen = obj.objgen if isinstance(obj, pikepdf.Object) and obj.is_indirect else None
+    if objgen is not None:
+        if objgen in memo:
+            return memo[objgen]
+        if objgen in visiting:
+            return b"cycle"
+        visiting.add(objgen)
+    h = hashlib.sha256()
+    if isinstance(obj, (Dictionary, Stream)):
+        h.update(b"S" if isinstance(obj, Stream) else b"D")
+        for key in sorted(obj.keys()):
+            if key not in _SKIPPED_KEYS:
+                h.update(key.encode() + _object_digest(obj[key], memo, visiting))
+        if isinstance(obj, Stream):
+            h.update(obj.read_raw_bytes())
+    elif isinstance(obj, Array):
+        h.update(b"A")
+        for item in obj:
+            h.update(_object_digest(item, memo, visiting))
+    else:
+        h.update(repr(obj).encode())
+    digest = h.digest()
+    if objgen is not None:
+        visiting.discard(objgen)
+        memo[objgen] = digest
+    return digest
+
+class WatermarkSignatureCache:
+    """
+    Persistent set of signatures of confirmed watermarks (SQLite, safe to share between
+    processes). Decks from the same source reuse the same watermark drawing, so a Form XObject
+    whose signature is known is removed even when it carries no watermark tag.
+    The signature covers what the form draws, not only its operators: the content stream, the
+    /BBox and the XObjects and fonts it names (recursively), so a generic wrapper such as
+    `q 200 0 0 100 0 0 cm /Im0 Do Q` drawing another image does not match.
+    Use:
+        cache = WatermarkSignatureCache("watermark_signatures.sqlite")
+        process_pdf(pdf_path, out_path, watermark_cache=cache)
+        cache.close()
+    """
+    # shorter contents (e.g. an already blanked "q Q") are too generic to identify a watermark
+    MIN_CONTENT_BYTES = 16
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            " content_hash TEXT PRIMARY KEY,"
+            " source TEXT,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    @staticmethod
+    def content_hash(xobj: Stream, memo: dict | None = None) -> str | None:
+        """
+        Signature of a Form XObject (None if its content is too short to be distinctive).
+        `memo` shares the hashes of the resources between the forms of one document.
+        """
+        data = xobj.read_bytes()
+        if len(data) < WatermarkSignatureCache.MIN_CONTENT_BYTES:
+            return None
+        memo = {} if memo is None else memo
+        h = hashlib.sha256(data)
+        h.update(_object_digest(xobj.get("/BBox", None), memo, set()))
+        resources = xobj.get("/Resources", None)
+        if isinstance(resources, Dictionary):
+            for category in ("/XObject", "/Font"):
+                h.update(category.encode() + _object_digest(resources.get(category, None), memo, set()))
+        return h.hexdigest()
+
+    def __contains__(self, content_hash: str) -> bool:
+        row = self._conn.execute("SELECT 1 FROM signatures WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row is not None
+
+    def add(self, content_hashes: list[str], source: str = ""):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO signatures (content_hash, source) VALUES (?, ?)",
+            [(h, source) for h in content_hashes],
+        )
+
+    def record_hits(self, content_hashes: list[str]):
+        self._conn.executemany("UPDATE signatures SET hits = hits + 1 WHERE content_hash = ?", [(h,) for h in content_hashes])
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+def _iter_page_form_xobjects(pdf: pikepdf.Pdf) -> Iterator[tuple[Stream, bool]]:
+    """
+    Yields each Form XObject drawn by the pages once (shared XObjects are visited once),
+    as (xobject, is_watermark_annotation): the page resources, the nested Form XObjects,
+    and the appearance streams of the page annotations.
+    """
+    seen = set()
+    stack = []
+
+    def push(xobj, is_annotation: bool):
+        if isinstance(xobj, Stream) and xobj.objgen not in seen:
+            # direct streams do not exist in PDF, so objgen is never (0, 0) here
+            seen.add(xobj.objgen)
+            stack.append((xobj, is_annotation))
+
+    def push_resources(resources):
+        if not isinstance(resources, Dictionary):
+            return
+        xobjects = resources.get("/XObject", None)
+        if isinstance(xobjects, Dictionary):
+            for _, xobj in xobjects.items():
+                push(xobj, False)
+
+    for page in pdf.pages:
+        push_resources(page.obj.get("/Resources", None))
+        for annot in page.obj.get("/Annots", None) or []:
+            appearance = annot.get("/AP", None) if isinstance(annot, Dictionary) else None
+            if isinstance(appearance, Dictionary):
+                push(appearance.get("/N", None), annot.get("/Subtype", None) == Name("/Watermark"))
+
+        while stack:
+            xobj, is_annotation = stack.pop()
+            # images and other non-Form XObjects have no content to inspect
+            if xobj.get("/Subtype", None) != Name("/Form") and not is_annotation:
+                continue
+            yield xobj, is_annotation
+            push_resources(xobj.get("/Resources", None))
+
+def _remove_watermark_xobjects(pdf: pikepdf.Pdf, watermark_cache: WatermarkSignatureCache | None = None, source: str = "") -> int:
+    """
+    Blanks the watermark Form XObjects of an open PDF, in memory. Returns how many were removed.
+    A Form XObject is a watermark if it carries the Adobe watermark tag, if it is the appearance
+    of a /Watermark annotation, or if its signature is in `watermark_cache`.
+    The signatures of the tagged ones are added to `watermark_cache`.
+    """
+    watermarks, new_hashes, hits = [], [], []
+    memo = {}
+    for xobj, is_watermark_annotation in _iter_page_form_xobjects(pdf):
+        tagged = is_watermark_annotation or _is_watermark_present(xobj)
+        content_hash = WatermarkSignatureCache.content_hash(xobj, memo) if watermark_cache is not None else None
+        if tagged:
+            watermarks.append(xobj)
+            if content_hash is not None:
+                new_hashes.append(content_hash)
+        elif content_hash is not None and content_hash in watermark_cache:
+            watermarks.append(xobj)
+            hits.append(content_hash)
+
+    # replace the watermarks with an empty drawing
+    for xobj in watermarks:
+        xobj.write(b"q Q\n")
+
+    if watermark_cache is not None:
+        watermark_cache.add(new_hashes, source=source)
+        watermark_cache.record_hits(hits)
+    return len(watermarks)
+
+def remove_watermarks_with_pikepdf(pdf_path: Path, inplace: bool, watermark_cache: WatermarkSignatureCache | None = None) -> Path:
     # setup in/out paths
     if isinstance(pdf_path, str):
         pdf_path = Path(pdf_path)
     out_path = _add_suffix(pdf_path, "_clean")
 
     with pikepdf.open(pdf_path, allow_overwriting_input=True) as pdf:
-        # Iterate all objects in the pdf
-        for obj in list(pdf.objects):
-            # consider only Form XObject
-            if not isinstance(obj, Stream) or obj.get("/Subtype", None) != Name("/Form"):
-                continue
-                        
-            # if the object is a watermark, remove it
-            if _is_watermark_present(obj):
-                # replace the item with an empty object
-                obj.write(b"q Q\n")
-
-                removed_watermarks += 1
-                continue
-            
+        removed_watermarks = _remove_watermark_xobjects(pdf, watermark_cache, source=pdf_path.name)
         print(f"Removed {removed_watermarks} watermark XObject(s)")
         pdf.save(out_path)
 
@@ -91,7 +248,8 @@ def _revert_qpdf_simplification(pdf_path: Path) -> Path:
 
     return pdf_path
 
-def remove_text(pdf_path: Path, text_to_remove: str) -> Path:
+def _remove_text_with_qpdf(pdf_path: Path, text_to_remove: str) -> Path:
+    """Legacy text removal through a qpdf expand / re-linearize round trip (kept to benchmark remove_text)."""
     # define in/out paths
     pdf_path = Path(pdf_path)
     out_path = _add_suffix(path=pdf_path, suffix='_test')
@@ -143,36 +301,157 @@ def remove_text(pdf_path: Path, text_to_remove: str) -> Path:
     # revert PDF structure to original
     _revert_qpdf_simplification(pdf_path=out_path)
 
-def split_pages_horizontally(pdf_path: str | Path, inplace: bool) -> Path:
+    return out_path
+
+def _iter_text_streams(pdf: pikepdf.Pdf) -> Iterator[tuple[pikepdf.Page | Stream, Dictionary | None]]:
+    """Yields every content stream that can show text, with its resources: pages, then their Form XObjects."""
+    for page in pdf.pages:
+        yield page, page.obj.get("/Resources", None)
+    for xobj, _ in _iter_page_form_xobjects(pdf):
+        yield xobj, xobj.get("/Resources", None)
+
+def _remove_text_in_place(pdf: pikepdf.Pdf, texts_to_remove: list[str]) -> int:
+    """Removes the given texts from the content streams of an open PDF, in memory. Returns the occurrences removed."""
+    return text_removal.remove_text_from_pdf(pdf, texts_to_remove, _iter_text_streams(pdf))
+
+def remove_text(pdf_path: Path, text_to_remove: str | list[str], inplace: bool = False) -> Path:
     """
-    Create a new PDF with each original page split into two pages:
-    TOP half first, then BOTTOM half. Lossless (CropBox only).
+    Removes a text (e.g. a watermark line) from every page, in process: the text-showing operators
+    of the page and Form XObject content streams are decoded with their font encoding and the
+    matching glyphs are dropped. Matching ignores case and whitespace.
+
+    Args:
+        pdf_path: input PDF.
+        text_to_remove: text, or list of texts, to remove.
+        inplace: overwrite the input instead of writing `<name>_notext.pdf`.
+
+    Returns:
+        The output path.
     """
     pdf_path = Path(pdf_path)
-    out_path = _add_suffix(pdf_path, "_split")
+    out_path = pdf_path if inplace else _add_suffix(pdf_path, "_notext")
+    texts = [text_to_remove] if isinstance(text_to_remove, str) else list(text_to_remove)
 
-    with pikepdf.open(pdf_path, allow_overwriting_input=True) as src:
-        dst = pikepdf.Pdf.new()
+    with pikepdf.open(pdf_path, allow_overwriting_input=inplace) as pdf:
+        removed = _remove_text_in_place(pdf, texts)
+        print(f"Removed {removed} text occurrence(s)")
+        pdf.save(out_path)
 
-        for src_page in src.pages:
-            # Use existing visible box if any, otherwise MediaBox
-            box = src_page.obj.get("/CropBox", src_page.obj.get("/MediaBox"))
-            x0, y0, x1, y1 = map(float, box)
-            mid_y = y0 + (y1 - y0) / 2.0
+    return out_path
 
-            # Import the same source page twice into dst
-            dst.pages.append(src_page)  # will import/copy into dst
-            dst.pages.append(src_page)
+def _clip_halves(pdf: pikepdf.Pdf, p_top: pikepdf.Page, p_bot: pikepdf.Page, fonts_cache: dict):
+    """Gives each half its own content stream, without the operators painting only in the other half."""
+    try:
+        # both halves still share the content stream and resources of the original page
+        instructions = pikepdf.parse_content_stream(p_top)
+        boxes = [tuple(map(float, half.obj.CropBox)) for half in (p_top, p_bot)]
+        clipped = page_split.split_content(instructions, p_top.obj.get("/Resources", None), boxes, fonts_cache)
+    except (pikepdf.PdfError, ValueError, TypeError, IndexError) as e:
+        # unexpected content: keep the shared content stream (CropBox only)
+        print(f"Could not clip the content of a page ({e}); keeping it whole")
+        return
+    for half, kept in zip((p_top, p_bot), clipped):
+        if kept is not None:
+            half.obj.Contents = pdf.make_stream(pikepdf.unparse_content_stream(kept))
+
+def _split_pages_in_place(pdf: pikepdf.Pdf, clip_content: bool = False) -> int:
+    """
+    Replaces each page of an open PDF with its TOP and BOTTOM halves, in memory.
+    Both halves share the resources of the original page; they also share its content stream,
+    unless `clip_content`: then each half only keeps the operators painting inside its CropBox
+    (see page_split), so text extractors do not read the other half.
+    Returns the number of pages split.
+    """
+    n_pages = len(pdf.pages)
+    fonts_cache: dict = {}
+
+    # walk backwards, so inserting a copy after a page does not shift the pages still to split
+    for idx in range(n_pages - 1, -1, -1):
+        page = pdf.pages[idx]
+        # Use existing visible box if any, otherwise MediaBox
+        box = page.obj.get("/CropBox", page.obj.get("/MediaBox"))
+        x0, y0, x1, y1 = map(float, box)
+        mid_y = y0 + (y1 - y0) / 2.0
+
+        # Insert a (shallow) copy of the page right after it
+        pdf.pages.insert(idx + 1, page)
+        p_top = pdf.pages[idx]
+        p_bot = pdf.pages[idx + 1]
+
+        # Set crop boxes: TOP first, then BOTTOM
+        p_top.obj["/CropBox"] = Array([x0, mid_y, x1, y1])
+        p_bot.obj["/CropBox"] = Array([x0, y0,   x1, mid_y])
+        if clip_content:
+            _clip_halves(pdf, p_top, p_bot, fonts_cache)
+
+    return n_pages
+
+def process_pdf(
+    pdf_path: str | Path,
+    out_path: str | Path | None = None,
+    write: bool = True,
+    no_watermark: bool = True,
+    split_pages: bool = True,
+    clip_split: bool = False,
+    verbose: bool = True,
+    watermark_cache: WatermarkSignatureCache | None = None,
+    texts_to_remove: list[str] | None = None,
+) -> Path:
+    """
+    Fused pipeline: opens the PDF once, applies the selected stages in memory and writes
+    the result once, straight to `out_path` (instead of one open + save per stage).
+
+    Args:
+        pdf_path: input PDF.
+        out_path: output PDF; defaults to `pdf_path` (in place).
+        write: drop the encryption / permission restrictions (see add_write_permissions).
+        no_watermark: blank the watermark Form XObjects (see remove_watermarks_with_pikepdf).
+        split_pages: split each page into TOP and BOTTOM halves (see split_pages_horizontally).
+        clip_split: give each half only the content drawn inside it (see split_pages_horizontally).
+        verbose: print what each stage did.
+        watermark_cache: signatures of known watermarks, to also remove untagged ones (and learn new ones).
+        texts_to_remove: texts to remove from every page (see remove_text).
+
+    Returns:
+        The output path.
+    """
+    pdf_path = Path(pdf_path)
+    out_path = Path(out_path) if out_path is not None else pdf_path
+    inplace = out_path.resolve() == pdf_path.resolve()
+
+    with pikepdf.open(pdf_path, allow_overwriting_input=inplace) as pdf:
+        if no_watermark:
+            removed_watermarks = _remove_watermark_xobjects(pdf, watermark_cache, source=pdf_path.name)
+            if verbose:
+                print(f"Removed {removed_watermarks} watermark XObject(s)")
+        if texts_to_remove:
+            removed_texts = _remove_text_in_place(pdf, texts_to_remove)
+            if verbose:
+                print(f"Removed {removed_texts} text occurrence(s)")
+        if split_pages:
+            split = _split_pages_in_place(pdf, clip_content=clip_split)
+            if verbose:
+                print(f"Split {split} page(s) in 2")
+
+        # saving without `encryption` drops the restrictions; keep them if not asked to remove them
+        keep_encryption = not write and pdf.is_encrypted
+        pdf.save(out_path, encryption=True if keep_encryption else None)
 
-            # Get the two newly added pages
-            p_top = dst.pages[-2]
-            p_bot = dst.pages[-1]
+    return out_path
 
-            # Set crop boxes: TOP first, then BOTTOM
-            p_top.obj["/CropBox"] = Array([x0, mid_y, x1, y1])
-            p_bot.obj["/CropBox"] = Array([x0, y0,   x1, mid_y])
+def split_pages_horizontally(pdf_path: str | Path, inplace: bool, clip_content: bool = False) -> Path:
+    """
+    Create a new PDF with each original page split into two pages:
+    TOP half first, then BOTTOM half. Lossless (CropBox only).
+    With `clip_content`, each half also drops the operators drawing only in the other half,
+    so its text (as seen by read_pdf_text) is just the visible one.
+    """
+    pdf_path = Path(pdf_path)
+    out_path = _add_suffix(pdf_path, "_split")
 
-        dst.save(out_path)
+    with pikepdf.open(pdf_path, allow_overwriting_input=True) as pdf:
+        _split_pages_in_place(pdf, clip_content=clip_content)
+        pdf.save(out_path)
 
     if inplace:
         os.remove(pdf_path)
@@ -180,14 +459,27 @@ def split_pages_horizontally(pdf_path: str | Path, inplace: bool) -> Path:
 
     return out_path
 
-def read_pdf_text(pdf_path: Path):
-    # !pip install pypdf
-    import pypdf
+def read_pdf_text(pdf_path: Path, verbose: bool = True, workers: int = 1, cache: text_extraction.PageTextCache | None = None) -> list[str]:
+    """
+    Text of each page (see text_extraction.iter_pdf_text, to stream it, in parallel or cached).
 
-    path = Path(pdf_path)
-    pdf = pypdf.PdfReader(path)
+    Args:
+        pdf_path: input PDF.
+        verbose: print the text of each page.
+        workers: processes extracting pages (0: one per CPU).
+        cache: on-disk cache of page texts.
 
-    print(f"Reading contents of PDF {path}")
-    for idx, page in enumerate(pdf.pages):
-        print(f"--- PAGE {idx} ---")
-        print(page.extract_text())
\ No newline at end of file
+    Returns:
+        The text of each page.
+    """
+    path = Path(pdf_path)
+    texts = []
+
+    if verbose:
+        print(f"Reading contents of PDF {path}")
+    for page in text_extraction.iter_pdf_text(path, workers=workers, cache=cache):
+        if verbose:
+            print(f"--- PAGE {page.page} ---")
+            print(page.text)
+        texts.append(page.text)
+    return texts
@@ -1,10 +1,74 @@
 import os
+import json
+import time
+import hashlib
 from glob import glob
-import shutil
 from pathlib import Path
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pdf_utils
 
+MANIFEST_NAME = ".process_slides_manifest.json"
+WATERMARK_CACHE_NAME = ".watermark_signatures.sqlite"
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _file_signature(path: Path, use_hash: bool) -> dict:
+    """Size + mtime of a file (and its sha256 if `use_hash`)."""
+    st = path.stat()
+    sig = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if use_hash:
+        sig["sha256"] = _sha256(path)
+    return sig
+
+def _load_manifest(manifest_path: Path) -> dict:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_manifest(manifest_path: Path, manifest: dict):
+    # write + rename, so an interrupted run never leaves a corrupted manifest
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _is_up_to_date(entry: dict | None, pdf_path: Path, out_path: Path, options: dict, use_hash: bool) -> bool:
+    """True if `pdf_path` was already processed with the same options and has not changed since."""
+    if entry is None or entry.get("options") != options or not out_path.exists():
+        return False
+    st = pdf_path.stat()
+    if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+        return True
+    # touched (e.g. copied again): with hashing on, unchanged content still counts as up to date
+    if use_hash and entry.get("sha256") is not None and entry["sha256"] == _sha256(pdf_path):
+        # remember the new mtime, so the next run does not hash it again
+        entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        return True
+    return False
+
+def _process_one(pdf_path: Path, out_path: Path, options: dict, watermark_cache_path: Path | None) -> tuple[Path, float, str | None]:
+    """Runs the pipeline on one file; errors are returned, not raised, so one bad PDF does not stop the others."""
+    t0 = time.perf_counter()
+    watermark_cache = None
+    try:
+        if watermark_cache_path is not None and options["no_watermark"]:
+            watermark_cache = pdf_utils.WatermarkSignatureCache(watermark_cache_path)
+        pdf_utils.process_pdf(pdf_path=pdf_path, out_path=out_path, verbose=False, watermark_cache=watermark_cache, **options)
+        return pdf_path, time.perf_counter() - t0, None
+    except Exception as e:
+        return pdf_path, time.perf_counter() - t0, f"{type(e).__name__}: {e}"
+    finally:
+        if watermark_cache is not None:
+            watermark_cache.close()
+
 def main():
     # read args
     ap = argparse.ArgumentParser(description="Process PDFs (add write permissions; remove watermarks; split pages).")
@@ -13,56 +77,89 @@ def main():
     ap.add_argument("--write", required=False, type=int, default=1)
     ap.add_argument("--no_watermark", required=False, type=int, default=1)
     ap.add_argument("--split_pages", required=False, type=int, default=1)
+    ap.add_argument("--split_clip", required=False, type=int, default=0, help="each half keeps only the content drawn inside it")
+    ap.add_argument("--workers", required=False, type=int, default=0, help="processes to use (0: one per CPU; 1: no pool)")
+    ap.add_argument("--force", required=False, type=int, default=0, help="reprocess files already up to date")
+    ap.add_argument("--watermark_cache", required=False, default="none",
+                    help=f"signature cache of known watermarks, to also remove untagged ones: a path, 'auto' for {WATERMARK_CACHE_NAME} in the output folder, or 'none' (default)")
+    ap.add_argument("--manifest_hash", required=False, type=int, default=0, help="also compare content hashes, not only size + mtime")
+    ap.add_argument("--remove_text", required=False, action="append", default=None,
+                    help="text to remove from every page (repeatable), e.g. a watermark drawn as plain text")
     args = ap.parse_args()
     folder = args.folder
     inplace = bool(args.inplace)
-    write = bool(args.write)
-    no_watermark = bool(args.no_watermark)
-    split_pages = bool(args.split_pages)
+    options = {
+        "write": bool(args.write),
+        "no_watermark": bool(args.no_watermark),
+        "split_pages": bool(args.split_pages),
+    }
+    if args.remove_text:
+        options["texts_to_remove"] = args.remove_text
+    if args.split_clip:
+        options["clip_split"] = True
+    workers = args.workers or os.cpu_count() or 1
+    use_hash = bool(args.manifest_hash)
     if not os.path.isdir(folder):
         raise Exception(f"--folder `{folder}` is not a valid directory.")
     
     # read PDFs
-    pdf_files = glob('*.pdf', root_dir=folder)
+    pdf_files = sorted(glob('*.pdf', root_dir=folder))
 
-    # if not inplace, copy folder
-    if not inplace:
-        out_folder = Path(folder) / "cleaned"
-        os.makedirs(out_folder, exist_ok=True)
-        for pdf_file in pdf_files:
-            pdf_path = Path(folder) / pdf_file
-            out_path = out_folder / pdf_file
-            shutil.copy(pdf_path, out_path)
-        folder = out_folder
-    
-    # process PDFs
+    # output folder (the input folder itself if inplace)
+    out_folder = Path(folder) if inplace else Path(folder) / "cleaned"
+    os.makedirs(out_folder, exist_ok=True)
+
+    # skip the files processed by a previous run with the same options and unchanged since
+    if args.watermark_cache.lower() == "auto":
+        watermark_cache_path = out_folder / WATERMARK_CACHE_NAME
+    elif args.watermark_cache.lower() == "none":
+        watermark_cache_path = None
+    else:
+        watermark_cache_path = Path(args.watermark_cache)
+
+    manifest_path = out_folder / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+    todo = []
     for pdf_file in pdf_files:
         pdf_path = Path(folder) / pdf_file
-        try:
-            print(f"Processing {pdf_path}...")
-
-            print("Adding write permissions...")
-            if write:
-                pdf_utils.add_write_permissions(pdf_path)
-            else:
-                print("Skipped")
+        out_path = out_folder / pdf_file
+        if not args.force and _is_up_to_date(manifest.get(pdf_file), pdf_path, out_path, options, use_hash):
+            continue
+        todo.append((pdf_path, out_path))
+    _save_manifest(manifest_path, manifest)
+    print(f"{len(pdf_files)} PDF(s) found, {len(pdf_files) - len(todo)} up to date, {len(todo)} to process")
+    if not todo:
+        return
 
-            print("Removing watermarks...")
-            if no_watermark:
-                pdf_utils.remove_watermarks_with_pikepdf(
-                    pdf_path=pdf_path, 
-                    inplace=True
-                )
-            else:
-                print("Skipped")
+    # process PDFs: one read and one write per file, all stages applied in memory
+    def on_done(k: int, pdf_path: Path, seconds: float, error: str | None):
+        if error is not None:
+            print(f"[{k}/{len(todo)}] Error processing {pdf_path}: {error}")
+            return
+        print(f"[{k}/{len(todo)}] {pdf_path.name} ({seconds:.1f}s)")
+        # signed after processing: inplace, the file in the folder is now the output, which is what the next run sees
+        manifest[pdf_path.name] = {**_file_signature(pdf_path, use_hash), "options": options}
+        _save_manifest(manifest_path, manifest)
 
-            print("Split pages in 2...")
-            if split_pages:
-                pdf_utils.split_pages_horizontally(pdf_path, inplace=True)
-            else:
-                print("Skipped")
-        except Exception as e:
-            print(f"Error processing {pdf_path}: {e}")
+    t0 = time.perf_counter()
+    failed = 0
+    if workers == 1 or len(todo) == 1:
+        for k, (pdf_path, out_path) in enumerate(todo, start=1):
+            pdf_path, seconds, error = _process_one(pdf_path, out_path, options, watermark_cache_path)
+            failed += error is not None
+            on_done(k, pdf_path, seconds, error)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(_process_one, pdf_path, out_path, options, watermark_cache_path): pdf_path for pdf_path, out_path in todo}
+            for k, future in enumerate(as_completed(futures), start=1):
+                try:
+                    pdf_path, seconds, error = future.result()
+                except Exception as e:
+                    # the worker process itself died (e.g. crash in the PDF library)
+                    pdf_path, seconds, error = futures[future], 0.0, f"{type(e).__name__}: {e}"
+                failed += error is not None
+                on_done(k, pdf_path, seconds, error)
+    print(f"Processed {len(todo) - failed} PDF(s), {failed} error(s), in {time.perf_counter() - t0:.1f}s")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,160 @@
+# synthetic_decks.py
+"""
+Synthetic slide decks for the benchmarks, built locally with pikepdf: landscape pages with
+text lines over the whole page, a filled shape, an (incompressible) image of configurable weight,
+and a watermark drawn the way exporters do it:
+- xobject: shared Form XObject tagged as an Adobe watermark (/PieceInfo /ADBE_CompoundType /Private /Watermark);
+- untagged: the same Form XObject, without the tag (only the signature cache can find it);
+- annotation: a /Watermark annotation whose appearance is the Form XObject;
+- text: the watermark line drawn as page text, one Tj per word (what remove_text targets);
+- kerned: the same line as a single TJ array with fractional kerning between the words, as exporters write it;
+- none.
+By default decks are "protected" like the real ones: AES encrypted with an empty user password
+and an owner password restricting modifications.
+
+Build a folder of decks:
+    python synthetic_decks.py --folder /tmp/decks --decks 10 --pages 40 --image_kb 200 --watermark xobject
+"""
+import os
+import random
+import argparse
+import zlib
+from pathlib import Path
+
+import pikepdf
+from pikepdf import Array, Dictionary, Name
+
+WATERMARK_TEXT = "Università degli studi Guglielmo Marconi"
+WATERMARK_KINDS = ["xobject", "untagged", "annotation", "text", "kerned", "none"]
+PAGE_SIZE = (842, 595)  # A4 landscape
+
+
+def _font(pdf: pikepdf.Pdf) -> Dictionary:
+    return pdf.make_indirect(Dictionary(
+        Type=Name.Font, Subtype=Name.Type1, BaseFont=Name.Helvetica, Encoding=Name.WinAnsiEncoding,
+        FirstChar=32, Widths=Array([556] * 224),
+    ))
+
+
+def _watermark_form(pdf: pikepdf.Pdf, font: Dictionary, tagged: bool) -> pikepdf.Stream:
+    text = WATERMARK_TEXT.encode("cp1252").replace(b"(", rb"\(").replace(b")", rb"\)")
+    form = pdf.make_stream(
+        b"q 0.8 g BT /F1 36 Tf 1 0 0 1 0 -30 Tm (" + text + b") Tj ET Q",
+        Type=Name.XObject, Subtype=Name.Form, BBox=Array([0, -40, 760, 10]),
+        Resources=Dictionary(Font=Dictionary(F1=font)),
+    )
+    if tagged:
+        form.PieceInfo = Dictionary(ADBE_CompoundType=Dictionary(Private=Name.Watermark))
+    return form
+
+
+def _image(pdf: pikepdf.Pdf, rng: random.Random, image_kb: int) -> pikepdf.Stream:
+    # random RGB pixels do not compress: the image weighs about `image_kb` in the file
+    width = 256
+    height = max(1, image_kb * 1024 // (3 * width))
+    raw = rng.randbytes(3 * width * height)
+    return pdf.make_stream(
+        zlib.compress(raw, 1), Type=Name.XObject, Subtype=Name.Image, Filter=Name.FlateDecode,
+        Width=width, Height=height, ColorSpace=Name.DeviceRGB, BitsPerComponent=8,
+    )
+
+
+def make_deck(
+    path: str | Path,
+    pages: int = 20,
+    image_kb: int = 100,
+    lines: int = 20,
+    watermark: str = "xobject",
+    encrypted: bool = True,
+    seed: int = 0,
+) -> Path:
+    """
+    Writes a synthetic deck.
+
+    Args:
+        path: output PDF.
+        pages: number of pages.
+        image_kb: weight of the image of each page (0: no image).
+        lines: text lines per page, spread over the whole page.
+        watermark: one of WATERMARK_KINDS.
+        encrypted: protect the deck with an owner password (empty user password).
+        seed: seed of the image pixels.
+
+    Returns:
+        The output path.
+    """
+    if watermark not in WATERMARK_KINDS:
+        raise ValueError(f"Watermark kind `{watermark}` not supported. Pick one of {WATERMARK_KINDS}.")
+    path = Path(path)
+    rng = random.Random(seed)
+    width, height = PAGE_SIZE
+
+    pdf = pikepdf.new()
+    font = _font(pdf)
+    form = _watermark_form(pdf, font, tagged=watermark != "untagged") if watermark in ("xobject", "untagged", "annotation") else None
+    for p in range(pages):
+        xobjects = Dictionary()
+        ops = [b"q 0.2 0.4 0.8 rg 40 40 762 30 re f Q"]
+        if image_kb > 0:
+            xobjects.Im0 = _image(pdf, rng, image_kb)
+            ops.append(b"q 360 0 0 220 440 330 cm /Im0 Do Q")
+        for line in range(lines):
+            y = height - 60 - line * (height - 120) / max(lines, 1)
+            ops.append(f"BT /F1 14 Tf 1 0 0 1 60 {y:.1f} Tm [(Slide {p}, point {line}: lorem ipsum dolor sit) -250 (amet)] TJ ET".encode())
+        if watermark in ("xobject", "untagged"):
+            xobjects.Wm0 = form
+            ops.append(b"q 1 0 0 1 40 300 cm /Wm0 Do Q")
+        elif watermark == "text":
+            words = b" ".join(b"(" + word.encode("cp1252") + b" ) Tj" for word in WATERMARK_TEXT.split())
+            ops.append(b"BT /F1 36 Tf 0.8 g 1 0 0 1 40 270 Tm " + words + b" ET")
+        elif watermark == "kerned":
+            words = b" -12.5 ".join(b"(" + word.encode("cp1252") + b" )" for word in WATERMARK_TEXT.split())
+            ops.append(b"BT /F1 36 Tf 0.8 g 1 0 0 1 40 270 Tm [" + words + b"] TJ ET")
+
+        page = pdf.add_blank_page(page_size=PAGE_SIZE)
+        page.obj.Resources = Dictionary(Font=Dictionary(F1=font), XObject=xobjects)
+        page.obj.Contents = pdf.make_stream(b"\n".join(ops))
+        if watermark == "annotation":
+            page.obj.Annots = Array([pdf.make_indirect(Dictionary(
+                Type=Name.Annot, Subtype=Name.Watermark, Rect=Array([40, 260, 800, 310]),
+                AP=Dictionary(N=form),
+            ))])
+
+    encryption = None
+    if encrypted:
+        encryption = pikepdf.Encryption(
+            owner=f"owner-{seed}", user="",
+            allow=pikepdf.Permissions(modify_annotation=False, modify_assembly=False, modify_form=False, modify_other=False),
+        )
+    pdf.save(path, encryption=encryption)
+    return path
+
+
+def make_corpus(folder: str | Path, decks: int, **deck_options) -> list[Path]:
+    """Writes `decks` decks (deck_000.pdf, ...) with different images, see make_deck for the options."""
+    folder = Path(folder)
+    os.makedirs(folder, exist_ok=True)
+    return [make_deck(folder / f"deck_{i:03d}.pdf", seed=i, **deck_options) for i in range(decks)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build synthetic slide decks.")
+    ap.add_argument("--folder", required=True)
+    ap.add_argument("--decks", type=int, default=10)
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--image_kb", type=int, default=100)
+    ap.add_argument("--lines", type=int, default=20)
+    ap.add_argument("--watermark", default="xobject", choices=WATERMARK_KINDS)
+    ap.add_argument("--encrypted", type=int, default=1)
+    args = ap.parse_args()
+
+    paths = make_corpus(
+        args.folder, args.decks, pages=args.pages, image_kb=args.image_kb, lines=args.lines,
+        watermark=args.watermark, encrypted=bool(args.encrypted),
+    )
+    total_kb = sum(os.path.getsize(p) for p in paths) / 1024
+    print(f"Wrote {len(paths)} deck(s) to {args.folder} ({total_kb:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
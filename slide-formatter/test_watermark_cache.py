@@ -0,0 +1,59 @@
+# test_watermark_cache.py
+"""
+Checks of the watermark signature cache: run with `python -m pytest test_watermark_cache.py`.
+"""
+import pikepdf
+from pikepdf import Array, Dictionary, Name
+
+import pdf_utils
+import synthetic_decks
+
+WRAPPER = b"q 200 0 0 100 0 0 cm /Im0 Do Q"
+
+
+def _wrapper_deck(path, pixel: bytes, tagged: bool):
+    """One page drawing a Form XObject `WRAPPER` around a 1x1 image of color `pixel`."""
+    pdf = pikepdf.new()
+    image = pdf.make_stream(pixel, Type=Name.XObject, Subtype=Name.Image, Width=1, Height=1,
+                            ColorSpace=Name.DeviceRGB, BitsPerComponent=8)
+    form = pdf.make_stream(WRAPPER, Type=Name.XObject, Subtype=Name.Form, BBox=Array([0, 0, 200, 100]),
+                           Resources=Dictionary(XObject=Dictionary(Im0=image)))
+    if tagged:
+        form.PieceInfo = Dictionary(ADBE_CompoundType=Dictionary(Private=Name.Watermark))
+    page = pdf.add_blank_page()
+    page.obj.Resources = Dictionary(XObject=Dictionary(Fm0=form))
+    page.obj.Contents = pdf.make_stream(b"q 1 0 0 1 50 50 cm /Fm0 Do Q")
+    pdf.save(path)
+    return path
+
+
+def _form_content(path) -> bytes:
+    with pikepdf.open(path) as pdf:
+        return pdf.pages[0].obj.Resources.XObject.Fm0.read_bytes()
+
+
+def test_untagged_form_with_same_wrapper_and_other_image_survives(tmp_path):
+    cache = pdf_utils.WatermarkSignatureCache(tmp_path / "signatures.sqlite")
+    try:
+        watermark = _wrapper_deck(tmp_path / "a.pdf", b"\xff\x00\x00", tagged=True)
+        logo = _wrapper_deck(tmp_path / "b.pdf", b"\x00\x00\xff", tagged=False)
+        pdf_utils.remove_watermarks_with_pikepdf(watermark, inplace=True, watermark_cache=cache)
+        assert len(cache) == 1
+        pdf_utils.remove_watermarks_with_pikepdf(logo, inplace=True, watermark_cache=cache)
+        assert _form_content(watermark) == b"q Q\n"
+        assert _form_content(logo) == WRAPPER
+    finally:
+        cache.close()
+
+
+def test_untagged_copy_of_learned_watermark_is_removed(tmp_path):
+    cache = pdf_utils.WatermarkSignatureCache(tmp_path / "signatures.sqlite")
+    try:
+        tagged = synthetic_decks.make_deck(tmp_path / "tagged.pdf", pages=2, image_kb=0, lines=2, watermark="xobject", encrypted=False)
+        untagged = synthetic_decks.make_deck(tmp_path / "untagged.pdf", pages=2, image_kb=0, lines=2, watermark="untagged", encrypted=False)
+        pdf_utils.remove_watermarks_with_pikepdf(tagged, inplace=True, watermark_cache=cache)
+        pdf_utils.remove_watermarks_with_pikepdf(untagged, inplace=True, watermark_cache=cache)
+        with pikepdf.open(untagged) as pdf:
+            assert pdf.pages[0].obj.Resources.XObject.Wm0.read_bytes() == b"q Q\n"
+    finally:
+        cache.close()
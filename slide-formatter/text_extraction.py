@@ -0,0 +1,230 @@
+"""
+Per-page text extraction of PDFs, as a generator of PageText (page index + text).
+
+Pages are extracted with pypdf, in parallel across processes for large decks (each worker
+opens the PDF once and extracts contiguous chunks of pages), and are yielded in page order.
+With a PageTextCache, the text of every page is stored on disk under the sha256 of the file and
+the page index, so a deck already read (by any consumer, under any path) is not parsed again.
+Use:
+    cache = PageTextCache("page_text.sqlite")
+    for page in iter_pdf_text("deck.pdf", workers=4, cache=cache):
+        print(page.page, page.text)
+    cache.close()
+
+Dump a PDF as JSONL (one {"page": i, "text": ...} per line):
+    python text_extraction.py deck.pdf --workers 4 --cache page_text.sqlite
+"""
+import io
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pikepdf
+
+
+@dataclass
+class PageText:
+    page: int      # 0-based page index
+    text: str
+    cached: bool   # served from the PageTextCache
+
+
+def file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def extractor_version() -> str:
+    """Identifies the extraction code: cached texts from another pypdf version are not reused."""
+    import pypdf
+    return f"pypdf-{pypdf.__version__}"
+
+
+class PageTextCache:
+    """
+    Persistent SQLite cache of extracted page texts, keyed by (file sha256, page, extractor version).
+    Opened by the consumer process only: workers send their texts back, the consumer writes them.
+    """
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " file_hash TEXT NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " extractor TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " PRIMARY KEY (file_hash, page, extractor))"
+        )
+
+    def get_pages(self, file_hash: str, extractor: str) -> dict[int, str]:
+        """Cached texts of a file, by page index."""
+        rows = self._conn.execute(
+            "SELECT page, text FROM pages WHERE file_hash = ? AND extractor = ?", (file_hash, extractor)
+        ).fetchall()
+        return dict(rows)
+
+    def put_pages(self, file_hash: str, extractor: str, pages: list[tuple[int, str]]):
+        self._conn.execute("BEGIN")
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO pages (file_hash, page, extractor, text) VALUES (?, ?, ?, ?)",
+            [(file_hash, page, extractor, text) for page, text in pages],
+        )
+        self._conn.execute("COMMIT")
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+# reader of the last PDF opened by this process (workers get several chunks of the same file)
+_reader_cache: dict = {}
+
+
+def _open_reader(pdf_path: str):
+    import pypdf
+
+    if _reader_cache.get("path") != pdf_path:
+        try:
+            reader = pypdf.PdfReader(pdf_path)
+            if reader.is_encrypted:
+                # slides are often "encrypted" with an empty user password, only to restrict permissions
+                reader.decrypt("")
+        except pypdf.errors.DependencyError:
+            # AES encryption without the `cryptography` package: let pikepdf decrypt it in memory
+            buffer = io.BytesIO()
+            with pikepdf.open(pdf_path) as pdf:
+                pdf.save(buffer)
+            reader = pypdf.PdfReader(buffer)
+        _reader_cache.clear()
+        _reader_cache.update(path=pdf_path, reader=reader)
+    return _reader_cache["reader"]
+
+
+def _extract_pages(pdf_path: str, pages: list[int]) -> list[tuple[int, str]]:
+    reader = _open_reader(pdf_path)
+    return [(page, reader.pages[page].extract_text()) for page in pages]
+
+
+def count_pages(pdf_path: str | Path) -> int:
+    return len(_open_reader(str(pdf_path)).pages)
+
+
+def iter_pdf_text(
+    pdf_path: str | Path,
+    workers: int = 0,
+    cache: PageTextCache | None = None,
+    chunk_size: int = 8,
+    pages: list[int] | None = None,
+) -> Iterator[PageText]:
+    """
+    Yields the text of each page, in page order.
+
+    Args:
+        pdf_path: input PDF.
+        workers: processes extracting pages (0: one per CPU; 1: in this process). Fewer are used
+            if there are not enough pages to extract for each to get a chunk.
+        cache: on-disk cache of page texts; cached pages are not extracted again.
+        chunk_size: pages per task sent to a worker.
+        pages: indices of the pages to read (default: all); repeated indices are read once.
+
+    Returns:
+        Generator of PageText. Closing it early stops the pending work.
+    """
+    pdf_path = str(pdf_path)
+    n_pages = count_pages(pdf_path)
+    # each page once, in the order given
+    pages = list(range(n_pages)) if pages is None else list(dict.fromkeys(p for p in pages if 0 <= p < n_pages))
+
+    extractor = extractor_version()
+    file_hash = file_sha256(pdf_path) if cache is not None else None
+    cached = cache.get_pages(file_hash, extractor) if cache is not None else {}
+    missing = [p for p in pages if p not in cached]
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+
+    # extracted texts not yielded yet (chunks complete out of order)
+    ready: dict[int, str] = {}
+
+    def completed(chunk_result: list[tuple[int, str]]):
+        ready.update(chunk_result)
+        if cache is not None:
+            cache.put_pages(file_hash, extractor, chunk_result)
+
+    processes = min(workers or os.cpu_count() or 1, len(chunks))
+    if processes <= 1:
+        try:
+            remaining = iter(chunks)
+            for page in pages:
+                if page in cached:
+                    yield PageText(page, cached[page], True)
+                    continue
+                while page not in ready:
+                    completed(_extract_pages(pdf_path, next(remaining)))
+                yield PageText(page, ready.pop(page), False)
+        finally:
+            _reader_cache.clear()
+        return
+
+    # forked workers inherit the reader opened to count the pages
+    pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        # keep a bounded number of chunks ahead of the consumer, so a slow one does not buffer the whole deck
+        todo = iter(chunks)
+        in_flight = set()
+
+        def submit_more():
+            while len(in_flight) < 2 * processes:
+                chunk = next(todo, None)
+                if chunk is None:
+                    return
+                in_flight.add(pool.submit(_extract_pages, pdf_path, chunk))
+
+        submit_more()
+        for page in pages:
+            if page in cached:
+                yield PageText(page, cached[page], True)
+                continue
+            while page not in ready:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    completed(future.result())
+                submit_more()
+            yield PageText(page, ready.pop(page), False)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        _reader_cache.clear()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extract the text of a PDF, one JSON line per page.")
+    ap.add_argument("pdf_path")
+    ap.add_argument("--workers", type=int, default=0, help="processes to use (0: one per CPU; 1: no pool)")
+    ap.add_argument("--cache", default=None, help="SQLite cache of page texts")
+    args = ap.parse_args()
+
+    cache = PageTextCache(args.cache) if args.cache else None
+    try:
+        for page in iter_pdf_text(args.pdf_path, workers=args.workers, cache=cache):
+            sys.stdout.write(json.dumps({"page": page.page, "text": page.text}, ensure_ascii=False) + "\n")
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
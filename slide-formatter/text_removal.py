@@ -0,0 +1,405 @@
+"""
+In-process text removal for PDF content streams (no qpdf round trip).
+
+Text-showing operators (Tj, TJ, ', ") are decoded with the encoding of their font
+(/ToUnicode CMap, /Encoding + /Differences, or the standard encodings), the text of each
+BT ... ET object is matched against the phrases to remove, and the matching glyphs are
+dropped from the operators. When the font widths are known, removed glyphs are replaced
+by a TJ spacing of the same width, so the remaining text keeps its position.
+"""
+import re
+import unicodedata
+from typing import Iterable
+
+import pikepdf
+from pikepdf import Array, Dictionary, Name, Stream, String
+
+# text-showing operators and the index of their string operand
+_SHOW_OPERATORS = {"Tj": 0, "'": 0, '"': 2, "TJ": 0}
+# operators that set the text position from the line start, making the current advance irrelevant
+_POSITIONING_OPERATORS = {"Td", "TD", "Tm", "T*", "'", '"', "ET"}
+
+# glyph names not derivable from their spelling (see _glyph_to_char)
+_GLYPH_NAMES = {
+    "space": " ", "exclam": "!", "quotedbl": '"', "numbersign": "#", "dollar": "$", "percent": "%",
+    "ampersand": "&", "quotesingle": "'", "quoteright": "’", "quoteleft": "‘",
+    "parenleft": "(", "parenright": ")", "asterisk": "*", "plus": "+", "comma": ",", "hyphen": "-",
+    "minus": "−", "period": ".", "slash": "/", "colon": ":", "semicolon": ";", "less": "<",
+    "equal": "=", "greater": ">", "question": "?", "at": "@", "bracketleft": "[", "backslash": "\\",
+    "bracketright": "]", "underscore": "_", "braceleft": "{", "bar": "|", "braceright": "}",
+    "asciitilde": "~", "endash": "–", "emdash": "—", "bullet": "•", "ellipsis": "…",
+    "quotedblleft": "“", "quotedblright": "”", "germandbls": "ß", "ae": "æ",
+    "AE": "Æ", "oe": "œ", "OE": "Œ", "oslash": "ø", "Oslash": "Ø",
+    "fi": "fi", "fl": "fl", "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9", "Euro": "€",
+}
+_ACCENTS = {
+    "grave": "GRAVE", "acute": "ACUTE", "circumflex": "CIRCUMFLEX", "tilde": "TILDE",
+    "dieresis": "DIAERESIS", "ring": "RING ABOVE", "cedilla": "CEDILLA", "caron": "CARON",
+}
+
+_BASE_ENCODINGS = {
+    "/WinAnsiEncoding": "cp1252",
+    "/MacRomanEncoding": "mac_roman",
+    # StandardEncoding matches latin-1 on letters and digits, which is what matching needs
+    "/StandardEncoding": "latin-1",
+}
+
+
+def _glyph_to_char(name: str) -> str:
+    """Unicode text of a glyph name (Adobe glyph list conventions, common names only)."""
+    if name in _GLYPH_NAMES:
+        return _GLYPH_NAMES[name]
+    if len(name) == 1:
+        return name
+    m = re.fullmatch(r"uni([0-9A-Fa-f]{4})+", name) or re.fullmatch(r"u([0-9A-Fa-f]{4,6})", name)
+    if m:
+        hexes = re.findall(r"[0-9A-Fa-f]{4}", name[3:]) if name.startswith("uni") else [m.group(1)]
+        return "".join(chr(int(h, 16)) for h in hexes)
+    for accent, unicode_name in _ACCENTS.items():
+        if name.endswith(accent) and len(name) == len(accent) + 1:
+            letter = name[0]
+            case = "CAPITAL" if letter.isupper() else "SMALL"
+            try:
+                return unicodedata.lookup(f"LATIN {case} LETTER {letter.upper()} WITH {unicode_name}")
+            except KeyError:
+                return letter
+    return ""
+
+
+def _parse_to_unicode(cmap: bytes) -> tuple[dict[bytes, str], list[int]]:
+    """Parses a /ToUnicode CMap: {code bytes: text} and the code lengths in use (from codespacerange)."""
+    mapping: dict[bytes, str] = {}
+    lengths = set()
+
+    def utf16(hex_str: bytes) -> str:
+        return bytes.fromhex(hex_str.decode("ascii")).decode("utf-16-be", errors="ignore")
+
+    for block in re.findall(rb"begincodespacerange(.*?)endcodespacerange", cmap, re.S):
+        for lo, _ in re.findall(rb"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>", block):
+            lengths.add(len(lo) // 2)
+    for block in re.findall(rb"beginbfchar(.*?)endbfchar", cmap, re.S):
+        for src, dst in re.findall(rb"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]*)>", block):
+            mapping[bytes.fromhex(src.decode("ascii"))] = utf16(dst)
+    for block in re.findall(rb"beginbfrange(.*?)endbfrange", cmap, re.S):
+        for lo, hi, dst in re.findall(rb"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]*>|\[[^\]]*\])", block):
+            size = len(lo) // 2
+            lo_code, hi_code = int(lo, 16), int(hi, 16)
+            if dst.startswith(b"["):
+                targets = [utf16(t) for t in re.findall(rb"<([0-9A-Fa-f]*)>", dst)]
+                for offset, text in enumerate(targets[:hi_code - lo_code + 1]):
+                    mapping[(lo_code + offset).to_bytes(size, "big")] = text
+            else:
+                first = bytes.fromhex(dst[1:-1].decode("ascii"))
+                for offset in range(hi_code - lo_code + 1):
+                    # the last byte of the destination is incremented along the range
+                    text = (first[:-1] + bytes([(first[-1] + offset) & 0xFF])) if first else b""
+                    mapping[(lo_code + offset).to_bytes(size, "big")] = text.decode("utf-16-be", errors="ignore")
+    if not lengths:
+        lengths = {len(code) for code in mapping} or {1}
+    return mapping, sorted(lengths)
+
+
+class FontDecoder:
+    """Maps the bytes of a shown string to (normalized text, byte start, byte end, width) per glyph code."""
+    def __init__(self, font: Dictionary | None):
+        self._decoded: dict[bytes, tuple[str, float | None]] = {}  # code -> (normalized text, width)
+        self.to_unicode: dict[bytes, str] = {}
+        self.code_lengths = [1]
+        self.codec = "latin-1"
+        self.differences: dict[int, str] = {}
+        self.widths: dict[int, float] = {}
+        self.default_width: float | None = None
+        if not isinstance(font, Dictionary):
+            return
+
+        to_unicode = font.get("/ToUnicode", None)
+        if isinstance(to_unicode, Stream):
+            try:
+                self.to_unicode, self.code_lengths = _parse_to_unicode(to_unicode.read_bytes())
+            except (ValueError, pikepdf.PdfError):
+                self.to_unicode = {}
+
+        subtype = font.get("/Subtype", None)
+        if subtype == Name("/Type0"):
+            if not self.to_unicode:
+                self.code_lengths = [2]
+            self._read_cid_widths(font)
+            return
+
+        encoding = font.get("/Encoding", None)
+        if isinstance(encoding, Name):
+            self.codec = _BASE_ENCODINGS.get(str(encoding), "latin-1")
+        elif isinstance(encoding, Dictionary):
+            base = encoding.get("/BaseEncoding", None)
+            if isinstance(base, Name):
+                self.codec = _BASE_ENCODINGS.get(str(base), "latin-1")
+            code = 0
+            for item in encoding.get("/Differences", None) or []:
+                if isinstance(item, Name):
+                    self.differences[code] = _glyph_to_char(str(item)[1:])
+                    code += 1
+                else:
+                    code = int(item)
+
+        first_char = int(font.get("/FirstChar", 0))
+        for offset, width in enumerate(font.get("/Widths", None) or []):
+            self.widths[first_char + offset] = float(width)
+        descriptor = font.get("/FontDescriptor", None)
+        if self.widths and isinstance(descriptor, Dictionary):
+            self.default_width = float(descriptor.get("/MissingWidth", 0))
+
+    def _read_cid_widths(self, font: Dictionary):
+        descendants = font.get("/DescendantFonts", None)
+        if not isinstance(descendants, Array) or len(descendants) == 0:
+            return
+        cid_font = descendants[0]
+        self.default_width = float(cid_font.get("/DW", 1000))
+        w = list(cid_font.get("/W", None) or [])
+        i = 0
+        # /W is a sequence of `c [w1 w2 ...]` and `c_first c_last w`
+        while i + 1 < len(w):
+            start = int(w[i])
+            if isinstance(w[i + 1], Array):
+                for offset, width in enumerate(w[i + 1]):
+                    self.widths[start + offset] = float(width)
+                i += 2
+            elif i + 2 < len(w):
+                for code in range(start, int(w[i + 1]) + 1):
+                    self.widths[code] = float(w[i + 2])
+                i += 3
+            else:
+                break
+
+    def _text_of(self, code: bytes) -> str:
+        if code in self.to_unicode:
+            return self.to_unicode[code]
+        if len(code) == 1:
+            if code[0] in self.differences:
+                return self.differences[code[0]]
+            return code.decode(self.codec, errors="replace")
+        return ""
+
+    def glyphs(self, data: bytes) -> list[tuple[str, int, int, float | None]]:
+        out = []
+        i = 0
+        while i < len(data):
+            # shortest code length whose code is mapped, else the shortest one
+            size = self.code_lengths[0]
+            if len(self.code_lengths) > 1:
+                for length in self.code_lengths:
+                    if data[i:i + length] in self.to_unicode:
+                        size = length
+                        break
+            code = data[i:i + size]
+            decoded = self._decoded.get(code)
+            if decoded is None:
+                width = self.widths.get(int.from_bytes(code, "big"), self.default_width)
+                decoded = self._decoded[code] = (_normalize(self._text_of(code)), width)
+            out.append((decoded[0], i, i + len(code), decoded[1]))
+            i += len(code)
+        return out
+
+
+def _normalize(text: str) -> str:
+    """Casefolded text without whitespace: spacing is often done with positioning, not space glyphs."""
+    return "".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+class _Glyph:
+    __slots__ = ("instruction", "element", "start", "end", "width", "text")
+
+    def __init__(self, instruction: int, element: int, start: int, end: int, width: float | None, text: str):
+        self.instruction = instruction
+        self.element = element
+        self.start = start
+        self.end = end
+        self.width = width
+        self.text = text
+
+
+def _match_glyphs(glyphs: list[_Glyph], phrases: list[str]) -> tuple[set[int], int]:
+    """Indices of the glyphs belonging to an occurrence of one of the (normalized) phrases, and the number of occurrences."""
+    text = "".join(glyph.text for glyph in glyphs)
+    if not any(phrase in text for phrase in phrases):
+        return set(), 0
+    # for each character of the normalized text, the glyph it comes from
+    owners = [g_idx for g_idx, glyph in enumerate(glyphs) for _ in glyph.text]
+
+    removed = set()
+    occurrences = 0
+    for phrase in phrases:
+        start = text.find(phrase)
+        while start != -1:
+            end = start + len(phrase)
+            # also drop the whitespace glyphs in between the matched ones
+            matched = range(owners[start], owners[end - 1] + 1)
+            if not removed.issuperset(matched):
+                occurrences += 1
+            removed.update(matched)
+            start = text.find(phrase, end)
+    return removed, occurrences
+
+
+def _rebuild_shown(elements: list, removed: dict[int, list[_Glyph]]) -> tuple[list, bool]:
+    """
+    TJ-style element list with the removed glyphs cut out of its strings (replaced by a
+    spacing of their width when known). Returns (elements, anything_left_to_show).
+    """
+    out = []
+    visible = False
+    for e_idx, element in enumerate(elements):
+        if e_idx not in removed:
+            out.append(element)
+            if isinstance(element, String) and len(bytes(element)) > 0:
+                visible = True
+            continue
+        data = bytes(element)
+        cut = sorted(removed[e_idx], key=lambda g: g.start)
+        pos = 0
+        for glyph in cut:
+            if glyph.start > pos:
+                out.append(String(data[pos:glyph.start]))
+                visible = True
+            if glyph.width:
+                # a positive TJ number moves left: a negative one skips the glyph's advance
+                if out and not isinstance(out[-1], String):
+                    out[-1] = float(out[-1]) - glyph.width  # pikepdf gives fractional numbers as Decimal
+                else:
+                    out.append(-glyph.width)
+            pos = glyph.end
+        if pos < len(data):
+            out.append(String(data[pos:]))
+            visible = True
+    return out, visible
+
+
+def remove_text_from_instructions(
+    instructions: list,
+    fonts: Dictionary | None,
+    phrases: Iterable[str],
+    decoders: dict | None = None,
+) -> tuple[list, int]:
+    """
+    Removes the glyphs matching `phrases` from parsed content-stream instructions.
+
+    Args:
+        instructions: output of pikepdf.parse_content_stream.
+        fonts: the /Font dictionary of the stream resources.
+        phrases: texts to remove (matched case-insensitively, ignoring whitespace, within a BT ... ET object).
+        decoders: cache of FontDecoder by font object, shared between streams of the same PDF.
+
+    Returns:
+        (new instructions, number of occurrences removed)
+    """
+    phrases = [p for p in (_normalize(p) for p in phrases) if p]
+    decoders = {} if decoders is None else decoders
+
+    def decoder_for(font_name) -> FontDecoder:
+        font = fonts.get(font_name, None) if isinstance(fonts, Dictionary) else None
+        key = font.objgen if isinstance(font, Dictionary) and font.is_indirect else id(font)
+        if key not in decoders:
+            decoders[key] = FontDecoder(font)
+        return decoders[key]
+
+    decoder = FontDecoder(None)
+    font_stack = []
+    glyphs: list[_Glyph] = []
+    # instruction index -> element index -> removed glyphs
+    removals: dict[int, dict[int, list[_Glyph]]] = {}
+    occurrences = 0
+
+    for idx, instruction in enumerate(instructions):
+        if isinstance(instruction, pikepdf.ContentStreamInlineImage):
+            continue
+        op = str(instruction.operator)
+        operands = instruction.operands
+        if op == "q":
+            font_stack.append(decoder)
+        elif op == "Q" and font_stack:
+            decoder = font_stack.pop()
+        elif op == "Tf" and len(operands) >= 1:
+            decoder = decoder_for(operands[0])
+        elif op == "BT":
+            glyphs = []
+        elif op in _SHOW_OPERATORS and len(operands) > _SHOW_OPERATORS[op]:
+            shown = operands[_SHOW_OPERATORS[op]]
+            elements = list(shown) if op == "TJ" else [shown]
+            for e_idx, element in enumerate(elements):
+                if isinstance(element, String):
+                    for text, start, end, width in decoder.glyphs(bytes(element)):
+                        glyphs.append(_Glyph(idx, e_idx, start, end, width, text))
+        elif op == "ET":
+            matched, count = _match_glyphs(glyphs, phrases)
+            occurrences += count
+            for g_idx in matched:
+                glyph = glyphs[g_idx]
+                removals.setdefault(glyph.instruction, {}).setdefault(glyph.element, []).append(glyph)
+            glyphs = []
+
+    if not removals:
+        return instructions, 0
+
+    def shows_more_on_line(idx: int) -> bool:
+        """True if text is shown after instruction `idx` before the text position is reset."""
+        for instruction in instructions[idx + 1:]:
+            if isinstance(instruction, pikepdf.ContentStreamInlineImage):
+                continue
+            op = str(instruction.operator)
+            if op in _POSITIONING_OPERATORS:
+                return False
+            if op in _SHOW_OPERATORS:
+                return True
+        return False
+
+    out = []
+    for idx, instruction in enumerate(instructions):
+        if idx not in removals:
+            out.append(instruction)
+            continue
+        op = str(instruction.operator)
+        operands = list(instruction.operands)
+        shown = operands[_SHOW_OPERATORS[op]]
+        elements, visible = _rebuild_shown(list(shown) if op == "TJ" else [shown], removals[idx])
+
+        # ' and " also move to the next line (and " sets the spacings): keep that part
+        if op == "'":
+            out.append(pikepdf.ContentStreamInstruction([], pikepdf.Operator("T*")))
+        elif op == '"':
+            out.append(pikepdf.ContentStreamInstruction([operands[0]], pikepdf.Operator("Tw")))
+            out.append(pikepdf.ContentStreamInstruction([operands[1]], pikepdf.Operator("Tc")))
+            out.append(pikepdf.ContentStreamInstruction([], pikepdf.Operator("T*")))
+        if visible or (shows_more_on_line(idx) and any(not isinstance(e, String) for e in elements)):
+            # still advance by the removed widths, so the text shown after it stays in place
+            out.append(pikepdf.ContentStreamInstruction([Array(elements)], pikepdf.Operator("TJ")))
+    return out, occurrences
+
+
+def remove_text_from_pdf(pdf: pikepdf.Pdf, phrases: Iterable[str], streams: Iterable[tuple[object, Dictionary | None]]) -> int:
+    """
+    Removes `phrases` from the given content streams of an open PDF, in memory.
+
+    Args:
+        pdf: the open PDF.
+        phrases: texts to remove.
+        streams: (page or Form XObject, its /Resources) pairs, each visited once.
+
+    Returns:
+        Number of occurrences removed.
+    """
+    phrases = list(phrases)
+    decoders: dict = {}
+    removed = 0
+    for owner, resources in streams:
+        fonts = resources.get("/Font", None) if isinstance(resources, Dictionary) else None
+        instructions = pikepdf.parse_content_stream(owner)
+        new_instructions, count = remove_text_from_instructions(instructions, fonts, phrases, decoders)
+        if count == 0:
+            continue
+        removed += count
+        data = pikepdf.unparse_content_stream(new_instructions)
+        if isinstance(owner, pikepdf.Page):
+            owner.obj.Contents = pdf.make_stream(data)
+        else:
+            owner.write(data)
+    return removed